@@ -1,5 +1,5 @@
 from flask import Flask, request, jsonify
-from nlp_service import analyze_activity_text
+from nlp_service import analyze_activity_text, analyze_activity_clauses
 import os
 
 app = Flask(__name__)
@@ -7,6 +7,11 @@ app = Flask(__name__)
 @app.route('/analyze', methods=['POST'])
 def analyze():
     data = request.json
+
+    # Batched mode: {"clauses": [{"index": 0, "text": "..."}, ...]}
+    if data.get('clauses') is not None:
+        return analyze_batch(data['clauses'])
+
     text = (data.get('text') or data.get('input_text') or '').strip()
     
     print(f"DEBUG: AI Service received text: {text}")
@@ -27,6 +32,35 @@ def analyze():
         print(f"AI Service Error: {e}")
         return jsonify({"error": str(e)}), 500
 
+def analyze_batch(raw_clauses):
+    if not isinstance(raw_clauses, list):
+        return jsonify({"error": "clauses must be a list"}), 400
+
+    clauses = []
+    for i, c in enumerate(raw_clauses):
+        if isinstance(c, str):
+            c = {"index": i, "text": c}
+        if not isinstance(c, dict) or not isinstance(c.get('index'), int):
+            return jsonify({"error": f"clause {i} needs an integer index and text"}), 400
+        text = str(c.get('text') or '').strip()
+        if text:
+            clauses.append((c['index'], text))
+
+    print(f"DEBUG: AI Service received {len(clauses)} clause(s)")
+
+    if not clauses:
+        return jsonify({"error": "No text provided"}), 400
+
+    try:
+        result = analyze_activity_clauses(clauses)
+        if result is None:
+            # Model call failed or its reply was unusable — not "no activities"
+            return jsonify({"error": "Model returned no usable response"}), 502
+        return jsonify(result)
+    except Exception as e:
+        print(f"AI Service Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
 if __name__ == '__main__':
     # Run on port 5000 inside the container
     app.run(host='0.0.0.0', port=5000)
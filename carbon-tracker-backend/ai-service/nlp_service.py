@@ -4,28 +4,63 @@ from decouple import config
 from ibm_watson_machine_learning.foundation_models import Model
 from ibm_watson_machine_learning.metanames import GenTextParamsMetaNames as GenParams
 
-def analyze_activity_text(text_to_analyze):
-    try:
-        watsonx_url = config("WATSONX_URL")
-        api_key = config("NLP_API_KEY")
-        project_id = config("WATSONX_PROJECT_ID")
+def _get_model(max_new_tokens=250):
+    watsonx_url = config("WATSONX_URL")
+    api_key = config("NLP_API_KEY")
+    project_id = config("WATSONX_PROJECT_ID")
 
-        print(f"--- DEBUG: NLP Service connecting... ---")
+    print(f"--- DEBUG: NLP Service connecting... ---")
 
-        credentials = {
-            "apikey": api_key,
-            "url": watsonx_url
-        }
+    credentials = {
+        "apikey": api_key,
+        "url": watsonx_url
+    }
 
-        # Using the model that worked for you previously
-        model_id = "ibm/granite-3-3-8b-instruct"
+    # Using the model that worked for you previously
+    model_id = "ibm/granite-3-3-8b-instruct"
 
-        parameters = {
-            GenParams.MAX_NEW_TOKENS: 250,
-            GenParams.TEMPERATURE: 0.1, 
-            GenParams.REPETITION_PENALTY: 1.0
-        }
-        
+    parameters = {
+        GenParams.MAX_NEW_TOKENS: max_new_tokens,
+        GenParams.TEMPERATURE: 0.1,
+        GenParams.REPETITION_PENALTY: 1.0
+    }
+
+    return Model(
+        model_id=model_id,
+        params=parameters,
+        credentials=credentials,
+        project_id=project_id
+    )
+
+
+def _parse_extracted(raw_response_text):
+    """Model output → {"extracted": [...]}, or None if it holds no JSON."""
+    # --- CLEANUP & PARSE (The Robust Part) ---
+    # 1. Remove Markdown code blocks if present
+    clean_text = raw_response_text.replace("```json", "").replace("```", "").strip()
+
+    # 2. Extract JSON payload (prefer object with "extracted", fall back to array/object)
+    json_match = re.search(r"\{.*\}", clean_text, re.DOTALL)
+    array_match = re.search(r"\[.*\]", clean_text, re.DOTALL)
+
+    if json_match:
+        json_string = json_match.group(0)
+        parsed = json.loads(json_string)
+        if isinstance(parsed, dict) and "extracted" in parsed:
+            return parsed
+        if isinstance(parsed, dict):
+            return {"extracted": [parsed]}
+    elif array_match:
+        parsed = json.loads(array_match.group(0))
+        if isinstance(parsed, list):
+            return {"extracted": parsed}
+    else:
+        print("DEBUG: Could not find JSON in response.")
+        return None
+
+
+def analyze_activity_text(text_to_analyze):
+    try:
         # --- PROMPT: USING THE [INST] FORMAT THAT WORKED ---
         # We give it clear examples for Transport, Food, and Energy
         prompt_template = """[INST]
@@ -56,12 +91,7 @@ Input: "{}"
 Output:
 [/INST]"""
 
-        model = Model(
-            model_id=model_id,
-            params=parameters,
-            credentials=credentials,
-            project_id=project_id
-        )
+        model = _get_model()
 
         prompt = prompt_template.format(text_to_analyze)
         
@@ -69,29 +99,70 @@ Output:
         raw_response_text = model.generate_text(prompt=prompt)
         print(f"DEBUG: NLP Raw Response: {raw_response_text}")
 
-        # --- CLEANUP & PARSE (The Robust Part) ---
-        # 1. Remove Markdown code blocks if present
-        clean_text = raw_response_text.replace("```json", "").replace("```", "").strip()
-        
-        # 2. Extract JSON payload (prefer object with "extracted", fall back to array/object)
-        json_match = re.search(r"\{.*\}", clean_text, re.DOTALL)
-        array_match = re.search(r"\[.*\]", clean_text, re.DOTALL)
-        
-        if json_match:
-            json_string = json_match.group(0)
-            parsed = json.loads(json_string)
-            if isinstance(parsed, dict) and "extracted" in parsed:
-                return parsed
-            if isinstance(parsed, dict):
-                return {"extracted": [parsed]}
-        elif array_match:
-            parsed = json.loads(array_match.group(0))
-            if isinstance(parsed, list):
-                return {"extracted": parsed}
-        else:
-            print("DEBUG: Could not find JSON in response.")
+        return _parse_extracted(raw_response_text)
+
+    except Exception as e:
+        print(f"NLP Service Error: {e}")
+        return None
+
+
+def analyze_activity_clauses(clauses):
+    """
+    Batched mode: one LLM call for several pre-split clauses.
+    `clauses` is [(index, text), ...]; every returned activity carries the
+    "index" of the clause it came from.  Activities with a missing or
+    unknown index are dropped, so the caller can fall back per clause.
+    """
+    try:
+        prompt_template = """[INST]
+You are a Carbon Footprint Extractor. Each input line is one activity clause, prefixed with its index in square brackets.
+- activity_type: "TRANSPORT", "FOOD", or "ENERGY".
+- key: "car", "beef", "burger", "electricity", etc.
+- quantity: number.
+- unit: "km", "serving", "kWh".
+- index: the index of the clause the activity came from, copied exactly.
+- Return valid JSON only.
+- Always return an object with an "extracted" array.
+- Each activity must be a separate object inside "extracted".
+- Do not merge quantities or units across different clauses.
+- Skip a clause if it describes no activity.
+- If quantity is implied by "a" or "an", use 1.
+
+Input:
+[0] I took a 25 mile cab ride
+[1] ate 2 burgers
+[2] used 50 kWh of electricity
+Output: {{ "extracted": [{{ "index": 0, "activity_type": "TRANSPORT", "key": "car", "quantity": 25, "unit": "miles" }}, {{ "index": 1, "activity_type": "FOOD", "key": "beef", "quantity": 2, "unit": "serving" }}, {{ "index": 2, "activity_type": "ENERGY", "key": "electricity", "quantity": 50, "unit": "kWh" }}] }}
+
+Input:
+{}
+Output:
+[/INST]"""
+
+        lines = "\n".join(f"[{index}] {text}" for index, text in clauses)
+        # ~60 tokens per activity object, same floor as the single-clause call
+        model = _get_model(max_new_tokens=max(250, 60 * len(clauses) + 40))
+
+        raw_response_text = model.generate_text(prompt=prompt_template.format(lines))
+        print(f"DEBUG: NLP Raw Response (batch of {len(clauses)}): {raw_response_text}")
+
+        parsed = _parse_extracted(raw_response_text)
+        if parsed is None:
             return None
 
+        known = {index for index, _ in clauses}
+        extracted = []
+        for item in parsed.get("extracted", []):
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get("index"))
+            except (TypeError, ValueError):
+                continue
+            if index in known:
+                extracted.append(dict(item, index=index))
+        return {"extracted": extracted}
+
     except Exception as e:
         print(f"NLP Service Error: {e}")
         return None
@@ -40,6 +40,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',                   # CORRECT: Must be at the very top
+    'users.middleware.RequestMetricsMiddleware',               # Per-endpoint latency for /metrics
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',              # MOVED UP: Must be here to serve static files
     'django.contrib.sessions.middleware.SessionMiddleware',
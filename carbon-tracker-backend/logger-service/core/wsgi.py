@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Opt-in (JOB_WORKERS_AUTOSTART): start this worker's async job pool at boot.
+# Runs once per gunicorn worker after the fork; with --preload the threads
+# would be started in the master and lost, so leave it off there.
+from users.views import JOB_POOL, JOB_WORKERS_AUTOSTART  # noqa: E402
+
+if JOB_WORKERS_AUTOSTART:
+    JOB_POOL.start()
@@ -0,0 +1,177 @@
+"""
+Persistent cache of AI service extractions, shared by every worker process.
+
+Granite runs at temperature 0.1, so the same clause comes back with the same
+extraction; a repeat clause — from any user — should not cost an LLM call.
+
+Two tiers:
+  • memory — an LRUCache per process, checked first.
+  • disk   — one SQLite file (WAL) that all workers read and write; survives
+             restarts.
+
+Entries are keyed by the normalized clause text (lowercased, whitespace
+collapsed) and `version`, which names the model + prompt: change it and
+every old entry misses.  Both tiers expire entries after `ttl` seconds.
+Every 256 writes the file is pruned back to `max_entries` rows, least
+recently used first.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .lru_cache import LRUCache
+
+logger = logging.getLogger("logger_service")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    version   TEXT NOT NULL,
+    clause    TEXT NOT NULL,
+    payload   TEXT NOT NULL,
+    created   REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (version, clause)
+);
+CREATE INDEX IF NOT EXISTS extractions_last_used ON extractions (last_used);
+"""
+
+# Size is checked every this many writes, not on each one
+_PRUNE_EVERY = 256
+
+
+def normalize_clause(text):
+    return ' '.join(text.lower().split())
+
+
+class AIExtractionCache:
+
+    def __init__(self, path, version, ttl=7 * 24 * 3600, max_entries=100_000, memory_size=4096):
+        self.path        = Path(path)
+        self.version     = version
+        self.ttl         = ttl
+        self.max_entries = max_entries
+        self.memory      = LRUCache(maxsize=memory_size, ttl=ttl)
+        self._local      = threading.local()
+        self._lock       = threading.Lock()
+        self._writes     = 0
+        self._stats      = {"disk_hits": 0, "disk_misses": 0, "writes": 0,
+                            "expired": 0, "evicted": 0, "errors": 0}
+
+    # ── SQLite ────────────────────────────────────────────────────────────────
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    # ── API ───────────────────────────────────────────────────────────────────
+    def get(self, text):
+        """The cached `extracted` list for a clause, or None."""
+        clause = normalize_clause(text)
+        hit = self.memory.get(clause)
+        if hit is not None:
+            return hit
+
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT payload, created FROM extractions WHERE version = ? AND clause = ?",
+                (self.version, clause),
+            ).fetchone()
+            if row is None:
+                self._count("disk_misses")
+                return None
+            payload, created = row
+            if self.ttl and created + self.ttl <= now:
+                conn.execute("DELETE FROM extractions WHERE version = ? AND clause = ?",
+                             (self.version, clause))
+                self._count("expired")
+                self._count("disk_misses")
+                return None
+            conn.execute(
+                "UPDATE extractions SET last_used = ? WHERE version = ? AND clause = ?",
+                (now, self.version, clause),
+            )
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning("AI cache read failed: %s", e)
+            return None
+
+        extracted = json.loads(payload)
+        self._count("disk_hits")
+        self.memory.set(clause, extracted)
+        return extracted
+
+    def set(self, text, extracted):
+        """Stores a non-empty `extracted` list for a clause."""
+        if not extracted:
+            return
+        clause = normalize_clause(text)
+        self.memory.set(clause, extracted)
+        now = time.time()
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO extractions (version, clause, payload, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.version, clause, json.dumps(extracted), now, now),
+            )
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning("AI cache write failed: %s", e)
+            return
+
+        with self._lock:
+            self._stats["writes"] += 1
+            self._writes += 1
+            prune = self._writes % _PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Drops expired rows, other versions' rows, then LRU rows past max_entries."""
+        try:
+            conn = self._conn()
+            expired = conn.execute(
+                "DELETE FROM extractions WHERE version != ? OR created <= ?",
+                (self.version, time.time() - self.ttl if self.ttl else 0),
+            ).rowcount
+            excess = conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0] - self.max_entries
+            evicted = 0
+            if excess > 0:
+                evicted = conn.execute(
+                    "DELETE FROM extractions WHERE rowid IN "
+                    "(SELECT rowid FROM extractions ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                ).rowcount
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning("AI cache prune failed: %s", e)
+            return
+        self._count("expired", expired)
+        self._count("evicted", evicted)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, version=self.version, path=str(self.path),
+                         ttl=self.ttl, max_entries=self.max_entries)
+        try:
+            stats["disk_size"] = self._conn().execute(
+                "SELECT COUNT(*) FROM extractions WHERE version = ?", (self.version,)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            stats["disk_size"] = None
+        stats["memory"] = self.memory.stats()
+        return stats
@@ -0,0 +1,146 @@
+"""
+HTTP client for the AI service: one pooled keep-alive session shared by every
+worker thread, behind a circuit breaker.
+
+The breaker counts consecutive failures — connection errors, timeouts, 5xx
+and responses slower than `slow_after` seconds.  At `failure_threshold` it
+opens: calls fail fast with AIServiceUnavailable for `cooldown` seconds, so
+clauses go straight to the local classifier instead of each waiting out the
+timeout.  After the cool-down one probe call is let through (half-open); it
+closes the breaker on success and re-opens it on failure.
+
+A call the caller cut short — timed out before `slow_after` because its own
+deadline was tighter — says nothing about the service and is not counted.
+"""
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class AIServiceUnavailable(Exception):
+    """The breaker is open — the call was not attempted."""
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold=5, slow_after=3.0, cooldown=30.0, window=256):
+        self.failure_threshold = failure_threshold
+        self.slow_after = slow_after
+        self.cooldown   = cooldown
+        self._state     = CLOSED
+        self._failures  = 0            # consecutive
+        self._opened_at = 0.0
+        self._probing   = False
+        self._lock      = threading.Lock()
+        self._latencies = deque(maxlen=window)   # seconds, attempted calls only
+        self._stats     = {"calls": 0, "successes": 0, "failures": 0, "slow": 0,
+                           "cut_short": 0, "short_circuited": 0, "opened": 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.cooldown:
+            return HALF_OPEN
+        return self._state
+
+    def allow(self):
+        """True if a call may go out now; a half-open breaker admits one probe."""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._state, self._probing = HALF_OPEN, True
+                return True
+            self._stats["short_circuited"] += 1
+            return False
+
+    def record(self, ok, latency):
+        """Outcome of an admitted call; a slow success still counts as a failure."""
+        slow = latency > self.slow_after
+        with self._lock:
+            self._latencies.append(latency)
+            self._stats["calls"] += 1
+            self._stats["slow"] += slow
+            self._probing = False
+            if ok and not slow:
+                self._stats["successes"] += 1
+                self._failures, self._state = 0, CLOSED
+                return
+            self._stats["failures"] += 1
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._stats["opened"] += 1
+                self._state, self._opened_at = OPEN, time.monotonic()
+
+    def release(self):
+        """An admitted call that ended too early to judge the service."""
+        with self._lock:
+            self._stats["cut_short"] += 1
+            self._probing = False
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            stats = dict(self._stats,
+                         state=self._current_state(now),
+                         consecutive_failures=self._failures,
+                         failure_threshold=self.failure_threshold,
+                         slow_after_s=self.slow_after,
+                         cooldown_s=self.cooldown)
+            if self._state == OPEN:
+                stats["reopens_in_s"] = round(max(0.0, self.cooldown - (now - self._opened_at)), 1)
+            recent = list(self._latencies)
+        if recent:
+            latencies = sorted(recent)
+            stats["latency_ms"] = {
+                "last": round(recent[-1] * 1000, 1),
+                "mean": round(sum(latencies) / len(latencies) * 1000, 1),
+                "p50":  round(latencies[len(latencies) // 2] * 1000, 1),
+                "p95":  round(latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000, 1),
+                "window": len(latencies),
+            }
+        return stats
+
+
+class AIServiceClient:
+
+    def __init__(self, url, pool_size=8, breaker=None):
+        self.url = url
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def post(self, payload, timeout):
+        """POST `payload` as JSON; raises AIServiceUnavailable while the breaker is open."""
+        if not self.breaker.allow():
+            raise AIServiceUnavailable(f"circuit {self.breaker.state}")
+        start = time.monotonic()
+        try:
+            resp = self.session.post(self.url, json=payload, timeout=timeout)
+        except requests.Timeout:
+            elapsed = time.monotonic() - start
+            if elapsed < self.breaker.slow_after:
+                self.breaker.release()      # the caller's deadline, not the service
+            else:
+                self.breaker.record(False, elapsed)
+            raise
+        except requests.RequestException:
+            self.breaker.record(False, time.monotonic() - start)
+            raise
+        self.breaker.record(resp.status_code < 500, time.monotonic() - start)
+        return resp
+
+    def stats(self):
+        return self.breaker.stats()
@@ -0,0 +1,116 @@
+"""
+Row readers for bulk activity imports (NDJSON or CSV uploads).
+
+The upload is read one line at a time from Django's uploaded file — large
+uploads are already spooled to a temp file — so a year of diary entries is
+never held in memory.  Every row is one diary entry:
+
+  NDJSON  {"input_text": "took metro 12 km", "date": "2025-03-14"}
+  CSV     a header row; the text column is input_text / text / entry / note
+          (else the first column), with an optional date column
+
+`date` (or `timestamp`) is optional: ISO 8601, or epoch seconds / ms.
+Rows that cannot be read are yielded with `error` set instead of stopping
+the import.
+"""
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import datetime
+from itertools import islice
+
+ImportRow = namedtuple('ImportRow', 'number text timestamp error')
+
+FORMATS = ('ndjson', 'csv')
+TEXT_FIELDS = ('input_text', 'text', 'entry', 'note')
+DATE_FIELDS = ('date', 'timestamp')
+
+# Epoch values below this are seconds, above it milliseconds (~1973 in ms)
+_EPOCH_MS_FROM = 100_000_000_000
+
+
+def detect_format(upload, requested=None):
+    """'ndjson' or 'csv': the explicit choice, else the file name / content type."""
+    if requested:
+        requested = requested.lower()
+        return 'ndjson' if requested in ('jsonl', 'json') else requested
+    name = (upload.name or '').lower()
+    if name.endswith('.csv') or 'csv' in (upload.content_type or ''):
+        return 'csv'
+    return 'ndjson'
+
+
+def parse_timestamp(value):
+    """Epoch milliseconds for a date / timestamp field, or None if empty."""
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)) or str(value).strip().replace('.', '', 1).isdigit():
+        value = float(value)
+        return int(value if value >= _EPOCH_MS_FROM else value * 1000)
+    try:
+        return int(datetime.fromisoformat(str(value).strip()).timestamp() * 1000)
+    except ValueError:
+        raise ValueError(f"Unreadable date {value!r}; use ISO 8601 or epoch seconds")
+
+
+def _row(number, fields, text_field):
+    text = str(fields.get(text_field) or '').strip()
+    if not text:
+        return ImportRow(number, None, None, f"Missing {text_field}")
+    date_field = next((f for f in DATE_FIELDS if fields.get(f) not in (None, '')), None)
+    try:
+        timestamp = parse_timestamp(fields.get(date_field)) if date_field else None
+    except ValueError as e:
+        return ImportRow(number, None, None, str(e))
+    return ImportRow(number, text, timestamp, None)
+
+
+def iter_ndjson_rows(stream):
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+        except ValueError as e:
+            yield ImportRow(number, None, None, f"Invalid JSON: {e}")
+            continue
+        if isinstance(fields, str):
+            fields = {'input_text': fields}
+        if not isinstance(fields, dict):
+            yield ImportRow(number, None, None, "Expected an object or a string")
+            continue
+        text_field = next((f for f in TEXT_FIELDS if f in fields), 'input_text')
+        yield _row(number, fields, text_field)
+
+
+def iter_csv_rows(stream):
+    reader = csv.DictReader(stream)
+    header = [(name or '').strip().lower() for name in (reader.fieldnames or [])]
+    if not header:
+        return
+    reader.fieldnames = header
+    text_field = next((f for f in TEXT_FIELDS if f in header), header[0])
+    try:
+        for fields in reader:
+            if not any((v or '').strip() for v in fields.values() if isinstance(v, str)):
+                continue
+            yield _row(reader.line_num, fields, text_field)
+    except csv.Error as e:
+        yield ImportRow(reader.line_num, None, None, f"Invalid CSV: {e}")
+
+
+def iter_import_rows(upload, fmt):
+    """Yields an ImportRow per entry of an uploaded NDJSON / CSV file."""
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        yield from (iter_csv_rows if fmt == 'csv' else iter_ndjson_rows)(stream)
+    finally:
+        stream.detach()   # the upload is closed by Django, not by the wrapper
+
+
+def chunked(iterable, size):
+    """Lists of up to `size` items, without reading ahead."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
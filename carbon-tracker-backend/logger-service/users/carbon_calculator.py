@@ -1,225 +1,218 @@
 import logging
+import threading
+from collections import namedtuple
+
+from .factor_catalog import CATALOG, EMISSION_DEFAULTS  # noqa: F401  (re-exported)
 
 logger = logging.getLogger("logger_service")
 
 try:
     from .models import EmissionFactor
+    from .factor_snapshot import get_snapshot
 except ImportError:
     EmissionFactor = None
+    get_snapshot   = None
 
 # ─────────────────────────────────────────────────────────────────────────────
-#  EMISSION FACTOR DEFAULTS
+#  RESOLVED FACTOR TABLE  (process-local, signal-invalidated)
 #
-#  Used ONLY when a key is not found in the Django DB.
-#  Keys are lowercase to match the iexact lookup normalization.
-#  Values match your Django admin entries exactly.
-#  Add new items to Django admin — they automatically take priority.
+#  lowercase key → the DB rows that matter for the lookup priority below,
+#  resolved once.  A steady-state calculate_co2e() costs zero queries; keys
+#  with no DB row are cached too, so defaults-only keys stay query-free.
+#  Misses are answered from the shared factor snapshot (factor_snapshot.py)
+#  when it is mapped, else from the key_normalized index — never an iexact
+#  scan.  Cleared by the EmissionFactor post_save / post_delete signals
+#  (see users/signals.py) and whenever any worker publishes a newer snapshot.
 # ─────────────────────────────────────────────────────────────────────────────
-EMISSION_DEFAULTS = {
-    # ── YOUR CURRENT DB ENTRIES (emergency offline fallback) ─────────────────
-    "apple":                        0.06,    # kg CO₂e / kg
-    "pear":                         0.43,    # kg CO₂e / kg
-    "buffalo_milk_packet":          1.70,    # kg CO₂e / litre
-    "paneer_indian":                8.20,    # kg CO₂e / kg
-    "wheat_atta_india":             1.15,    # kg CO₂e / kg
-    "rice_white_india":             3.55,    # kg CO₂e / kg
-    "indian_railways_sleeper":      0.02,    # kg CO₂e / km
-    "indian_railways_sleeper_train": 0.02,   # kg CO₂e / km
-    "bus_city_nonac_india":         0.05,    # kg CO₂e / km
-    "two_wheeler_petrol_100cc":     0.045,   # kg CO₂e / km
-    "bike_100cc":                   0.045,   # kg CO₂e / km
-    "auto_rickshaw_cng":            0.08,    # kg CO₂e / km
-    "lpg_cooking_india":            2.98,    # kg CO₂e / kg
-    "lpg_cooking_gas_india":        2.98,    # kg CO₂e / kg
-    "electricity_india_grid":       0.71,    # kg CO₂e / kWh
-
-    # ── FOOD (not yet in your DB — add via Django admin when ready) ───────────
-    "chicken_curry_indian":         6.90,
-    "chicken":                      6.90,
-    "beef":                        27.00,
-    "mutton":                      39.20,
-    "lamb":                        39.20,
-    "pork":                         7.60,
-    "fish":                         3.49,
-    "egg":                          4.80,
-    "milk":                         3.15,
-    "cheese":                      13.50,
-    "butter":                      11.90,
-    "bread":                        1.00,
-    "roti":                         0.90,
-    "dal":                          0.90,
-    "potato":                       0.46,
-    "tomato":                       1.44,
-    "onion":                        0.50,
-    "banana":                       0.86,
-    "orange":                       0.43,
-    "coffee":                      17.00,
-    "tea":                          0.34,
-    "chocolate":                   18.70,
-    "sugar":                        3.00,
-    "food":                         2.50,   # generic fallback
-
-    # ── ADDITIONAL FOOD ITEMS ─────────────────────────────────────────────────
-    # Fast food / Western
-    "burger":                       3.50,    # kg CO₂e / piece (~200g beef+bun)
-    "pizza":                        1.60,    # kg CO₂e / slice (~150g)
-    "sandwich":                     1.20,    # kg CO₂e / piece
-    "pasta":                        1.20,    # kg CO₂e / kg
-    "noodles":                      1.10,    # kg CO₂e / kg
-    "maggi":                        1.10,    # kg CO₂e / kg (instant noodles)
-
-    # Indian snacks / meals
-    "samosa":                       0.80,    # kg CO₂e / piece (~100g)
-    "idli":                         0.40,    # kg CO₂e / piece (~50g rice+dal)
-    "dosa":                         0.60,    # kg CO₂e / piece (~100g)
-    "vada":                         0.50,    # kg CO₂e / piece
-    "poha":                         0.60,    # kg CO₂e / kg
-    "upma":                         0.65,    # kg CO₂e / kg
-    "paratha":                      0.90,    # kg CO₂e / piece (~80g wheat+oil)
-    "chapati":                      0.90,    # kg CO₂e / piece (same as roti)
-    "puri":                         1.00,    # kg CO₂e / piece (fried)
-    "dhokla":                       0.50,    # kg CO₂e / kg
-    "khichdi":                      1.20,    # kg CO₂e / kg (rice+dal)
-    "rajma":                        0.90,    # kg CO₂e / kg
-    "chole":                        0.85,    # kg CO₂e / kg
-    "pav_bhaji":                    1.40,    # kg CO₂e / plate
-    "biryani":                      3.20,    # kg CO₂e / plate (~300g rice+chicken)
-    "halwa":                        2.10,    # kg CO₂e / kg (wheat+ghee+sugar)
-    "kheer":                        2.80,    # kg CO₂e / kg (milk+rice+sugar)
-    "lassi":                        1.50,    # kg CO₂e / litre
-
-    # Fruits & Vegetables
-    "mango":                        0.50,    # kg CO₂e / kg
-    "grapes":                       0.90,    # kg CO₂e / kg
-    "watermelon":                   0.30,    # kg CO₂e / kg
-    "papaya":                       0.40,    # kg CO₂e / kg
-    "guava":                        0.35,    # kg CO₂e / kg
-    "pomegranate":                  0.60,    # kg CO₂e / kg
-    "lemon":                        0.40,    # kg CO₂e / kg
-    "carrot":                       0.40,    # kg CO₂e / kg
-    "spinach":                      0.20,    # kg CO₂e / kg
-    "cauliflower":                  0.40,    # kg CO₂e / kg
-    "cabbage":                      0.30,    # kg CO₂e / kg
-    "brinjal":                      0.35,    # kg CO₂e / kg
-    "eggplant":                     0.35,    # kg CO₂e / kg
-    "capsicum":                     0.60,    # kg CO₂e / kg
-    "cucumber":                     0.25,    # kg CO₂e / kg
-    "peas":                         0.80,    # kg CO₂e / kg
-
-    # Dairy & Beverages
-    "curd":                         1.60,    # kg CO₂e / kg
-    "dahi":                         1.60,    # kg CO₂e / kg
-    "ghee":                        15.00,    # kg CO₂e / kg (clarified butter)
-    "ice_cream":                    3.50,    # kg CO₂e / kg
-    "juice":                        0.80,    # kg CO₂e / litre
-    "cold_drink":                   0.40,    # kg CO₂e / litre (soda/cola)
-    "soda":                         0.40,    # kg CO₂e / litre
-    "cola":                         0.40,    # kg CO₂e / litre
-    "water_bottle":                 0.15,    # kg CO₂e / litre (packaged)
-
-    # Nuts & Dry fruits
-    "almond":                       3.50,    # kg CO₂e / kg
-    "cashew":                       3.00,    # kg CO₂e / kg
-    "peanut":                       2.00,    # kg CO₂e / kg
-    "groundnut":                    2.00,    # kg CO₂e / kg
-    "walnut":                       3.50,    # kg CO₂e / kg
-
-    # ── TRANSPORT (not yet in your DB) ────────────────────────────────────────
-    "car_petrol":                   0.192,
-    "car_diesel":                   0.171,
-    "car_electric":                 0.053,
-    "car_cng":                      0.140,
-    "car":                          0.192,
-    "two_wheeler_petrol":           0.060,
-    "two_wheeler_electric":         0.015,
-    "motorbike":                    0.114,
-    "bus_city_ac_india":            0.082,
-    "bus":                          0.089,
-    "metro_india":                  0.031,
-    "train_india":                  0.041,
-    "flight_domestic":              0.255,
-    "flight_international":         0.195,
-    "flight":                       0.255,
-    "taxi":                         0.211,
-    "cycle":                        0.000,
-    "walk":                         0.000,
-
-    # ── ENERGY (not yet in your DB) ───────────────────────────────────────────
-    "png_cooking":                  2.204,
-    "natural_gas":                  2.204,
-    "firewood":                     1.900,
-    "coal":                         2.420,
-    "diesel_generator":             2.680,
-
-    # ── WASTE ─────────────────────────────────────────────────────────────────
-    "plastic_waste":                6.000,
-    "food_waste":                   0.500,
-    "paper_waste":                  1.290,
-    "ewaste":                      20.000,
-    "waste":                        0.500,
-}
+_FACTOR_TABLE            = {}
+_FACTOR_TABLE_LOCK       = threading.Lock()
+_FACTOR_TABLE_GENERATION = 0
+_FACTOR_TABLE_SNAPSHOT   = None   # snapshot version the table was built from
+_FACTOR_TABLE_STATS      = {"hits": 0, "misses": 0, "invalidations": 0}
+_FACTOR_ROW_FIELDS       = ('id', 'version', 'co2e_per_unit', 'status', 'is_verified_factor', 'added_by_id')
 
+# factor_id/version identify the EmissionFactor row used (None/0 for defaults);
+# activity logs are stamped with them so recompute_co2e can spot stale values.
+ResolvedFactor = namedtuple('ResolvedFactor', 'value is_verified factor_id version')
 
-def calculate_co2e(key, quantity, unit=None, request_user=None):
+
+def _row_factor(row):
+    """ResolvedFactor for one EmissionFactor values() row."""
+    return ResolvedFactor(
+        float(row['co2e_per_unit']),
+        row['status'] == 'verified' or bool(row['is_verified_factor']),
+        row['id'],
+        row['version'],
+    )
+
+
+def _resolve_rows(rows):
     """
-    Calculates CO₂ equivalent for a given activity.
+    Collapses every DB row for one key into
+    (verified, {user_id: own_pending}, any_record) — each a
+    ResolvedFactor or None.  Rows must be ordered by pk so
+    "first" means the same thing it did with QuerySet.first().
+    """
+    if not rows:
+        return None, {}, None
 
-    DB lookup priority:
-      1. 'verified' status factor  (admin-approved, highest trust)
-      2. User's own 'pending' custom factor
-      3. Any other DB record (legacy seeded data)
-      4. EMISSION_DEFAULTS dict   (offline fallback)
+    verified = next((r for r in rows if r['status'] == 'verified'), None) \
+        or next((r for r in rows if r['is_verified_factor']), None)
 
-    All quantities are assumed to already be in base units (kg, km, kWh)
-    by the time they reach this function — unit conversion happens in views.py.
+    pending = {}
+    for r in rows:
+        if r['status'] == 'pending' and r['added_by_id'] is not None:
+            pending.setdefault(r['added_by_id'], _row_factor(r))
 
-    Returns: (co2e_kg: float, is_verified: bool)
+    return (
+        _row_factor(verified) if verified else None,
+        pending,
+        _row_factor(rows[0]),
+    )
+
+
+def _sync_with_snapshot():
     """
-    logger.debug("Calculator: key='%s', qty=%s, unit=%s", key, quantity, unit)
+    Returns the current factor snapshot (None → use the DB) and drops every
+    resolved key if it came from a different snapshot version.
+    """
+    global _FACTOR_TABLE_GENERATION, _FACTOR_TABLE_SNAPSHOT
+    snapshot = get_snapshot() if get_snapshot else None
+    version  = snapshot.version if snapshot else None
+    if version != _FACTOR_TABLE_SNAPSHOT:
+        with _FACTOR_TABLE_LOCK:
+            if version != _FACTOR_TABLE_SNAPSHOT:
+                _FACTOR_TABLE.clear()
+                _FACTOR_TABLE_GENERATION += 1
+                _FACTOR_TABLE_SNAPSHOT = version
+                _FACTOR_TABLE_STATS["invalidations"] += 1
+    return snapshot
+
+
+def _lookup_db_factor(key, request_user=None):
+    """
+    Returns a ResolvedFactor from the resolved table, loading the key from
+    the snapshot (or DB) on a miss.  None when no row exists.
+    """
+    snapshot = _sync_with_snapshot()
+    lookup = str(key).lower().strip()
 
+    with _FACTOR_TABLE_LOCK:
+        entry = _FACTOR_TABLE.get(lookup)
+        if entry is not None:
+            _FACTOR_TABLE_STATS["hits"] += 1
+        else:
+            _FACTOR_TABLE_STATS["misses"] += 1
+        generation = _FACTOR_TABLE_GENERATION
+
+    if entry is None:
+        if snapshot is not None:
+            rows = snapshot.lookup(lookup)
+        else:
+            rows = list(
+                EmissionFactor.objects.filter(key_normalized=lookup)
+                .order_by('pk')
+                .values(*_FACTOR_ROW_FIELDS)
+            )
+        entry = _resolve_rows(rows)
+        with _FACTOR_TABLE_LOCK:
+            # Don't resurrect a row a concurrent signal just invalidated
+            if generation == _FACTOR_TABLE_GENERATION:
+                _FACTOR_TABLE[lookup] = entry
+
+    verified, pending, any_record = entry
+    user_id = getattr(request_user, 'pk', None) if request_user else None
+    return verified or (pending.get(user_id) if user_id is not None else None) or any_record
+
+
+def _prefetch_db_factors(keys):
+    """
+    Loads every key not yet in the resolved table with ONE query, so a batch
+    of N activities costs at most one DB round trip.  With a mapped snapshot
+    there is nothing to prefetch — misses resolve from shared memory.
+    """
+    if _sync_with_snapshot() is not None:
+        return
+
+    with _FACTOR_TABLE_LOCK:
+        missing = {str(k).lower().strip() for k in keys if k} - _FACTOR_TABLE.keys()
+        generation = _FACTOR_TABLE_GENERATION
+    if not missing:
+        return
+
+    grouped = {k: [] for k in missing}
+    rows = (
+        EmissionFactor.objects.filter(key_normalized__in=missing)
+        .order_by('pk')
+        .values('key_normalized', *_FACTOR_ROW_FIELDS)
+    )
+    for row in rows:
+        grouped[row['key_normalized']].append(row)
+
+    with _FACTOR_TABLE_LOCK:
+        if generation == _FACTOR_TABLE_GENERATION:
+            for lookup, key_rows in grouped.items():
+                _FACTOR_TABLE[lookup] = _resolve_rows(key_rows)
+    logger.debug("Prefetched %d factor key(s) in one query", len(missing))
+
+
+def clear_factor_cache():
+    """Drops every resolved key. Wired to EmissionFactor save/delete signals."""
+    global _FACTOR_TABLE_GENERATION
+    with _FACTOR_TABLE_LOCK:
+        _FACTOR_TABLE.clear()
+        _FACTOR_TABLE_GENERATION += 1
+        _FACTOR_TABLE_STATS["invalidations"] += 1
+    logger.debug("Resolved factor table invalidated")
+
+
+def get_factor_cache_stats():
+    """Hit/miss counters for the resolved factor table."""
+    with _FACTOR_TABLE_LOCK:
+        stats = dict(_FACTOR_TABLE_STATS)
+        stats["size"] = len(_FACTOR_TABLE)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def _parse_quantity(key, quantity):
+    """Validated float quantity, or None when the activity should score 0."""
     if not key or quantity is None:
-        return 0.0, False
+        return None
 
     try:
         quantity = float(quantity)
     except (ValueError, TypeError):
         logger.warning("Invalid quantity '%s' for key '%s'", quantity, key)
-        return 0.0, False
+        return None
 
     if quantity < 0:
         logger.warning("Negative quantity %.4f for key '%s' — returning 0", quantity, key)
-        return 0.0, False
+        return None
 
-    factor_value = 0.0
-    is_verified  = False
+    return quantity
 
-    # ── STEP 1: Django database ───────────────────────────────────────────────
-    if EmissionFactor:
-        try:
-            factors = EmissionFactor.objects.filter(key__iexact=key)
 
-            if factors.exists():
-                # 1a. Verified by admin
-                ef = (
-                    factors.filter(status='verified').first()
-                    or factors.filter(is_verified_factor=True).first()
-                )
-
-                # 1b. User's own pending custom factor
-                if not ef and request_user:
-                    ef = factors.filter(status='pending', added_by=request_user).first()
+def _resolve_factor(key, request_user=None):
+    """
+    Returns the ResolvedFactor for a key.
 
-                # 1c. Any record (legacy seeded data without status field)
-                if not ef:
-                    ef = factors.first()
+    DB lookup priority:
+      1. 'verified' status factor  (admin-approved, highest trust)
+      2. User's own 'pending' custom factor
+      3. Any other DB record (legacy seeded data)
+      4. EMISSION_DEFAULTS dict   (offline fallback)
+    """
+    factor = ResolvedFactor(0.0, False, None, 0)
 
-                if ef:
-                    factor_value = float(ef.co2e_per_unit)
-                    is_verified  = (
-                        getattr(ef, 'status', None) == 'verified'
-                        or bool(getattr(ef, 'is_verified_factor', False))
-                    )
-                    logger.debug("DB hit: factor=%.4f, verified=%s", factor_value, is_verified)
+    # ── STEP 1: Django database (via the resolved factor table) ─────────────
+    if EmissionFactor:
+        try:
+            resolved = _lookup_db_factor(key, request_user)
+            if resolved:
+                factor = resolved
+                logger.debug("DB hit: factor=%.4f, verified=%s", factor.value, factor.is_verified)
 
         except Exception as db_err:
             logger.error("DB query error for key '%s': %s", key, db_err)
@@ -227,31 +220,90 @@ def calculate_co2e(key, quantity, unit=None, request_user=None):
             try:
                 ef = EmissionFactor.objects.filter(key__iexact=key).first()
                 if ef:
-                    factor_value = float(ef.co2e_per_unit)
-                    is_verified  = (
+                    factor = ResolvedFactor(
+                        float(ef.co2e_per_unit),
                         getattr(ef, 'status', None) == 'verified'
-                        or bool(getattr(ef, 'is_verified_factor', False))
+                        or bool(getattr(ef, 'is_verified_factor', False)),
+                        ef.pk,
+                        getattr(ef, 'version', 0),
                     )
-                    logger.debug("DB fallback hit: factor=%.4f", factor_value)
+                    logger.debug("DB fallback hit: factor=%.4f", factor.value)
             except Exception:
                 pass
 
-    # ── STEP 2: EMISSION_DEFAULTS dict ───────────────────────────────────────
-    if factor_value == 0.0:
-        lookup = str(key).lower().strip()
-        factor_value = EMISSION_DEFAULTS.get(lookup, 0.0)
-
-        # Try base key (e.g. "bus_city_nonac_india" not found → try "bus")
-        if factor_value == 0.0:
-            base = lookup.split('_')[0]
-            factor_value = EMISSION_DEFAULTS.get(base, 0.0)
+    # ── STEP 2: EMISSION_DEFAULTS (compiled catalog) ─────────────────────────
+    if factor.value == 0.0:
+        # Exact key, then base key (e.g. "bus_city_nonac_india" → "bus")
+        default_value = CATALOG.default_factor(key)
 
-        if factor_value != 0.0:
-            is_verified = False
-            logger.debug("Defaults hit: key='%s', factor=%.4f", lookup, factor_value)
+        if default_value != 0.0:
+            factor = ResolvedFactor(default_value, False, None, 0)
+            logger.debug("Defaults hit: key='%s', factor=%.4f", key, default_value)
         else:
             logger.warning("No emission factor found for key='%s'", key)
 
-    result = round(quantity * factor_value, 4)
-    logger.debug("Result: %.6f × %.4f = %.4f kg CO₂e", quantity, factor_value, result)
-    return result, is_verified
+    return factor
+
+
+def calculate_co2e(key, quantity, unit=None, request_user=None):
+    """
+    Calculates CO₂ equivalent for a given activity.
+
+    Factor lookup priority is documented on _resolve_factor().
+
+    All quantities are assumed to already be in base units (kg, km, kWh)
+    by the time they reach this function — unit conversion happens in views.py.
+
+    Returns: (co2e_kg: float, is_verified: bool)
+    """
+    logger.debug("Calculator: key='%s', qty=%s, unit=%s", key, quantity, unit)
+
+    quantity = _parse_quantity(key, quantity)
+    if quantity is None:
+        return 0.0, False
+
+    factor = _resolve_factor(key, request_user)
+
+    result = round(quantity * factor.value, 4)
+    logger.debug("Result: %.6f × %.4f = %.4f kg CO₂e", quantity, factor.value, result)
+    return result, factor.is_verified
+
+
+def calculate_co2e_many(items, with_factor=False):
+    """
+    Batch version of calculate_co2e().
+
+    items: iterable of (key, quantity, unit, request_user) tuples.
+    Every uncached factor is resolved with a single key_normalized__in
+    query, the EMISSION_DEFAULTS fallback applies per key as usual, and each
+    result is rounded exactly as calculate_co2e() rounds it.
+
+    Returns: [(co2e_kg: float, is_verified: bool), ...] in input order, or
+    (co2e_kg, is_verified, ResolvedFactor) triples when with_factor=True.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    if EmissionFactor:
+        try:
+            _prefetch_db_factors(key for key, _, _, _ in items)
+        except Exception as db_err:
+            # Per-key lookups below still have their own safety net
+            logger.error("DB batch query error: %s", db_err)
+
+    no_factor = ResolvedFactor(0.0, False, None, 0)
+    results   = []
+
+    for key, quantity, unit, request_user in items:
+        quantity = _parse_quantity(key, quantity)
+        if quantity is None:
+            results.append((0.0, no_factor))
+            continue
+        factor = _resolve_factor(key, request_user)
+        results.append((round(quantity * factor.value, 4), factor))
+
+    logger.debug("Batch calculated %d activities", len(items))
+    if with_factor:
+        return [(co2e, f.is_verified, f) for co2e, f in results]
+    return [(co2e, f.is_verified) for co2e, f in results]
@@ -0,0 +1,197 @@
+"""
+Single-pass clause lexer.
+
+One precompiled regex walks a lowercased clause once and emits typed tokens
+with their spans.  extract_quantity, detect_unit_from_text and
+fallback_classify (views.py) all read the same token stream instead of
+re-scanning the text with their own patterns; number–unit pairs come from
+token adjacency.
+
+Token kinds:
+  FRACTION  "1/2"            value = numerator / denominator (None if /0)
+  NUMBER    "12", "1.5", "5."  value = float; a '.' right before the
+            digits is left out of the token (see dotted_value)
+  UNIT      a unit word ("kg", "hours") or the first word of a unit alias
+            phrase ("kilowatt" in "kilowatt hour"); value = the alias phrase
+            matched at this word on whole-word boundaries, else None
+  WORDNUM   "two", "half"    value = WORD_NUM_DICT entry
+  TRIGGER   a SPECIFIC_KEY_MAP phrase on whole-word boundaries, emitted
+            just before the WORD/UNIT/WORDNUM token it starts at; value =
+            its longest-first rank (lower wins)
+  WORD      any other run of a-z
+
+`bounded` is True when the token is a whole \\w-run — what a \\b...\\b
+regex would match.  "g" in "200g" is a UNIT but not bounded.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from .factor_catalog import CATALOG
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  WORD → NUMBER MAPPING
+# ─────────────────────────────────────────────────────────────────────────────
+WORD_NUM_DICT = {
+    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4,
+    'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+    'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15,
+    'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19, 'twenty': 20,
+    'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70,
+    'eighty': 80, 'ninety': 90, 'hundred': 100,
+    'half': 0.5, 'quarter': 0.25,
+    'twice': 2, 'thrice': 3, 'couple': 2,
+    'once': 1, 'double': 2, 'triple': 3,
+}
+
+# Units a number may be paired with for quantity extraction
+QUANTITY_UNITS = frozenset({
+    'kg', 'kgs', 'grams', 'gram', 'gm', 'gms', 'mg', 'km', 'kms', 'kilometers',
+    'kilometres', 'mile', 'miles', 'kwh', 'litre', 'litres', 'liter', 'liters',
+    'piece', 'pieces', 'slice', 'slices', 'serving', 'servings', 'plate', 'bowl',
+    'cup', 'glass', 'hour', 'hours', 'hr', 'hrs',
+})
+
+FRACTION, NUMBER, UNIT, WORDNUM, TRIGGER, WORD = (
+    'FRACTION', 'NUMBER', 'UNIT', 'WORDNUM', 'TRIGGER', 'WORD',
+)
+
+_UNIT_WORDS = (
+    QUANTITY_UNITS
+    | {'g', 'ml'}
+    | {alias.replace('-', ' ').split()[0] for alias in CATALOG.unit_aliases_longest_first}
+)
+_TRIGGER_RANK = {t: i for i, t in enumerate(CATALOG.triggers_longest_first)}
+_ALIAS_RANK   = {a: i for i, a in enumerate(CATALOG.unit_aliases_longest_first)}
+
+
+def _alternation(phrases):
+    return '|'.join(re.escape(p) for p in phrases)
+
+
+_LEXER = re.compile(
+    r'(?P<fraction>(?P<num>\d+)\s*/\s*(?P<den>\d+))'
+    # A '.' that starts another fraction is not a decimal point: "1.5/2" → "5/2"
+    r'|(?P<number>\d+(?:\.(?!\d+\s*/\s*\d)\d*)?)'
+    # At the start of a \w-run, peek for a trigger / unit alias phrase
+    r'|(?:(?<!\w)(?=(?P<trigger>' + _alternation(CATALOG.triggers_longest_first) + r')\b))?'
+    r'(?:(?<!\w)(?=(?P<alias>' + _alternation(CATALOG.unit_aliases_longest_first) + r')\b))?'
+    r'(?P<word>[a-z]+)'
+)
+
+Token = namedtuple('Token', 'kind text start end value bounded')
+LexedClause = namedtuple('LexedClause', 'text tokens')
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+
+@lru_cache(maxsize=4096)
+def lex_clause(text: str) -> LexedClause:
+    """Lowercases `text` and tokenizes it in one pass (memoized)."""
+    text = text.lower()
+    n, tokens = len(text), []
+    for m in _LEXER.finditer(text):
+        start, end = m.span()
+        bounded = (start == 0 or not _is_word_char(text[start - 1])) \
+            and (end == n or not _is_word_char(text[end]))
+
+        if m.group('fraction'):
+            den = int(m.group('den'))
+            value = round(int(m.group('num')) / den, 4) if den else None
+            tokens.append(Token(FRACTION, m.group(0), start, end, value, bounded))
+        elif m.group('number'):
+            tokens.append(Token(NUMBER, m.group(0), start, end, float(m.group(0)), bounded))
+        else:
+            word, trigger, alias = m.group('word'), m.group('trigger'), m.group('alias')
+            if trigger:
+                tokens.append(Token(TRIGGER, trigger, start, start + len(trigger),
+                                    _TRIGGER_RANK[trigger], True))
+            if alias or word in _UNIT_WORDS:
+                tokens.append(Token(UNIT, word, start, end, alias, bounded))
+            elif word in WORD_NUM_DICT:
+                tokens.append(Token(WORDNUM, word, start, end, WORD_NUM_DICT[word], bounded))
+            else:
+                tokens.append(Token(WORD, word, start, end, None, bounded))
+    return LexedClause(text, tuple(tokens))
+
+
+def as_clause(text_or_clause) -> LexedClause:
+    """Accepts raw text or an already lexed clause."""
+    if isinstance(text_or_clause, LexedClause):
+        return text_or_clause
+    return lex_clause(text_or_clause)
+
+
+def words(clause: LexedClause) -> list:
+    """Whole-word a-z tokens — what re.findall(r'\\b[a-z]+\\b', text) returned."""
+    return [t.text for t in clause.tokens if t.kind in (UNIT, WORDNUM, WORD) and t.bounded]
+
+
+def _numeric_before(clause: LexedClause, i: int):
+    """The NUMBER / FRACTION token directly before token i (whitespace-only gap)."""
+    tokens = clause.tokens
+    j = i - 1
+    while j >= 0 and tokens[j].kind == TRIGGER:
+        j -= 1
+    if j < 0 or tokens[j].kind not in (NUMBER, FRACTION):
+        return None
+    gap = clause.text[tokens[j].end:tokens[i].start]
+    return tokens[j] if not gap or gap.isspace() else None
+
+
+def dotted_value(clause: LexedClause, tok: Token):
+    """Value of a NUMBER read with the '.' just before it ('x.5' → 0.5), or None."""
+    if tok.start and clause.text[tok.start - 1] == '.':
+        return float('.' + tok.text.split('.')[0])
+    return None
+
+
+def number_before(clause: LexedClause, i: int, dotted: bool = True):
+    """
+    The number directly before token i, read the way r'(\\d+\\.?\\d*|\\.\\d+)\\s*'
+    would (whitespace-only gap), or None.  dotted=False drops the '\\.\\d+' form.
+    """
+    tokens = clause.tokens
+    j = i - 1
+    while j >= 0 and tokens[j].kind == TRIGGER:
+        j -= 1
+    if j < 0 or tokens[j].kind != NUMBER:
+        return None
+    num, gap = tokens[j], clause.text[tokens[j].end:tokens[i].start]
+    if gap.startswith('.') and '.' in num.text[:-1]:
+        # "0.5. kg" — the unit belongs to "5.", the tail after the decimal point
+        rest = gap[1:]
+        return float(num.text.rsplit('.', 1)[1]) if not rest or rest.isspace() else None
+    if gap and not gap.isspace():
+        return None
+    if dotted and num.text.isdigit():
+        value = dotted_value(clause, num)
+        if value is not None:
+            return value
+    return num.value
+
+
+def follows_digit(clause: LexedClause, i: int) -> bool:
+    """True if token i comes right after a digit, spaces allowed — r'\\d\\s*<tok>'."""
+    prev = _numeric_before(clause, i)
+    return prev is not None and prev.text[-1].isdigit()
+
+
+def right_bounded(clause: LexedClause, i: int) -> bool:
+    """True if no \\w character follows token i."""
+    end = clause.tokens[i].end
+    return end == len(clause.text) or not _is_word_char(clause.text[end])
+
+
+def best_trigger(clause: LexedClause):
+    """Longest-first SPECIFIC_KEY_MAP trigger in the clause, or None."""
+    found = [t for t in clause.tokens if t.kind == TRIGGER]
+    return min(found, key=lambda t: t.value).text if found else None
+
+
+def best_unit_alias(clause: LexedClause):
+    """Longest-first multi-char unit alias on whole-word boundaries, or None."""
+    found = [t.value for t in clause.tokens if t.kind == UNIT and t.value]
+    return min(found, key=_ALIAS_RANK.__getitem__) if found else None
@@ -1,73 +1,202 @@
-from ibmcloudant.cloudant_v1 import CloudantV1
+import logging
+import threading
+
+import requests
+from ibmcloudant.cloudant_v1 import BulkDocs, CloudantV1, Document, IndexDefinition, IndexField
 from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
 from ibm_cloud_sdk_core.api_exception import ApiException
+from ibm_cloud_sdk_core.http_adapter import SSLHTTPAdapter
 from decouple import config
 
-def get_cloudant_client():
+logger = logging.getLogger("logger_service")
+
+# Keep-alive connections kept open to Cloudant (per process)
+CLOUDANT_POOL_SIZE = config("CLOUDANT_POOL_SIZE", default=16, cast=int)
+
+_CLIENT      = None
+_CLIENT_LOCK = threading.Lock()
+
+# Set once 'activity-logs' and its indexes are known to exist in this process
+_DB_READY    = False
+_DB_LOCK     = threading.Lock()
+
+# Mango indexes for the queries run against activity-logs:
+# history (get_user_logs_cloudant) and recompute_co2e
+ACTIVITY_INDEX_DDOC = "activity-logs-indexes"
+ACTIVITY_INDEXES = {
+    "by-username": "username",
+    "by-key":      "key",
+}
+
+
+def _build_cloudant_client():
     """
-    Returns an authenticated Cloudant client using credentials from .env.
+    A new authenticated Cloudant client using credentials from .env.
     """
     api_key = config("CLOUDANT_APIKEY", default=None)
     url = config("CLOUDANT_URL", default=None)
 
     if not api_key or not url:
-        print("CRITICAL: CLOUDANT_APIKEY or CLOUDANT_URL is missing in .env")
+        logger.critical("CLOUDANT_APIKEY or CLOUDANT_URL is missing in .env")
         return None
     
     try:
         # Connect to IBM Cloud using IAM Authentication
-        authenticator = IAMAuthenticator(api_key)
+        # (CLOUDANT_IAM_URL only for private endpoints / a local stand-in)
+        authenticator = IAMAuthenticator(api_key, url=config("CLOUDANT_IAM_URL", default=None))
         client = CloudantV1(authenticator=authenticator)
         client.set_service_url(url)
+        # One pool shared by every request thread instead of requests' default 10
+        adapter = SSLHTTPAdapter(pool_connections=1, pool_maxsize=CLOUDANT_POOL_SIZE)
+        client.http_client.mount('http://', adapter)
+        client.http_client.mount('https://', adapter)
         return client
     except Exception as e:
-        print(f"Error initializing Cloudant client: {e}")
+        logger.error("Error initializing Cloudant client: %s", e)
         return None
 
+def get_cloudant_client():
+    """
+    Returns the process-wide Cloudant client, built on first use.
+
+    Sharing one client means one IAM token — fetched once, then refreshed
+    by the SDK's token manager after 80% of its lifetime — and one
+    keep-alive session, so saves skip the token exchange and TLS setup.
+    Safe to use from any thread.  Returns None if credentials are missing.
+    """
+    global _CLIENT
+    client = _CLIENT
+    if client is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = _build_cloudant_client()
+            client = _CLIENT
+    return client
+
+def reset_cloudant_client():
+    """Drops the shared client, e.g. after rotating CLOUDANT_APIKEY."""
+    global _CLIENT, _DB_READY
+    with _CLIENT_LOCK:
+        _CLIENT = None
+        _DB_READY = False
+
+def ensure_activity_db(client, recheck=False):
+    """
+    Makes sure 'activity-logs' and its indexes exist.  Runs once per process
+    (the first write); afterwards it returns at once unless `recheck` is set,
+    which the writers do only when Cloudant answers 404.
+    """
+    global _DB_READY
+    if _DB_READY and not recheck:
+        return True
+
+    db_name = "activity-logs"
+    with _DB_LOCK:
+        if _DB_READY and not recheck:
+            return True
+        try:
+            client.get_database_information(db=db_name).get_result()
+        except ApiException as ae:
+            if ae.code != 404:
+                logger.error("Error checking database: %s", ae)
+                return False
+            logger.info("Database '%s' not found. Creating it...", db_name)
+            try:
+                client.put_database(db=db_name).get_result()
+            except ApiException as creation_error:
+                if creation_error.code != 412:     # 412: another worker just created it
+                    logger.error("Error creating database: %s", creation_error)
+                    return False
+
+        # Idempotent — an existing index is left alone
+        for name, field in ACTIVITY_INDEXES.items():
+            try:
+                client.post_index(
+                    db=db_name, ddoc=ACTIVITY_INDEX_DDOC, name=name, type="json",
+                    index=IndexDefinition(fields=[IndexField(**{field: "asc"})]),
+                ).get_result()
+            except ApiException as index_error:
+                # Queries still work without the index, just slower
+                logger.warning("Error creating index '%s': %s", name, index_error)
+
+        _DB_READY = True
+        return True
+
 def save_activity_log(data):
     """
     Saves a dictionary (JSON) to the 'activity-logs' database in Cloudant.
+    A document with an _id that is already stored counts as saved, so
+    re-running a job does not duplicate its logs.
     """
     client = get_cloudant_client()
-    if not client:
+    if not client or not ensure_activity_db(client):
         return False
 
     db_name = "activity-logs"
     
-    # Check if DB exists, if not create it
-    try:
-        client.get_database_information(db=db_name).get_result()
-    except ApiException as ae:
-        if ae.code == 404:
-            print(f"Database '{db_name}' not found. Creating it...")
-            try:
-                client.put_database(db=db_name).get_result()
-            except ApiException as creation_error:
-                print(f"Error creating database: {creation_error}")
-                return False
-        else:
-            print(f"Error checking database: {ae}")
-            return False
-    
     # Save the document
     try:
-        print(f"DEBUG: Saving log for {data.get('username')} to Cloudant...")
-        response = client.post_document(
-            db=db_name,
-            document=data
-        ).get_result()
+        logger.debug("Saving log for %s to Cloudant...", data.get('username'))
+        try:
+            try:
+                response = client.post_document(db=db_name, document=data).get_result()
+            except ApiException as e:
+                # Database deleted since it was ensured — recreate it and retry once
+                if e.code != 404 or not ensure_activity_db(client, recheck=True):
+                    raise
+                response = client.post_document(db=db_name, document=data).get_result()
+        except ApiException as e:
+            # 409 on an _id we chose: saved by an earlier attempt
+            if e.code != 409 or '_id' not in data:
+                raise
+            logger.debug("Log %s already saved, skipping.", data['_id'])
+            return True
         
         if response.get('ok'):
-            print("DEBUG: Successfully saved to Cloudant.")
+            logger.debug("Successfully saved to Cloudant.")
             return True
         else:
-            print("DEBUG: Cloudant accepted request but returned 'not ok'.")
+            logger.warning("Cloudant accepted request but returned 'not ok'.")
             return False
 
     except ApiException as e:
-        print(f"CRITICAL CLOUDANT ERROR: {e}")
+        logger.error("Cloudant save failed: %s", e)
         return False
 
+def save_activity_logs_bulk(docs):
+    """
+    Saves many documents to 'activity-logs' with one _bulk_docs request.
+    Returns one (ok, error) pair per document, in order.  A request that
+    fails outright (Cloudant error, timeout, connection reset) fails every
+    document in it rather than raising, so a bulk import carries on with
+    its next chunk.
+    """
+    if not docs:
+        return []
+    client = get_cloudant_client()
+    if not client or not ensure_activity_db(client):
+        return [(False, "Cloudant unavailable")] * len(docs)
+
+    db_name = "activity-logs"
+    bulk = BulkDocs(docs=[Document.from_dict(doc) for doc in docs])
+    try:
+        try:
+            results = client.post_bulk_docs(db=db_name, bulk_docs=bulk).get_result()
+        except ApiException as e:
+            # Database deleted since it was ensured — recreate it and retry once
+            if e.code != 404 or not ensure_activity_db(client, recheck=True):
+                raise
+            results = client.post_bulk_docs(db=db_name, bulk_docs=bulk).get_result()
+    except (ApiException, requests.RequestException) as e:
+        logger.error("Cloudant bulk save of %d logs failed: %s", len(docs), e)
+        return [(False, str(e) or type(e).__name__)] * len(docs)
+
+    logger.debug("Bulk saved %d/%d logs to Cloudant.", sum(1 for r in results if r.get('ok')), len(docs))
+    return [
+        (bool(r.get('ok')), None if r.get('ok') else f"{r.get('error')}: {r.get('reason')}")
+        for r in results
+    ]
+
 def get_user_logs_cloudant(username):
     """
     Fetches all activity logs for a specific username from Cloudant.
@@ -79,7 +208,7 @@ def get_user_logs_cloudant(username):
     db_name = "activity-logs"
     
     try:
-        print(f"DEBUG: Fetching logs for '{username}' from Cloudant...")
+        logger.debug("Fetching logs for '%s' from Cloudant...", username)
         
         # Cloudant Query (Mango Query)
         selector = {"username": {"$eq": username}}
@@ -91,16 +220,16 @@ def get_user_logs_cloudant(username):
         ).get_result()
         
         docs = result.get('docs', [])
-        print(f"DEBUG: Found {len(docs)} logs in Cloudant.")
+        logger.debug("Found %d logs in Cloudant.", len(docs))
         return docs
 
     except ApiException as e:
         if e.code == 404:
-            print(f"DEBUG: Database '{db_name}' does not exist yet (No logs).")
+            logger.debug("Database '%s' does not exist yet (No logs).", db_name)
             return []
-        print(f"Error fetching logs from Cloudant: {e}")
+        logger.error("Error fetching logs from Cloudant: %s", e)
         return []
     except Exception as e:
-        print(f"Unexpected error: {e}")
+        logger.error("Unexpected error fetching logs from Cloudant: %s", e)
         return []
     
\ No newline at end of file
@@ -0,0 +1,532 @@
+"""
+Single source of truth for built-in factor knowledge: emission factor
+defaults, trigger phrases → DB keys, piece weights and unit aliases.
+
+Both the classifier (views.py) and the calculator (carbon_calculator.py) read
+the compiled CATALOG built from these tables at import time.
+"""
+from array import array
+from types import MappingProxyType
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  EMISSION FACTOR DEFAULTS
+#
+#  Used ONLY when a key is not found in the Django DB.
+#  Keys are lowercase to match the iexact lookup normalization.
+#  Values match your Django admin entries exactly.
+#  Add new items to Django admin — they automatically take priority.
+# ─────────────────────────────────────────────────────────────────────────────
+EMISSION_DEFAULTS = {
+    # ── YOUR CURRENT DB ENTRIES (emergency offline fallback) ─────────────────
+    "apple":                        0.06,    # kg CO₂e / kg
+    "pear":                         0.43,    # kg CO₂e / kg
+    "buffalo_milk_packet":          1.70,    # kg CO₂e / litre
+    "paneer_indian":                8.20,    # kg CO₂e / kg
+    "wheat_atta_india":             1.15,    # kg CO₂e / kg
+    "rice_white_india":             3.55,    # kg CO₂e / kg
+    "indian_railways_sleeper":      0.02,    # kg CO₂e / km
+    "indian_railways_sleeper_train": 0.02,   # kg CO₂e / km
+    "bus_city_nonac_india":         0.05,    # kg CO₂e / km
+    "two_wheeler_petrol_100cc":     0.045,   # kg CO₂e / km
+    "bike_100cc":                   0.045,   # kg CO₂e / km
+    "auto_rickshaw_cng":            0.08,    # kg CO₂e / km
+    "lpg_cooking_india":            2.98,    # kg CO₂e / kg
+    "lpg_cooking_gas_india":        2.98,    # kg CO₂e / kg
+    "electricity_india_grid":       0.71,    # kg CO₂e / kWh
+
+    # ── FOOD (not yet in your DB — add via Django admin when ready) ───────────
+    "chicken_curry_indian":         6.90,
+    "chicken":                      6.90,
+    "beef":                        27.00,
+    "mutton":                      39.20,
+    "lamb":                        39.20,
+    "pork":                         7.60,
+    "fish":                         3.49,
+    "egg":                          4.80,
+    "milk":                         3.15,
+    "cheese":                      13.50,
+    "butter":                      11.90,
+    "bread":                        1.00,
+    "roti":                         0.90,
+    "dal":                          0.90,
+    "potato":                       0.46,
+    "tomato":                       1.44,
+    "onion":                        0.50,
+    "banana":                       0.86,
+    "orange":                       0.43,
+    "coffee":                      17.00,
+    "tea":                          0.34,
+    "chocolate":                   18.70,
+    "sugar":                        3.00,
+    "food":                         2.50,   # generic fallback
+
+    # ── ADDITIONAL FOOD ITEMS ─────────────────────────────────────────────────
+    # Fast food / Western
+    "burger":                       3.50,    # kg CO₂e / piece (~200g beef+bun)
+    "pizza":                        1.60,    # kg CO₂e / slice (~150g)
+    "sandwich":                     1.20,    # kg CO₂e / piece
+    "pasta":                        1.20,    # kg CO₂e / kg
+    "noodles":                      1.10,    # kg CO₂e / kg
+    "maggi":                        1.10,    # kg CO₂e / kg (instant noodles)
+
+    # Indian snacks / meals
+    "samosa":                       0.80,    # kg CO₂e / piece (~100g)
+    "idli":                         0.40,    # kg CO₂e / piece (~50g rice+dal)
+    "dosa":                         0.60,    # kg CO₂e / piece (~100g)
+    "vada":                         0.50,    # kg CO₂e / piece
+    "poha":                         0.60,    # kg CO₂e / kg
+    "upma":                         0.65,    # kg CO₂e / kg
+    "paratha":                      0.90,    # kg CO₂e / piece (~80g wheat+oil)
+    "chapati":                      0.90,    # kg CO₂e / piece (same as roti)
+    "puri":                         1.00,    # kg CO₂e / piece (fried)
+    "dhokla":                       0.50,    # kg CO₂e / kg
+    "khichdi":                      1.20,    # kg CO₂e / kg (rice+dal)
+    "rajma":                        0.90,    # kg CO₂e / kg
+    "chole":                        0.85,    # kg CO₂e / kg
+    "pav_bhaji":                    1.40,    # kg CO₂e / plate
+    "biryani":                      3.20,    # kg CO₂e / plate (~300g rice+chicken)
+    "halwa":                        2.10,    # kg CO₂e / kg (wheat+ghee+sugar)
+    "kheer":                        2.80,    # kg CO₂e / kg (milk+rice+sugar)
+    "lassi":                        1.50,    # kg CO₂e / litre
+
+    # Fruits & Vegetables
+    "mango":                        0.50,    # kg CO₂e / kg
+    "grapes":                       0.90,    # kg CO₂e / kg
+    "watermelon":                   0.30,    # kg CO₂e / kg
+    "papaya":                       0.40,    # kg CO₂e / kg
+    "guava":                        0.35,    # kg CO₂e / kg
+    "pomegranate":                  0.60,    # kg CO₂e / kg
+    "lemon":                        0.40,    # kg CO₂e / kg
+    "carrot":                       0.40,    # kg CO₂e / kg
+    "spinach":                      0.20,    # kg CO₂e / kg
+    "cauliflower":                  0.40,    # kg CO₂e / kg
+    "cabbage":                      0.30,    # kg CO₂e / kg
+    "brinjal":                      0.35,    # kg CO₂e / kg
+    "eggplant":                     0.35,    # kg CO₂e / kg
+    "capsicum":                     0.60,    # kg CO₂e / kg
+    "cucumber":                     0.25,    # kg CO₂e / kg
+    "peas":                         0.80,    # kg CO₂e / kg
+
+    # Dairy & Beverages
+    "curd":                         1.60,    # kg CO₂e / kg
+    "dahi":                         1.60,    # kg CO₂e / kg
+    "ghee":                        15.00,    # kg CO₂e / kg (clarified butter)
+    "ice_cream":                    3.50,    # kg CO₂e / kg
+    "juice":                        0.80,    # kg CO₂e / litre
+    "cold_drink":                   0.40,    # kg CO₂e / litre (soda/cola)
+    "soda":                         0.40,    # kg CO₂e / litre
+    "cola":                         0.40,    # kg CO₂e / litre
+    "water_bottle":                 0.15,    # kg CO₂e / litre (packaged)
+
+    # Nuts & Dry fruits
+    "almond":                       3.50,    # kg CO₂e / kg
+    "cashew":                       3.00,    # kg CO₂e / kg
+    "peanut":                       2.00,    # kg CO₂e / kg
+    "groundnut":                    2.00,    # kg CO₂e / kg
+    "walnut":                       3.50,    # kg CO₂e / kg
+
+    # ── TRANSPORT (not yet in your DB) ────────────────────────────────────────
+    "car_petrol":                   0.192,
+    "car_diesel":                   0.171,
+    "car_electric":                 0.053,
+    "car_cng":                      0.140,
+    "car":                          0.192,
+    "two_wheeler_petrol":           0.060,
+    "two_wheeler_electric":         0.015,
+    "motorbike":                    0.114,
+    "bus_city_ac_india":            0.082,
+    "bus":                          0.089,
+    "metro_india":                  0.031,
+    "train_india":                  0.041,
+    "flight_domestic":              0.255,
+    "flight_international":         0.195,
+    "flight":                       0.255,
+    "taxi":                         0.211,
+    "cycle":                        0.000,
+    "walk":                         0.000,
+
+    # ── ENERGY (not yet in your DB) ───────────────────────────────────────────
+    "png_cooking":                  2.204,
+    "natural_gas":                  2.204,
+    "firewood":                     1.900,
+    "coal":                         2.420,
+    "diesel_generator":             2.680,
+
+    # ── WASTE ─────────────────────────────────────────────────────────────────
+    "plastic_waste":                6.000,
+    "food_waste":                   0.500,
+    "paper_waste":                  1.290,
+    "ewaste":                      20.000,
+    "waste":                        0.500,
+}
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  UNIT ALIASES  — user-typed → canonical
+# ─────────────────────────────────────────────────────────────────────────────
+UNIT_ALIASES = {
+    # Weight
+    'kg': 'kg', 'kilogram': 'kg', 'kilograms': 'kg', 'kgs': 'kg',
+    'g': 'g', 'gram': 'g', 'grams': 'g', 'gm': 'g', 'gms': 'g',
+    'mg': 'mg', 'milligram': 'mg',
+    # Distance
+    'km': 'km', 'kilometer': 'km', 'kilometres': 'km', 'kilometers': 'km', 'kms': 'km',
+    'mile': 'mile', 'miles': 'mile',
+    # Volume
+    'litre': 'litre', 'liter': 'litre', 'litres': 'litre', 'liters': 'litre',
+    'ml': 'ml', 'milliliter': 'ml', 'millilitre': 'ml',
+    # Energy
+    'kwh': 'kWh', 'kilowatt hour': 'kWh', 'kilowatt-hour': 'kWh',
+    # Count
+    'piece': 'piece', 'pieces': 'piece', 'slice': 'piece', 'slices': 'piece',
+    'serving': 'piece', 'servings': 'piece',
+    'plate': 'piece', 'bowl': 'piece', 'cup': 'piece', 'glass': 'piece',
+    # Time
+    'hour': 'hour', 'hours': 'hour', 'hr': 'hour', 'hrs': 'hour',
+    # Generic count (NOT kWh — fixed the dual-meaning bug)
+    'unit': 'unit', 'item': 'unit', 'items': 'unit',
+}
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  SPECIFIC_KEY_MAP  →  trigger: (category, db_key, natural_unit)
+#  DB keys must match your Django admin EXACTLY (lookup is case-insensitive).
+# ─────────────────────────────────────────────────────────────────────────────
+SPECIFIC_KEY_MAP = {
+    # ── FOOD — in your DB ────────────────────────────────────────────────────
+    'apple':          ('FOOD',      'apple',                    'piece'),
+    'pear':           ('FOOD',      'pear',                     'piece'),
+    'pears':          ('FOOD',      'pear',                     'piece'),
+    'milk':           ('FOOD',      'Buffalo_Milk_Packet',      'litre'),
+    'buffalo milk':   ('FOOD',      'Buffalo_Milk_Packet',      'litre'),
+    'doodh':          ('FOOD',      'Buffalo_Milk_Packet',      'litre'),
+    'paneer':         ('FOOD',      'Paneer_Indian',            'kg'),
+    'wheat':          ('FOOD',      'Wheat_Atta_India',         'kg'),
+    'atta':           ('FOOD',      'Wheat_Atta_India',         'kg'),
+    'flour':          ('FOOD',      'Wheat_Atta_India',         'kg'),
+    'rice':           ('FOOD',      'Rice_White_India',         'kg'),
+    'chawal':         ('FOOD',      'Rice_White_India',         'kg'),
+    'biryani':        ('FOOD',      'Rice_White_India',         'kg'),
+    # ── FOOD — not yet in DB ─────────────────────────────────────────────────
+    'chicken':        ('FOOD',      'chicken_curry_indian',     'piece'),
+    'murgi':          ('FOOD',      'chicken_curry_indian',     'piece'),
+    'dal':            ('FOOD',      'dal',                      'kg'),
+    'roti':           ('FOOD',      'roti',                     'piece'),
+    'bread':          ('FOOD',      'bread',                    'piece'),
+    'egg':            ('FOOD',      'egg',                      'piece'),
+    'eggs':           ('FOOD',      'egg',                      'piece'),
+    'anda':           ('FOOD',      'egg',                      'piece'),
+    'cheese':         ('FOOD',      'cheese',                   'kg'),
+    'butter':         ('FOOD',      'butter',                   'kg'),
+    'beef':           ('FOOD',      'beef',                     'kg'),
+    'mutton':         ('FOOD',      'mutton',                   'kg'),
+    'gosht':          ('FOOD',      'mutton',                   'kg'),
+    'fish':           ('FOOD',      'fish',                     'kg'),
+    'machhli':        ('FOOD',      'fish',                     'kg'),
+    'coffee':         ('FOOD',      'coffee',                   'piece'),
+    'tea':            ('FOOD',      'tea',                      'piece'),
+    'chai':           ('FOOD',      'tea',                      'piece'),
+    'chocolate':      ('FOOD',      'chocolate',                'kg'),
+    'burger':         ('FOOD',      'burger',                   'piece'),
+    'pizza':          ('FOOD',      'pizza',                    'piece'),
+    'sandwich':       ('FOOD',      'sandwich',                 'piece'),
+    'pasta':          ('FOOD',      'pasta',                    'kg'),
+    'noodles':        ('FOOD',      'noodles',                  'kg'),
+    'maggi':          ('FOOD',      'maggi',                    'kg'),
+    'banana':         ('FOOD',      'banana',                   'piece'),
+    'curd':           ('FOOD',      'curd',                     'kg'),
+    'dahi':           ('FOOD',      'dahi',                     'kg'),
+    'lassi':          ('FOOD',      'lassi',                    'litre'),
+    'ghee':           ('FOOD',      'ghee',                     'kg'),
+    'ice cream':      ('FOOD',      'ice_cream',                'kg'),
+    'juice':          ('FOOD',      'juice',                    'litre'),
+    'cold drink':     ('FOOD',      'cold_drink',               'litre'),
+    'soda':           ('FOOD',      'soda',                     'litre'),
+    'cola':           ('FOOD',      'cola',                     'litre'),
+    # Indian snacks
+    'samosa':         ('FOOD',      'samosa',                   'piece'),
+    'idli':           ('FOOD',      'idli',                     'piece'),
+    'dosa':           ('FOOD',      'dosa',                     'piece'),
+    'vada':           ('FOOD',      'vada',                     'piece'),
+    'poha':           ('FOOD',      'poha',                     'kg'),
+    'upma':           ('FOOD',      'upma',                     'kg'),
+    'paratha':        ('FOOD',      'paratha',                  'piece'),
+    'chapati':        ('FOOD',      'chapati',                  'piece'),
+    'puri':           ('FOOD',      'puri',                     'piece'),
+    'dhokla':         ('FOOD',      'dhokla',                   'kg'),
+    'khichdi':        ('FOOD',      'khichdi',                  'kg'),
+    'rajma':          ('FOOD',      'rajma',                    'kg'),
+    'chole':          ('FOOD',      'chole',                    'kg'),
+    'pav bhaji':      ('FOOD',      'pav_bhaji',                'piece'),
+    'biryani':        ('FOOD',      'biryani',                  'piece'),
+    'halwa':          ('FOOD',      'halwa',                    'kg'),
+    'kheer':          ('FOOD',      'kheer',                    'kg'),
+    # Fruits
+    'mango':          ('FOOD',      'mango',                    'piece'),
+    'grapes':         ('FOOD',      'grapes',                   'kg'),
+    'watermelon':     ('FOOD',      'watermelon',               'kg'),
+    'papaya':         ('FOOD',      'papaya',                   'kg'),
+    'guava':          ('FOOD',      'guava',                    'piece'),
+    'orange':         ('FOOD',      'orange',                   'piece'),
+    # Vegetables
+    'carrot':         ('FOOD',      'carrot',                   'kg'),
+    'spinach':        ('FOOD',      'spinach',                  'kg'),
+    'cauliflower':    ('FOOD',      'cauliflower',              'piece'),
+    'cabbage':        ('FOOD',      'cabbage',                  'piece'),
+    'brinjal':        ('FOOD',      'brinjal',                  'kg'),
+    'eggplant':       ('FOOD',      'eggplant',                 'kg'),
+    'capsicum':       ('FOOD',      'capsicum',                 'kg'),
+    'cucumber':       ('FOOD',      'cucumber',                 'piece'),
+    'peas':           ('FOOD',      'peas',                     'kg'),
+    'potato':         ('FOOD',      'potato',                   'kg'),
+    'tomato':         ('FOOD',      'tomato',                   'kg'),
+    'onion':          ('FOOD',      'onion',                    'kg'),
+    # Nuts
+    'almond':         ('FOOD',      'almond',                   'kg'),
+    'cashew':         ('FOOD',      'cashew',                   'kg'),
+    'peanut':         ('FOOD',      'peanut',                   'kg'),
+    'groundnut':      ('FOOD',      'groundnut',                'kg'),
+    # Generic
+    'vegetables':     ('FOOD',      'food',                     'kg'),
+    'sabji':          ('FOOD',      'food',                     'kg'),
+    'sabzi':          ('FOOD',      'food',                     'kg'),
+    # ── ENERGY — in your DB ───────────────────────────────────────────────────
+    'cooking gas':    ('ENERGY',    'LPG_Cooking_Gas_India',    'kg'),
+    'lpg':            ('ENERGY',    'LPG_Cooking_Gas_India',    'kg'),
+    'gas':            ('ENERGY',    'LPG_Cooking_Gas_India',    'kg'),
+    'cylinder':       ('ENERGY',    'LPG_Cooking_Gas_India',    'kg'),
+    'electricity':    ('ENERGY',    'Electricity_India_Grid',   'kWh'),
+    'bijli':          ('ENERGY',    'Electricity_India_Grid',   'kWh'),
+    'power':          ('ENERGY',    'Electricity_India_Grid',   'kWh'),
+    'current':        ('ENERGY',    'Electricity_India_Grid',   'kWh'),
+    'ac':             ('ENERGY',    'Electricity_India_Grid',   'kWh'),
+    'fan':            ('ENERGY',    'Electricity_India_Grid',   'kWh'),
+    'heater':         ('ENERGY',    'Electricity_India_Grid',   'kWh'),
+    'geyser':         ('ENERGY',    'Electricity_India_Grid',   'kWh'),
+    'fridge':         ('ENERGY',    'Electricity_India_Grid',   'kWh'),
+    'tv':             ('ENERGY',    'Electricity_India_Grid',   'kWh'),
+    'laptop':         ('ENERGY',    'Electricity_India_Grid',   'kWh'),
+    # ── ENERGY — not yet in DB ────────────────────────────────────────────────
+    'png':            ('ENERGY',    'png_cooking',              'kg'),
+    'coal':           ('ENERGY',    'coal',                     'kg'),
+    'firewood':       ('ENERGY',    'firewood',                 'kg'),
+    'generator':      ('ENERGY',    'diesel_generator',         'litre'),
+    # ── TRANSPORT — in your DB ────────────────────────────────────────────────
+    'indian railway': ('TRANSPORT', 'Indian_Railways_Sleeper_Train', 'km'),
+    'train':          ('TRANSPORT', 'Indian_Railways_Sleeper_Train', 'km'),
+    'railway':        ('TRANSPORT', 'Indian_Railways_Sleeper_Train', 'km'),
+    'railways':       ('TRANSPORT', 'Indian_Railways_Sleeper_Train', 'km'),
+    'sleeper':        ('TRANSPORT', 'Indian_Railways_Sleeper_Train', 'km'),
+    'bus':            ('TRANSPORT', 'Bus_City_NonAC_India',     'km'),
+    'two wheeler':    ('TRANSPORT', 'Bike_100cc',               'km'),
+    'bike':           ('TRANSPORT', 'Bike_100cc',               'km'),
+    'scooter':        ('TRANSPORT', 'Bike_100cc',               'km'),
+    'scooty':         ('TRANSPORT', 'Bike_100cc',               'km'),
+    'activa':         ('TRANSPORT', 'Bike_100cc',               'km'),
+    'autorickshaw':   ('TRANSPORT', 'Auto_Rickshaw_CNG',        'km'),
+    'auto rickshaw':  ('TRANSPORT', 'Auto_Rickshaw_CNG',        'km'),
+    'auto':           ('TRANSPORT', 'Auto_Rickshaw_CNG',        'km'),
+    'rickshaw':       ('TRANSPORT', 'Auto_Rickshaw_CNG',        'km'),
+    # ── TRANSPORT — not yet in DB ─────────────────────────────────────────────
+    'diesel car':     ('TRANSPORT', 'car_diesel',               'km'),
+    'petrol car':     ('TRANSPORT', 'car_petrol',               'km'),
+    'electric car':   ('TRANSPORT', 'car_electric',             'km'),
+    'cng car':        ('TRANSPORT', 'car_cng',                  'km'),
+    'car':            ('TRANSPORT', 'car_petrol',               'km'),
+    'metro':          ('TRANSPORT', 'metro_india',              'km'),
+    'cab':            ('TRANSPORT', 'taxi',                     'km'),
+    'uber':           ('TRANSPORT', 'taxi',                     'km'),
+    'ola':            ('TRANSPORT', 'taxi',                     'km'),
+    'cycle':          ('TRANSPORT', 'cycle',                    'km'),
+    'bicycle':        ('TRANSPORT', 'cycle',                    'km'),
+    'walk':           ('TRANSPORT', 'walk',                     'km'),
+    'walked':         ('TRANSPORT', 'walk',                     'km'),
+    'flight':         ('TRANSPORT', 'flight_domestic',          'km'),
+    'flew':           ('TRANSPORT', 'flight_domestic',          'km'),
+    'fly':            ('TRANSPORT', 'flight_domestic',          'km'),
+    'airplane':       ('TRANSPORT', 'flight_domestic',          'km'),
+    # ── WASTE ─────────────────────────────────────────────────────────────────
+    'plastic':        ('WASTE',     'plastic_waste',            'kg'),
+    'paper':          ('WASTE',     'paper_waste',              'kg'),
+    'ewaste':         ('WASTE',     'ewaste',                   'kg'),
+}
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  PIECE → KG CONVERSION  (average weight of one piece/serving)
+# ─────────────────────────────────────────────────────────────────────────────
+PIECE_TO_KG = {
+    'apple':        0.182,   # medium apple
+    'pear':         0.178,   # medium pear
+    'banana':       0.120,
+    'orange':       0.160,
+    'mango':        0.300,   # medium mango
+    'guava':        0.100,
+    'chicken':      0.300,   # 1 serving/piece
+    'murgi':        0.300,
+    'egg':          0.060,
+    'anda':         0.060,
+    'roti':         0.040,   # 1 roti
+    'bread':        0.030,   # 1 slice
+    'burger':       0.200,
+    'pizza':        0.150,   # per slice
+    'sandwich':     0.180,
+    'samosa':       0.100,   # 1 samosa
+    'idli':         0.050,   # 1 idli
+    'dosa':         0.100,   # 1 dosa
+    'vada':         0.080,
+    'paratha':      0.080,
+    'chapati':      0.040,
+    'puri':         0.040,
+    'biryani':      0.350,   # 1 plate
+    'pav_bhaji':    0.300,   # 1 plate
+    'cauliflower':  0.600,   # 1 whole head
+    'cabbage':      0.800,   # 1 whole head
+    'cucumber':     0.200,   # 1 cucumber
+    'coffee':       0.007,   # dry grounds per cup
+    'tea':          0.002,   # dry leaves per cup
+    'chai':         0.002,
+}
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  COMPILED CATALOG
+#
+#  Every factor key gets one integer id.  Per-id data lives in compact
+#  parallel arrays, and every known alias (DB key, lowercase key, trigger
+#  phrase, piece-weight base) maps straight to its id — one dict probe per
+#  lookup instead of sorted scans and split('_') retries on the hot path.
+#  Only keys the catalog has never seen fall back to their base word.
+# ─────────────────────────────────────────────────────────────────────────────
+_NO_VALUE = float('nan')
+
+
+class FactorCatalog:
+    """
+    Immutable, compiled view over the tables above.  Built once at import —
+    use the module-level CATALOG; the source dicts stay the place to edit.
+    """
+
+    __slots__ = (
+        '_key_ids', '_trigger_ids', '_db_keys', '_factors', '_piece_kg',
+        '_categories', '_category_codes', '_units', '_unit_codes',
+        '_unit_aliases',
+        'triggers_longest_first', 'unit_aliases_longest_first',
+    )
+
+    def __init__(self, emission_defaults, specific_key_map, piece_to_kg, unit_aliases):
+        key_ids, db_keys = {}, []
+
+        def intern_key(key):
+            lookup = key.lower().strip()
+            if lookup not in key_ids:
+                key_ids[lookup] = len(db_keys)
+                db_keys.append(key)
+            return key_ids[lookup]
+
+        for key in emission_defaults:
+            intern_key(key)
+        for _, db_key, _ in specific_key_map.values():
+            # Keep the Django admin spelling ("Rice_White_India") for display
+            db_keys[intern_key(db_key)] = db_key
+        for base in piece_to_kg:
+            intern_key(base)
+
+        size = len(db_keys)
+        categories, units = [''], ['']
+        category_codes = array('B', bytes(size))
+        unit_codes     = array('B', bytes(size))
+        trigger_ids    = {}
+        for trigger, (category, db_key, natural_unit) in specific_key_map.items():
+            idx = key_ids[db_key.lower().strip()]
+            trigger_ids[trigger] = idx
+            if category not in categories:
+                categories.append(category)
+            if natural_unit not in units:
+                units.append(natural_unit)
+            category_codes[idx] = categories.index(category)
+            unit_codes[idx]     = units.index(natural_unit)
+
+        factors  = array('d', [0.0]) * size
+        piece_kg = array('d', [_NO_VALUE]) * size
+        for lookup, idx in key_ids.items():
+            base = lookup.split('_')[0]
+            # Same fallback calculate_co2e always used: exact key, then base
+            factors[idx] = emission_defaults.get(lookup, 0.0) or emission_defaults.get(base, 0.0)
+            if base in piece_to_kg:
+                piece_kg[idx] = piece_to_kg[base]
+
+        set_ = object.__setattr__
+        set_(self, '_key_ids', MappingProxyType(key_ids))
+        set_(self, '_trigger_ids', MappingProxyType(trigger_ids))
+        set_(self, '_db_keys', tuple(db_keys))
+        set_(self, '_factors', factors)
+        set_(self, '_piece_kg', piece_kg)
+        set_(self, '_categories', tuple(categories))
+        set_(self, '_category_codes', category_codes)
+        set_(self, '_units', tuple(units))
+        set_(self, '_unit_codes', unit_codes)
+        set_(self, '_unit_aliases', MappingProxyType(dict(unit_aliases)))
+        triggers = tuple(sorted(specific_key_map, key=len, reverse=True))
+        # Matched by clause_lexer, which compiles them into its token regex
+        set_(self, 'triggers_longest_first', triggers)
+        set_(self, 'unit_aliases_longest_first',
+             tuple(sorted((a for a in unit_aliases if len(a) > 1), key=len, reverse=True)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FactorCatalog is immutable")
+
+    def __len__(self):
+        return len(self._db_keys)
+
+    # ── Lookups ──────────────────────────────────────────────────────────────
+    def key_id(self, key):
+        """Id for a factor key (any case), falling back to its base word. None if unknown."""
+        lookup = str(key).lower().strip()
+        idx = self._key_ids.get(lookup)
+        if idx is None:
+            idx = self._key_ids.get(lookup.split('_')[0])
+        return idx
+
+    def display_key(self, key):
+        """Stored spelling of a known factor key (exact match, any case), or None."""
+        idx = self._key_ids.get(str(key).lower().strip())
+        return None if idx is None else self._db_keys[idx]
+
+    def default_factor(self, key):
+        """EMISSION_DEFAULTS value for a key (exact, then base word); 0.0 if none."""
+        lookup = str(key).lower().strip()
+        idx = self._key_ids.get(lookup)
+        factor = self._factors[idx] if idx is not None else 0.0
+        if factor == 0.0:
+            idx = self._key_ids.get(lookup.split('_')[0])
+            factor = self._factors[idx] if idx is not None else 0.0
+        return factor
+
+    def piece_weight(self, key):
+        """kg per piece for a key (matched on its base word), or None."""
+        lookup = str(key).lower().strip()
+        idx = self._key_ids.get(lookup)
+        if idx is None:
+            idx = self._key_ids.get(lookup.split('_')[0])
+        if idx is None:
+            return None
+        weight = self._piece_kg[idx]
+        return None if weight != weight else weight   # NaN → no weight
+
+    def trigger_entry(self, trigger):
+        """(category, db_key, natural_unit) for a SPECIFIC_KEY_MAP trigger, or None."""
+        idx = self._trigger_ids.get(trigger)
+        if idx is None:
+            return None
+        return (
+            self._categories[self._category_codes[idx]],
+            self._db_keys[idx],
+            self._units[self._unit_codes[idx]],
+        )
+
+    def canonical_unit(self, raw_unit, default=None):
+        """UNIT_ALIASES lookup: user-typed unit → canonical unit."""
+        return self._unit_aliases.get(raw_unit, default)
+
+    def has_unit_alias(self, raw_unit):
+        return raw_unit in self._unit_aliases
+
+
+CATALOG = FactorCatalog(EMISSION_DEFAULTS, SPECIFIC_KEY_MAP, PIECE_TO_KG, UNIT_ALIASES)
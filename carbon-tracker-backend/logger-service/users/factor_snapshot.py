@@ -0,0 +1,354 @@
+"""
+Cross-worker emission factor snapshot.
+
+Every factor change publishes a versioned, read-only binary snapshot of the
+EmissionFactor table next to the SQLite DB.  Each gunicorn/runserver worker
+memory-maps it — one shared page-cache copy instead of N private tables — and
+swaps to the new file as soon as the shared version counter moves, so a factor
+added in one worker is visible in all of them on the very next lookup.
+
+Publishing happens on a background thread, debounced by
+FACTOR_SNAPSHOT_DEBOUNCE seconds so a burst of edits is one rebuild.  A worker
+with a committed factor change that is not published yet stops using
+snapshots (its own change is not in them) until the publish succeeds.  A
+snapshot older than FACTOR_SNAPSHOT_MAX_AGE seconds is answered from the DB
+while the background thread compares it with the table: an unchanged table is
+only re-stamped, keeping the version, anything else is published.  Lookups
+never publish inline: `manage.py publish_factor_snapshot` writes the first one
+at deploy time, and until one exists callers read the DB.
+
+Files (in FACTOR_SNAPSHOT_DIR, default <BASE_DIR>/data):
+  factor_snapshot.version   8-byte little-endian counter, bumped in place
+  factor_snapshot.bin       header + fixed-size records + UTF-8 string blob,
+                            records sorted by (normalized key, pk)
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from decouple import config
+from django.conf import settings
+from django.db import connection
+
+try:
+    import fcntl
+except ImportError:   # non-POSIX dev boxes: single-writer assumption
+    fcntl = None
+
+logger = logging.getLogger("logger_service")
+
+SNAPSHOT_DIR   = Path(config("FACTOR_SNAPSHOT_DIR", default=str(Path(settings.BASE_DIR) / "data")))
+SNAPSHOT_PATH  = SNAPSHOT_DIR / "factor_snapshot.bin"
+VERSION_PATH   = SNAPSHOT_DIR / "factor_snapshot.version"
+PUBLISH_RETRY  = 30   # seconds to wait before retrying a failed publish / map
+# Older snapshots are answered from the DB until they are checked against the
+# table (covers a publish that failed in another worker); 0 disables the check
+MAX_AGE        = config("FACTOR_SNAPSHOT_MAX_AGE", default=3600, cast=float)
+# Seconds a change-triggered publish waits so a burst of edits is one rebuild
+PUBLISH_DEBOUNCE = config("FACTOR_SNAPSHOT_DEBOUNCE", default=0.5, cast=float)
+
+_MAGIC   = b"CFS2"
+_HEADER  = struct.Struct("<4sQI")          # magic, version, record count
+_RECORD  = struct.Struct("<IHIHdBqqI")     # norm off/len, key off/len, value, flags,
+                                           # added_by, pk, factor version
+_VERSION = struct.Struct("<Q")
+
+FLAG_STATUS_VERIFIED = 0x01
+FLAG_STATUS_PENDING  = 0x02
+FLAG_VERIFIED_FACTOR = 0x04
+
+
+class FactorSnapshot:
+    """Read-only view over one memory-mapped snapshot file."""
+
+    def __init__(self, path):
+        with open(path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            self.published_at = os.fstat(fh.fileno()).st_mtime
+        magic, self.version, self.count = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a factor snapshot")
+        self._blob = _HEADER.size + self.count * _RECORD.size
+        self._keys = None
+
+    def _record(self, i):
+        return _RECORD.unpack_from(self._mm, _HEADER.size + i * _RECORD.size)
+
+    def _string(self, off, length):
+        start = self._blob + off
+        return self._mm[start:start + length]
+
+    def _norm_at(self, i):
+        norm_off, norm_len = _RECORD.unpack_from(self._mm, _HEADER.size + i * _RECORD.size)[:2]
+        return self._string(norm_off, norm_len)
+
+    def lookup(self, key):
+        """
+        Every row whose normalized key equals `key`, in pk order, shaped like
+        EmissionFactor values() rows so carbon_calculator can resolve them.
+        """
+        target = str(key).lower().strip().encode("utf-8")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._norm_at(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        rows = []
+        while lo < self.count:
+            _, _, _, _, value, flags, added_by, pk, factor_version = self._record(lo)
+            if self._norm_at(lo) != target:
+                break
+            rows.append({
+                "id":                 pk,
+                "version":            factor_version,
+                "co2e_per_unit":      value,
+                "status":             "verified" if flags & FLAG_STATUS_VERIFIED
+                                      else ("pending" if flags & FLAG_STATUS_PENDING else None),
+                "is_verified_factor": bool(flags & FLAG_VERIFIED_FACTOR),
+                "added_by_id":        None if added_by < 0 else added_by,
+            })
+            lo += 1
+        return rows
+
+    def keys(self):
+        """Every factor key in its stored spelling (decoded once per snapshot)."""
+        if self._keys is None:
+            keys = []
+            for i in range(self.count):
+                _, _, key_off, key_len = self._record(i)[:4]
+                keys.append(self._string(key_off, key_len).decode("utf-8"))
+            self._keys = keys
+        return self._keys
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  WRITER
+# ─────────────────────────────────────────────────────────────────────────────
+def _open_version_file():
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    fd = os.open(VERSION_PATH, os.O_RDWR | os.O_CREAT, 0o644)
+    if os.fstat(fd).st_size < _VERSION.size:
+        os.ftruncate(fd, _VERSION.size)
+    return fd
+
+
+def _encode(rows):
+    records, blob = [], bytearray()
+    for key, norm, value, flags, added_by, pk, factor_version in rows:
+        norm_b, key_b = norm.encode("utf-8"), key.encode("utf-8")
+        records.append((len(blob), len(norm_b), len(blob) + len(norm_b), len(key_b),
+                        value, flags, added_by, pk, factor_version))
+        blob += norm_b + key_b
+    return records, bytes(blob)
+
+
+def _read_rows():
+    from .models import EmissionFactor
+
+    rows = []
+    for pk, key, value, status, is_verified_factor, added_by, factor_version in (
+        EmissionFactor.objects.values_list(
+            "pk", "key", "co2e_per_unit", "status", "is_verified_factor", "added_by_id", "version"
+        )
+    ):
+        flags = (
+            (FLAG_STATUS_VERIFIED if status == "verified" else 0)
+            | (FLAG_STATUS_PENDING if status == "pending" else 0)
+            | (FLAG_VERIFIED_FACTOR if is_verified_factor else 0)
+        )
+        norm = (key or "").lower().strip()
+        rows.append((norm.encode("utf-8"), pk, (key or "", norm, float(value), flags,
+                                                -1 if added_by is None else added_by,
+                                                pk, factor_version)))
+    rows.sort(key=lambda r: (r[0], r[1]))
+    return _encode(r[2] for r in rows)
+
+
+def _published_body():
+    """(record count, records + blob) of the current snapshot file, or None."""
+    try:
+        data = SNAPSHOT_PATH.read_bytes()
+        magic, _, count = _HEADER.unpack_from(data, 0)
+    except (FileNotFoundError, struct.error):
+        return None
+    return (count, data[_HEADER.size:]) if magic == _MAGIC else None
+
+
+def publish_snapshot(if_older_than=None):
+    """
+    Rebuilds the snapshot from the DB, atomically replaces the file and bumps
+    the shared version counter.  Returns the new version.
+
+    When the table is unchanged the published file is only re-stamped and its
+    version returned, so readers keep their mapping.  With `if_older_than`
+    (seconds) a snapshot published more recently than that is kept without
+    reading the DB, so workers refreshing an aged snapshot at the same time
+    check it once.
+    """
+    fd = _open_version_file()
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        current, = _VERSION.unpack(os.pread(fd, _VERSION.size, 0))
+        if if_older_than and current and SNAPSHOT_PATH.exists() \
+                and time.time() - SNAPSHOT_PATH.stat().st_mtime < if_older_than:
+            return current
+
+        records, blob = _read_rows()
+        body = b"".join(_RECORD.pack(*record) for record in records) + blob
+        if current and _published_body() == (len(records), body):
+            os.utime(SNAPSHOT_PATH)
+            logger.debug("Factor snapshot v%d unchanged (%d rows)", current, len(records))
+            return current
+        version = current + 1
+
+        tmp = SNAPSHOT_PATH.with_name(f"{SNAPSHOT_PATH.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as fh:
+            fh.write(_HEADER.pack(_MAGIC, version, len(records)))
+            fh.write(body)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, SNAPSHOT_PATH)
+        os.pwrite(fd, _VERSION.pack(version), 0)
+    finally:
+        os.close(fd)   # also releases the flock
+
+    logger.info("Factor snapshot v%d published (%d rows)", version, len(records))
+    return version
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  READER
+# ─────────────────────────────────────────────────────────────────────────────
+_SNAPSHOT              = None
+_VERSION_MAP           = None
+_SNAPSHOT_LOCK         = threading.Lock()
+_PUBLISHER             = None   # background publish thread, at most one
+_UNPUBLISHED           = 0      # changes committed here that no snapshot has yet
+_LAST_MAP_FAILURE      = 0.0
+_LAST_PUBLISH_FAILURE  = 0.0
+
+
+def _shared_version():
+    global _VERSION_MAP
+    if _VERSION_MAP is None:
+        fd = _open_version_file()
+        try:
+            _VERSION_MAP = mmap.mmap(fd, _VERSION.size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+    return _VERSION.unpack_from(_VERSION_MAP, 0)[0]
+
+
+def _map_current(version):
+    """The snapshot for `version` (mapping it if needed), or None if there is none yet."""
+    global _SNAPSHOT, _LAST_MAP_FAILURE
+    with _SNAPSHOT_LOCK:
+        snapshot = _SNAPSHOT
+        if snapshot is not None and snapshot.version >= version:
+            return snapshot
+        if version == 0 or time.time() - _LAST_MAP_FAILURE < PUBLISH_RETRY:
+            return None
+        try:
+            snapshot = FactorSnapshot(SNAPSHOT_PATH)
+        except (FileNotFoundError, ValueError) as e:
+            # Missing, or written by an older release with a different layout
+            _LAST_MAP_FAILURE = time.time()
+            logger.warning("Factor snapshot v%d not mappable: %s", version, e)
+            return None
+        _SNAPSHOT = snapshot
+        logger.debug("Mapped factor snapshot v%d (%d rows)", snapshot.version, snapshot.count)
+        return snapshot
+
+
+def _background_publish(if_older_than):
+    """
+    Publishes until every change committed in this worker is in a snapshot.
+    A change-triggered run waits PUBLISH_DEBOUNCE seconds first, so a burst of
+    factor edits (admin list_editable, seeds, bulk writes) is one rebuild.
+    """
+    global _PUBLISHER, _UNPUBLISHED, _LAST_PUBLISH_FAILURE, _LAST_MAP_FAILURE
+    try:
+        while True:
+            if _UNPUBLISHED and PUBLISH_DEBOUNCE:
+                time.sleep(PUBLISH_DEBOUNCE)
+            with _SNAPSHOT_LOCK:
+                pending = _UNPUBLISHED
+            version = publish_snapshot(if_older_than)
+            with _SNAPSHOT_LOCK:
+                _UNPUBLISHED -= pending
+                _LAST_MAP_FAILURE = 0.0
+                if _SNAPSHOT is not None and _SNAPSHOT.version == version:
+                    # Checked (and re-stamped) unchanged: stop treating it as aged
+                    _SNAPSHOT.published_at = SNAPSHOT_PATH.stat().st_mtime
+                if not _UNPUBLISHED:
+                    _PUBLISHER = None
+                    return
+            if_older_than = None   # more changes committed while publishing
+    except Exception as e:
+        _LAST_PUBLISH_FAILURE = time.time()
+        logger.warning("Background factor snapshot publish failed: %s", e)
+        with _SNAPSHOT_LOCK:
+            _PUBLISHER = None
+    finally:
+        connection.close()   # this thread's own DB connection
+
+
+def _publish_in_background(if_older_than=None):
+    """Starts a publish thread unless one is running or the last one failed recently."""
+    global _PUBLISHER
+    with _SNAPSHOT_LOCK:
+        if _PUBLISHER is not None or time.time() - _LAST_PUBLISH_FAILURE < PUBLISH_RETRY:
+            return
+        _PUBLISHER = threading.Thread(target=_background_publish, args=(if_older_than,),
+                                      name="factor-snapshot-publish", daemon=True)
+        _PUBLISHER.start()
+
+
+def publish_after_commit():
+    """
+    on_commit hook for factor changes (see users/signals.py).  Only records the
+    change and hands the rebuild to the background publisher — the request
+    that saved the factor never waits for it.  Until the change is published
+    this worker serves factors from the DB (the snapshot lacks its own
+    change); a failed publish is retried every PUBLISH_RETRY seconds.
+    """
+    global _UNPUBLISHED
+    with _SNAPSHOT_LOCK:
+        _UNPUBLISHED += 1
+    _publish_in_background()
+
+
+def get_snapshot():
+    """
+    The current FactorSnapshot, remapped when another worker has published a
+    newer one.  Steady state is one 8-byte read from shared memory.  Returns
+    None — callers fall back to the DB — while no snapshot exists, while this
+    worker has a change no snapshot contains, or once the mapped one is older
+    than MAX_AGE; each of those starts a background publish (for an aged one,
+    a check that only republishes if the table changed).
+    """
+    try:
+        if _UNPUBLISHED:
+            _publish_in_background()
+            return None
+        snapshot = _SNAPSHOT
+        version = _shared_version()
+        if snapshot is None or snapshot.version < version:
+            snapshot = _map_current(version)
+        if snapshot is None:
+            _publish_in_background()
+            return None
+        if MAX_AGE and time.time() - snapshot.published_at >= MAX_AGE:
+            _publish_in_background(if_older_than=MAX_AGE)
+            return None
+        return snapshot
+    except Exception as e:
+        logger.warning("Factor snapshot unavailable, using DB: %s", e)
+        return None
@@ -0,0 +1,222 @@
+"""
+Prebuilt fuzzy-match indexes for the local fallback classifier.
+
+thefuzz's ratio() is an Indel similarity, so two strings of lengths a and b
+can never score above 200 * min(a, b) / (a + b).  A length filter drops every
+candidate that cannot reach the threshold, and the survivors are scored in
+one rapidfuzz cdist() call.  Scores are rounded exactly like
+thefuzz.fuzz.ratio(), so thresholds mean what they did.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from rapidfuzz import fuzz as rf_fuzz
+from rapidfuzz import process
+
+
+class CategoryKeywordIndex:
+    """
+    Counts, per category, how many keywords each word fuzzy-matches at
+    `threshold` — the same tally fallback_classify used to build with a
+    words × keywords fuzz.ratio loop.  Per-word results are memoized in a
+    bounded LRU, so repeated words cost a dict lookup.
+    """
+
+    def __init__(self, category_keywords, excluded=(), threshold=82, memo_size=4096):
+        self.categories = tuple(category_keywords)
+        self.threshold  = threshold
+        self._excluded  = frozenset(excluded)
+        # Duplicate keywords stay in: each one counted in the original loop
+        pairs = [(kw, i) for i, kws in enumerate(category_keywords.values()) for kw in kws]
+        self._keywords  = np.array([kw for kw, _ in pairs], dtype=object)
+        self._lengths   = np.array([len(kw) for kw, _ in pairs])
+        self._cat_ids   = np.array([i for _, i in pairs], dtype=np.intp)
+        self._memo      = OrderedDict()
+        self._memo_size = memo_size
+        self._lock      = threading.Lock()
+        self.stats      = {"hits": 0, "misses": 0}
+
+    def _plausible(self, words):
+        """Keyword columns at least one of `words` could reach the threshold with."""
+        lengths = np.unique([len(w) for w in words])[:, None]
+        # A full point of slack keeps the bound conservative under rounding
+        reachable = (200 * np.minimum(lengths, self._lengths)
+                     >= (self.threshold - 1) * (lengths + self._lengths))
+        return reachable.any(axis=0)
+
+    def _score_words(self, words):
+        """{word: per-category counts} for new words, scored in one batch."""
+        columns = self._plausible(words)
+        if not columns.any():
+            return {w: (0,) * len(self.categories) for w in words}
+
+        scores = process.cdist(
+            words, list(self._keywords[columns]),
+            scorer=rf_fuzz.ratio, score_cutoff=self.threshold - 1, dtype=np.float64,
+        )
+        # np.rint rounds half to even, exactly like thefuzz's int(round(x))
+        matches = np.rint(scores) >= self.threshold
+        cat_ids = self._cat_ids[columns]
+        return {
+            w: tuple(np.bincount(cat_ids[row], minlength=len(self.categories)).tolist())
+            for w, row in zip(words, matches)
+        }
+
+    def scores(self, words):
+        """{category: matches} over all non-excluded words, in category order."""
+        words = [w for w in words if w not in self._excluded]
+        counts = {}
+        with self._lock:
+            for w in words:
+                if w in counts:
+                    continue
+                hit = self._memo.get(w)
+                if hit is not None:
+                    self._memo.move_to_end(w)
+                    self.stats["hits"] += 1
+                    counts[w] = hit
+        missing = [w for w in dict.fromkeys(words) if w not in counts]
+
+        if missing:
+            scored = self._score_words(missing)
+            counts.update(scored)
+            with self._lock:
+                self.stats["misses"] += len(missing)
+                self._memo.update(scored)
+                while len(self._memo) > self._memo_size:
+                    self._memo.popitem(last=False)
+
+        totals = [0] * len(self.categories)
+        for w in words:
+            for i, n in enumerate(counts[w]):
+                totals[i] += n
+        return dict(zip(self.categories, totals))
+
+
+def _trigrams(s):
+    """Padded trigrams: 'car' → ' ca', 'car', 'ar '."""
+    # pg_trgm would also emit '  c'; a first-letter-only gram matches ~1/26
+    # of all parts, so it is left out to keep posting lists short.
+    padded = f" {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class EmissionKeyIndex:
+    """
+    Step 3 of fallback_classify over the emission key list, without
+    touching every key:
+
+      • substring — the first key whose cleaned form ('Rice_White_India' →
+        'rice white india') occurs in the text wins.  Found by hashing the
+        text's substrings of each cleaned-key length, so cost follows the
+        text, not the key count.
+      • fuzzy — otherwise the key with the best fuzz.ratio(word, part) >=
+        `threshold` over its parts longer than 2 chars (earliest key on
+        ties).  A trigram inverted index over the distinct parts narrows
+        each word to parts sharing a trigram and a compatible length; only
+        those are scored exactly.  Two-letter words share no trigram with a
+        3-letter part spelled around them ('gs' / 'gas'), so they scan the
+        3-letter parts instead.  A longer word whose every trigram is broken
+        but still scores >= threshold (scrambles like 'cedba' / 'cbeda') is
+        the one case the old full scan found and this does not.  Per-word
+        results are memoized.
+
+    Built once per key-cache refresh; immutable afterwards.
+    """
+
+    def __init__(self, keys, threshold=80, memo_size=4096):
+        self.keys      = tuple(keys)
+        self.threshold = threshold
+        self._memo      = OrderedDict()
+        self._memo_size = memo_size
+        self._lock      = threading.Lock()
+
+        clean_first, part_ids, part_key, parts = {}, {}, [], []
+        postings = {}
+        for idx, key in enumerate(self.keys):
+            clean = key.lower().replace('_', ' ')
+            clean_first.setdefault(clean, idx)
+            for part in clean.split():
+                if len(part) <= 2:
+                    continue
+                pid = part_ids.get(part)
+                if pid is None:
+                    pid = part_ids[part] = len(parts)
+                    parts.append(part)
+                    part_key.append(idx)   # earliest key using this part
+                    for gram in _trigrams(part):
+                        postings.setdefault(gram, []).append(pid)
+
+        self._clean_first   = clean_first
+        self._clean_lengths = tuple(sorted({len(c) for c in clean_first}))
+        self._parts         = np.array(parts, dtype=object)
+        self._part_len      = np.array([len(p) for p in parts], dtype=np.intp)
+        self._part_key      = np.array(part_key, dtype=np.intp)
+        self._postings      = {g: np.array(ids, dtype=np.intp) for g, ids in postings.items()}
+        self._short_parts   = np.flatnonzero(self._part_len == 3)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _substring_hit(self, text):
+        n, best = len(text), None
+        for length in self._clean_lengths:
+            if length > n:
+                break
+            for start in range(n - length + 1):
+                idx = self._clean_first.get(text[start:start + length])
+                if idx is not None and (best is None or idx < best):
+                    best = idx
+        return best
+
+    def _best_part(self, word):
+        """(score, earliest key idx) of the best part for one word, or (0, None)."""
+        if len(word) <= 2:
+            cands = self._short_parts
+        else:
+            lists = [self._postings[g] for g in _trigrams(word) if g in self._postings]
+            if not lists:
+                return 0, None
+            cands = np.unique(np.concatenate(lists))
+        lens  = self._part_len[cands]
+        # Same length bound as CategoryKeywordIndex, one point of slack
+        cands = cands[200 * np.minimum(lens, len(word))
+                      >= (self.threshold - 1) * (lens + len(word))]
+        if not len(cands):
+            return 0, None
+        scores = np.rint(process.cdist(
+            [word], list(self._parts[cands]),
+            scorer=rf_fuzz.ratio, score_cutoff=self.threshold - 1, dtype=np.float64,
+        )[0])
+        top = scores.max()
+        if top < self.threshold:
+            return 0, None
+        return int(top), int(self._part_key[cands[scores == top]].min())
+
+    def _fuzzy_hit(self, words):
+        best_score, best_idx = 0, None
+        for word in dict.fromkeys(words):
+            with self._lock:
+                hit = self._memo.get(word)
+                if hit is not None:
+                    self._memo.move_to_end(word)
+            if hit is None:
+                hit = self._best_part(word)
+                with self._lock:
+                    self._memo[word] = hit
+                    if len(self._memo) > self._memo_size:
+                        self._memo.popitem(last=False)
+            score, idx = hit
+            if idx is None or score < best_score:
+                continue
+            if score > best_score or idx < best_idx:
+                best_score, best_idx = score, idx
+        return best_idx
+
+    def find(self, text, words):
+        """Best key for the lowercased `text` / its `words`, or None."""
+        idx = self._substring_hit(text)
+        if idx is None:
+            idx = self._fuzzy_hit(words)
+        return None if idx is None else self.keys[idx]
@@ -0,0 +1,186 @@
+"""
+Background workers for async /api/log-activity/ jobs.
+
+The ActivityJob table is the queue, so a job survives restarts and any
+process can run it: a web worker's own pool, or a dedicated
+`manage.py run_job_worker`.  A worker claims the oldest 'queued' row with a
+conditional UPDATE (status='queued' → 'running'); only one claimant's
+update matches, so pools in several processes never run a job twice.
+
+Enqueueing in the same process wakes an idle worker at once; jobs queued by
+other processes are picked up within `poll_interval` seconds.  A job left
+'running' for `stale_after` seconds (its worker died) goes back to the queue
+until it has been tried `max_attempts` times, then fails.  Finished jobs are
+deleted after `retention` seconds.
+"""
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ActivityJob
+
+logger = logging.getLogger("logger_service")
+
+# Housekeeping (stale re-queue, retention) runs at most this often
+_SWEEP_EVERY = 60.0
+
+
+class JobWorkerPool:
+
+    def __init__(self, handler, workers=2, poll_interval=2.0, stale_after=600.0,
+                 max_attempts=3, retention=7 * 24 * 3600):
+        self.handler       = handler        # job → (result dict, http status)
+        self.workers       = workers
+        self.poll_interval = poll_interval
+        self.stale_after   = stale_after
+        self.max_attempts  = max_attempts
+        self.retention     = retention
+        self._wake         = threading.Event()
+        self._stop         = threading.Event()
+        self._lock         = threading.Lock()
+        self._threads      = []
+        self._last_sweep   = 0.0
+        self._stats        = {"claimed": 0, "done": 0, "failed": 0, "errors": 0,
+                              "requeued": 0, "abandoned": 0, "pruned": 0}
+
+    # ── Lifecycle ─────────────────────────────────────────────────────────────
+    def start(self):
+        """Starts the worker threads once; later calls (and workers=0) do nothing."""
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._loop, name=f"activity-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info("Started %d activity job worker(s)", self.workers)
+
+    def notify(self):
+        """A job was just queued — wake an idle worker."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run_forever(self):
+        """Runs the pool in the foreground (dedicated worker process) until stopped."""
+        self.start()
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            self.stop()
+        for thread in self._threads:
+            thread.join()
+
+    # ── Worker loop ───────────────────────────────────────────────────────────
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self._sweep()
+                job = self.claim_next()
+            except Exception as e:
+                self._count("errors")
+                logger.error("Job queue poll failed: %s", e)
+                job = None
+            finally:
+                close_old_connections()
+
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            try:
+                self.run(job)
+            finally:
+                close_old_connections()
+
+    def claim_next(self):
+        """Atomically moves the oldest queued job to 'running' and returns it, or None."""
+        while True:
+            pk = (ActivityJob.objects.filter(status='queued')
+                  .order_by('created_at').values_list('pk', flat=True).first())
+            if pk is None:
+                return None
+            claimed = ActivityJob.objects.filter(pk=pk, status='queued').update(
+                status='running', started_at=timezone.now(), attempts=F('attempts') + 1,
+            )
+            if claimed:
+                self._count("claimed")
+                return ActivityJob.objects.select_related('user').get(pk=pk)
+            # Another worker got it first — try the next one
+
+    def run(self, job):
+        """Runs one claimed job and stores its outcome; the audio upload is dropped."""
+        start = time.monotonic()
+        try:
+            result, http_status = self.handler(job)
+            outcome = {"status": 'done' if http_status < 400 else 'failed',
+                       "result": result, "http_status": http_status, "error": ''}
+        except Exception as e:
+            logger.error("Job %s failed: %s", job.pk, traceback.format_exc())
+            outcome = {"status": 'failed', "result": None, "http_status": 500,
+                       "error": f"{type(e).__name__}: {e}"}
+
+        ActivityJob.objects.filter(pk=job.pk, status='running').update(
+            finished_at=timezone.now(), audio=None, **outcome,
+        )
+        self._count(outcome["status"])
+        logger.info("Job %s %s in %.2fs (HTTP %s)", job.pk, outcome["status"],
+                    time.monotonic() - start, outcome["http_status"])
+
+    # ── Housekeeping ──────────────────────────────────────────────────────────
+    def _sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < _SWEEP_EVERY:
+                return
+            self._last_sweep = now
+
+        cutoff = timezone.now() - timedelta(seconds=self.stale_after)
+        stale = ActivityJob.objects.filter(status='running', started_at__lt=cutoff)
+        requeued = stale.filter(attempts__lt=self.max_attempts).update(
+            status='queued', started_at=None,
+        )
+        abandoned = stale.update(
+            status='failed', finished_at=timezone.now(), audio=None, http_status=500,
+            error=f"Worker lost the job {self.max_attempts} time(s)",
+        )
+        if requeued or abandoned:
+            logger.warning("Job queue: re-queued %d stale job(s), gave up on %d",
+                           requeued, abandoned)
+            self._wake.set()
+
+        pruned = 0
+        if self.retention:
+            pruned, _ = ActivityJob.objects.filter(
+                status__in=('done', 'failed'),
+                finished_at__lt=timezone.now() - timedelta(seconds=self.retention),
+            ).delete()
+
+        self._count("requeued", requeued)
+        self._count("abandoned", abandoned)
+        self._count("pruned", pruned)
+
+    # ── Stats ─────────────────────────────────────────────────────────────────
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, workers=len(self._threads),
+                         poll_interval_s=self.poll_interval)
+        try:
+            stats["queued"]  = ActivityJob.objects.filter(status='queued').count()
+            stats["running"] = ActivityJob.objects.filter(status='running').count()
+        except Exception:
+            stats["queued"] = stats["running"] = None
+        return stats
@@ -0,0 +1,207 @@
+import random
+import re
+import statistics
+import string
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.factor_catalog import CATALOG
+from users.tests.reference import (SAMPLE_CLAUSES, legacy_category_scores, legacy_hinglish,
+                                   legacy_key_search, legacy_match_trigger, legacy_scan,
+                                   lexed_scan)
+
+STAGES = ('trigger', 'category', 'keys', 'hinglish', 'lexer')
+
+
+def synthetic_keys(count, seed=7):
+    """Custom-factor-like keys: 2-4 random lowercase words joined by '_'."""
+    rng = random.Random(seed)
+    def word():
+        return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+    return [
+        '_'.join(word().capitalize() for _ in range(rng.randint(2, 4)))
+        for _ in range(count)
+    ]
+
+
+def _typos(word):
+    """A handful of one-edit variants of a word (drop, double, swap)."""
+    variants = {word[1:], word[:-1], word + word[-1], word[0] + word}
+    if len(word) > 2:
+        variants.add(word[1] + word[0] + word[2:])
+    return [v for v in variants if v]
+
+
+class Command(BaseCommand):
+    help = (
+        'Micro-benchmarks the local fallback classifier stage by stage, per '
+        'clause: trigger = SPECIFIC_KEY_MAP scan (per-trigger re.search vs '
+        'a clause_lexer pass); category = keyword scoring (words × '
+        'keywords fuzz.ratio vs the length-filtered memoized index); keys = '
+        'DB key search (key × word × part loop vs the trigram index) over '
+        '--keys synthetic custom factors; hinglish = translation (chained '
+        'replace vs the compiled single-pass regex); lexer = words, quantity, '
+        'unit and trigger (one regex per rule vs one clause_lexer pass). '
+        'Fails if any clause gets a different answer, except hinglish, which '
+        'now respects word boundaries and only reports how many clauses '
+        'changed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20,
+                            help='Passes over the clause corpus per strategy')
+        parser.add_argument('--stage', choices=STAGES + ('all',), default='all')
+        parser.add_argument('--keys', type=int, default=50_000,
+                            help='Synthetic custom factor keys for the keys stage')
+
+    def handle(self, *args, **options):
+        rounds = options['rounds']
+        stages = STAGES if options['stage'] == 'all' else (options['stage'],)
+
+        from users.views import fallback_classify   # heavy import (NLTK, Watson)
+
+        clauses = self._clauses()
+        for stage in stages:
+            getattr(self, f'_bench_{stage}')(clauses, rounds, options)
+
+        full = self._time(clauses, rounds, fallback_classify)
+        self._report('fallback_classify', full)
+
+    def _clauses(self):
+        clauses = [c.lower() for c in SAMPLE_CLAUSES]
+        # Every trigger in a sentence of its own, plus inside a longer word
+        # (must NOT match) — covers the whole table, not just the samples.
+        for trigger in CATALOG.triggers_longest_first:
+            clauses.append(f'yesterday i had {trigger} 2 times')
+            clauses.append(f'x{trigger}x 3')
+        # Two triggers in one clause: the longer one must still win
+        triggers = CATALOG.triggers_longest_first
+        clauses.extend(f'{b} then {a}' for a, b in zip(triggers, triggers[::-1]))
+        return clauses
+
+    # ── Stages ────────────────────────────────────────────────────────────────
+    def _bench_trigger(self, clauses, rounds, options):
+        from users.clause_lexer import best_trigger, lex_clause
+
+        def lexed_match_trigger(text):
+            return best_trigger(lex_clause.__wrapped__(text))   # unmemoized lex
+
+        self._check('trigger', clauses, legacy_match_trigger, lexed_match_trigger)
+        before = self._time(clauses, rounds, legacy_match_trigger)
+        after  = self._time(clauses, rounds, lexed_match_trigger)
+        self._compare('trigger scan', before, after)
+
+    def _bench_category(self, clauses, rounds, options):
+        from users.fuzzy_index import CategoryKeywordIndex
+        from users.views import CATEGORY_INDEX, CATEGORY_KEYWORDS, EXCLUDED_FROM_SCORING
+
+        word_lists = [re.findall(r'\b[a-z]+\b', c) for c in clauses]
+        # Near-misses around the threshold: one-edit typos of every keyword
+        for keywords in CATEGORY_KEYWORDS.values():
+            for kw in keywords:
+                word_lists.append(['ate', *_typos(kw)])
+
+        self._check('category', word_lists, legacy_category_scores, CATEGORY_INDEX.scores)
+        cold_index = CategoryKeywordIndex(CATEGORY_KEYWORDS, EXCLUDED_FROM_SCORING, memo_size=0)
+        before = self._time(word_lists, rounds, legacy_category_scores)
+        cold   = self._time(word_lists, rounds, cold_index.scores)
+        warm   = self._time(word_lists, rounds, CATEGORY_INDEX.scores)
+        self._report('category scoring (no memo)', cold)
+        self._compare('category scoring', before, warm)
+
+    def _bench_keys(self, clauses, rounds, options):
+        from users.fuzzy_index import EmissionKeyIndex
+        from users.views import get_cached_emission_keys
+
+        base = list(get_cached_emission_keys()) + list(CATALOG.triggers_longest_first)
+        extra = synthetic_keys(options['keys'])
+        inputs = [(c, re.findall(r'\b[a-z]+\b', c)) for c in clauses]
+        # Typos of synthetic parts exercise the fuzzy path, not the substring one
+        rng = random.Random(11)
+        for key in rng.sample(extra[:2000], min(200, len(extra))):
+            part = rng.choice(key.lower().split('_'))
+            for typo in _typos(part):
+                inputs.append((f'had {typo} 2 kg', ['had', typo, 'kg']))
+
+        # Parity on a key set small enough for the old loop to check quickly
+        small = base + extra[:2000]
+        index = EmissionKeyIndex(small)
+        self._check('keys', inputs,
+                    lambda i: legacy_key_search(small, *i), lambda i: index.find(*i))
+
+        start = time.perf_counter()
+        index = EmissionKeyIndex(base + extra)
+        self.stdout.write(f'index build ({len(index)} keys): '
+                          f'{(time.perf_counter() - start) * 1000:.0f} ms')
+        sample = inputs[::max(1, len(inputs) // 20)]
+        before = self._time(sample, 1, lambda i: legacy_key_search(index.keys, *i))
+        cold   = self._time(inputs, 1, lambda i: index.find(*i))
+        after  = self._time(inputs, rounds, lambda i: index.find(*i))
+        self._report(f'key search @{len(index)} (cold)', cold)
+        self._compare(f'key search @{len(index)}', before, after)
+
+    def _bench_hinglish(self, clauses, rounds, options):
+        from users.views import HINGLISH_MAP, apply_hinglish_translation
+
+        phrases = sorted(HINGLISH_MAP)
+        texts = [f'aaj maine {p} aur phir {q} 2 kg' for p, q in zip(phrases, phrases[::-1])]
+        texts += clauses
+        changed = sum(legacy_hinglish(t) != apply_hinglish_translation(t) for t in texts)
+        self.stdout.write(f'hinglish: {len(texts)} inputs, {changed} translated differently '
+                          f'(word boundaries)')
+
+        before = self._time(texts, rounds, legacy_hinglish)
+        cold   = self._time(texts, 1, apply_hinglish_translation.__wrapped__)
+        after  = self._time(texts, rounds, apply_hinglish_translation)
+        self._report('hinglish (no memo)', cold)
+        self._compare('hinglish', before, after)
+
+    def _bench_lexer(self, clauses, rounds, options):
+        from users.clause_lexer import lex_clause
+
+        texts = clauses + [
+            f'{q} {u} {w}' for q in ('2', '1/2', '.5', '0.5', 'two', 'a', '')
+            for u in ('kg', 'g', 'ml', 'km', 'units', 'kilowatt hour', 'liters', '')
+            for w in ('rice', 'electricity', 'petrol car')
+        ] + [f'{q}{u} milk' for q in ('200', '1.5', '3') for u in ('g', 'kg', 'ml', 'gr')]
+        self._check('lexer', texts, legacy_scan, lexed_scan)
+
+        before = self._time(texts, rounds, legacy_scan)
+        cold   = self._time(texts, 1, lambda t: lexed_scan(t, lex_clause.__wrapped__))
+        after  = self._time(texts, rounds, lexed_scan)
+        self._report('clause scan (no memo)', cold)
+        self._compare('clause scan', before, after)
+
+    # ── Helpers ───────────────────────────────────────────────────────────────
+    def _check(self, stage, inputs, before, after):
+        mismatches = [(i, before(i), after(i)) for i in inputs if before(i) != after(i)]
+        if mismatches:
+            for value, old, new in mismatches[:10]:
+                self.stderr.write(f'  {value!r}: before={old!r} after={new!r}')
+            raise CommandError(f'{stage}: {len(mismatches)} input(s) classified differently')
+        self.stdout.write(f'{stage}: {len(inputs)} inputs, identical results')
+
+    def _time(self, inputs, rounds, classify):
+        samples = []
+        for _ in range(rounds):
+            for value in inputs:
+                start = time.perf_counter()
+                classify(value)
+                samples.append((time.perf_counter() - start) * 1_000_000)
+        return samples
+
+    def _compare(self, label, before, after):
+        self._report(f'{label} before', before)
+        self._report(f'{label} after', after)
+        self.stdout.write(self.style.SUCCESS(
+            f'{label} speed-up: {statistics.mean(before) / statistics.mean(after):.1f}x'
+        ))
+
+    def _report(self, label, samples):
+        samples = sorted(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        self.stdout.write(
+            f'{label:28s} mean={statistics.mean(samples):9.1f} µs  '
+            f'p50={statistics.median(samples):9.1f} µs  p95={p95:9.1f} µs'
+        )
@@ -0,0 +1,196 @@
+import gzip
+import json
+import logging
+import os
+import socket
+import statistics
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from django.core.management.base import BaseCommand
+
+DB = 'activity-logs'
+
+
+class CloudantStandIn(ThreadingHTTPServer):
+    """
+    Local stand-in for IAM + Cloudant with a configurable round trip per
+    request, a one-off cost per new connection (the TLS handshake a real
+    endpoint charges) and a token exchange time.  Counts what it served.
+    """
+    daemon_threads = True
+
+    def __init__(self, rtt, handshake, iam):
+        super().__init__(('127.0.0.1', 0), _StandInHandler)
+        self.rtt, self.handshake, self.iam = rtt, handshake, iam
+        self.counts = Counter()
+        self.db_exists = True
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'    # keep-alive, as Cloudant
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # No Nagle / delayed-ACK stalls between headers and body
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.count('connections')
+        time.sleep(self.server.handshake)
+
+    def _reply(self, code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.headers.get('Content-Encoding') == 'gzip':   # the SDK compresses bodies
+            raw = gzip.decompress(raw)
+        return json.loads(raw or b'null')
+
+    def do_POST(self):
+        server, path = self.server, self.path.split('?')[0]
+        if path == '/identity/token':
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            server.count('iam_token')
+            time.sleep(server.iam)
+            now = int(time.time())
+            token = jwt.encode({'iat': now, 'exp': now + 3600},
+                               'stand-in-signing-key-not-verified', algorithm='HS256')
+            return self._reply(200, {'access_token': token, 'refresh_token': 'r',
+                                     'token_type': 'Bearer', 'expires_in': 3600,
+                                     'expiration': now + 3600})
+        body = self._body()
+        time.sleep(server.rtt)
+        if not server.db_exists:
+            server.count('not_found')
+            return self._reply(404, {'error': 'not_found', 'reason': 'Database does not exist.'})
+        if path == f'/{DB}':
+            server.count('post_document')
+            return self._reply(201, {'ok': True, 'id': 'x', 'rev': '1-x'})
+        if path == f'/{DB}/_bulk_docs':
+            server.count('bulk_docs')
+            return self._reply(201, [{'ok': True, 'id': 'x', 'rev': '1-x'} for _ in body['docs']])
+        if path == f'/{DB}/_index':
+            server.count('put_index')
+            return self._reply(200, {'result': 'exists'})
+        server.count('other')
+        self._reply(200, {'docs': []})
+
+    def do_GET(self):
+        time.sleep(self.server.rtt)
+        self.server.count('get_database_information')
+        if not self.server.db_exists:
+            return self._reply(404, {'error': 'not_found', 'reason': 'Database does not exist.'})
+        self._reply(200, {'db_name': DB, 'doc_count': 0})
+
+    def do_PUT(self):
+        time.sleep(self.server.rtt)
+        self.server.count('put_database')
+        self.server.db_exists = True
+        self._reply(201, {'ok': True})
+
+
+def legacy_save_activity_log(data):
+    """
+    save_activity_log as it was: a new authenticator and client per call,
+    then a database existence check before every write.
+    """
+    from decouple import config
+    from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+    from ibmcloudant.cloudant_v1 import CloudantV1
+    authenticator = IAMAuthenticator(config("CLOUDANT_APIKEY"), url=config("CLOUDANT_IAM_URL", default=None))
+    client = CloudantV1(authenticator=authenticator)
+    client.set_service_url(config("CLOUDANT_URL"))
+    client.get_database_information(db=DB).get_result()
+    return client.post_document(db=DB, document=data).get_result().get('ok')
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures save_activity_log latency and Cloudant request volume '
+        'against a local IAM + Cloudant stand-in: "before" is the old save '
+        'path (a new client and a database existence check per save), '
+        '"after" is save_activity_log as it is now. --rtt-ms, --handshake-ms '
+        'and --iam-ms set the emulated network costs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--saves', type=int, default=200)
+        parser.add_argument('--rtt-ms', type=float, default=5.0, help='Round trip per request')
+        parser.add_argument('--handshake-ms', type=float, default=20.0,
+                            help='Extra cost of each new connection (TLS setup)')
+        parser.add_argument('--iam-ms', type=float, default=150.0, help='IAM token exchange')
+
+    def handle(self, *args, **options):
+        from users import cloudant_db
+
+        server = CloudantStandIn(options['rtt_ms'] / 1000, options['handshake_ms'] / 1000,
+                                 options['iam_ms'] / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        saved_env = {k: os.environ.get(k) for k in ('CLOUDANT_URL', 'CLOUDANT_APIKEY', 'CLOUDANT_IAM_URL')}
+        os.environ.update(CLOUDANT_URL=server.url, CLOUDANT_APIKEY='stand-in', CLOUDANT_IAM_URL=server.url)
+
+        cloudant_db.reset_cloudant_client()
+        try:
+            before = self._run('before', server, options['saves'], legacy_save_activity_log)
+            after  = self._run('after', server, options['saves'], cloudant_db.save_activity_log)
+        finally:
+            cloudant_db.reset_cloudant_client()
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+            server.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'mean save latency: {before[0] / after[0]:.1f}x lower '
+            f'({before[0] * 1000:.1f} ms → {after[0] * 1000:.1f} ms), '
+            f'Cloudant requests: {before[1]} → {after[1]}'
+        ))
+
+    def _run(self, label, server, saves, save):
+        server.counts.clear()
+        doc = {'username': 'bench', 'key': 'car_petrol', 'co2e': 1.0}
+        latencies = []
+        logger = logging.getLogger('logger_service')
+        level = logger.level
+        logger.setLevel(logging.WARNING)     # save_activity_log logs each save at DEBUG
+        try:
+            for _ in range(saves):
+                start = time.perf_counter()
+                save(dict(doc))
+                latencies.append(time.perf_counter() - start)
+        finally:
+            logger.setLevel(level)
+
+        latencies.sort()
+        counts = dict(server.counts)
+        requests = sum(n for name, n in counts.items() if name not in ('connections', 'iam_token'))
+        self.stdout.write(
+            f'{label:6s} mean {statistics.mean(latencies) * 1000:7.2f} ms  '
+            f'p50 {latencies[len(latencies) // 2] * 1000:7.2f} ms  '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.2f} ms  '
+            f'| Cloudant requests/save {requests / saves:.2f}  '
+            f'IAM tokens {counts.get("iam_token", 0)}  connections {counts.get("connections", 0)}'
+        )
+        return statistics.mean(latencies), requests
@@ -0,0 +1,88 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from users.models import EmissionFactor
+
+LOOKUP_FIELDS = ('co2e_per_unit', 'status', 'is_verified_factor', 'added_by_id')
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks EmissionFactor key lookups: key__iexact (before) vs the '
+        'key_normalized composite index (after). Runs inside a transaction '
+        'that is rolled back, so no benchmark rows are left behind.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000,
+                            help='Custom factors to insert (default 100k)')
+        parser.add_argument('--lookups', type=int, default=500,
+                            help='Lookups to time per strategy')
+
+    def handle(self, *args, **options):
+        rows, lookups = options['rows'], options['lookups']
+
+        with transaction.atomic():
+            user = User.objects.create(username=f'bench_{int(time.time())}')
+            self.stdout.write(f'Inserting {rows} custom factors...')
+            EmissionFactor.objects.bulk_create(
+                (
+                    EmissionFactor(
+                        activity_type='FOOD',
+                        key=f'Bench_Custom_Item_{i}',
+                        key_normalized=f'bench_custom_item_{i}',
+                        co2e_per_unit=1.0 + (i % 100) / 10,
+                        unit='kg',
+                        status='pending',
+                        added_by=user,
+                    )
+                    for i in range(rows)
+                ),
+                batch_size=5000,
+            )
+
+            keys = [f'BENCH_custom_item_{random.randrange(rows)}' for _ in range(lookups)]
+
+            before = self._time(keys, lambda k: EmissionFactor.objects.filter(key__iexact=k))
+            after  = self._time(keys, lambda k: EmissionFactor.objects.filter(key_normalized=k.lower()))
+
+            self._report('before (key__iexact)', before)
+            self._report('after  (key_normalized)', after)
+            self.stdout.write(self.style.SUCCESS(
+                f'Speed-up: {statistics.mean(before) / statistics.mean(after):.1f}x'
+            ))
+            self._explain(keys[0])
+
+            transaction.set_rollback(True)
+
+    def _time(self, keys, build_qs):
+        samples = []
+        for k in keys:
+            start = time.perf_counter()
+            list(build_qs(k).order_by('pk').values(*LOOKUP_FIELDS))
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    def _report(self, label, samples):
+        samples = sorted(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        self.stdout.write(
+            f'{label:26s} mean={statistics.mean(samples):8.3f} ms  '
+            f'p50={statistics.median(samples):8.3f} ms  p95={p95:8.3f} ms'
+        )
+
+    def _explain(self, key):
+        for label, qs in (
+            ('before', EmissionFactor.objects.filter(key__iexact=key)),
+            ('after ', EmissionFactor.objects.filter(key_normalized=key.lower(), status='pending')),
+        ):
+            sql, params = qs.values(*LOOKUP_FIELDS).query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = ' | '.join(str(row[-1]) for row in cursor.fetchall())
+            self.stdout.write(f'{label} plan: {plan}')
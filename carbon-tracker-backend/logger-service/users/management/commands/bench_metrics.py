@@ -0,0 +1,108 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from .bench_text_pipeline import synthetic_diary
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the cost of the /metrics instrumentation: runs the local '
+        'logging pipeline (normalize → split → classify → calculate, no AI '
+        'service, no Cloudant) over synthetic diary entries with metrics on '
+        'and off. Each entry runs in both modes back to back, in alternating '
+        'order, so drift on a busy machine hits both alike; the median of the '
+        'per-round ratios is reported. Caches are cleared before every run '
+        'so classification does real work. The request-latency middleware is '
+        'timed the same way, and both are also shown against a request that '
+        'spends --io-ms in the AI service and Cloudant, as every real request '
+        'does. --aa runs "off" against itself to show the noise floor.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=200, help='Diary entries per round')
+        parser.add_argument('--rounds', type=int, default=61, help='Rounds (median reported)')
+        parser.add_argument('--warm', action='store_true',
+                            help='Keep caches warm — the cheapest pipeline, worst case for overhead')
+        parser.add_argument('--sample', type=int, default=None,
+                            help='Override METRICS_STAGE_SAMPLE (1 times every request)')
+        parser.add_argument('--aa', action='store_true',
+                            help='Leave metrics off in both arms (noise floor)')
+        parser.add_argument('--io-ms', type=float, default=50.0,
+                            help='AI + Cloudant time per request for the end-to-end estimate')
+
+    def handle(self, *args, **options):
+        from users import metrics, views
+        from users.middleware import RequestMetricsMiddleware
+
+        user = User.objects.first()
+        if user is None:
+            raise CommandError('Needs at least one user in the database')
+        entries = synthetic_diary(options['entries']).splitlines()
+
+        def pipeline(entry):
+            if not options['warm']:
+                views.CLASSIFY_CACHE.clear()
+                views.lex_clause.cache_clear()
+            start = time.perf_counter()
+            # build_activity_result's instrumentation, minus the Cloudant save
+            timer = metrics.stage_timer()
+            text = views.normalize_input_text(entry)
+            timer.lap('normalize')
+            clauses = [c.strip() for c in views.split_activity_clauses(text)]
+            timer.lap('split')
+            views.build_activity_docs(clauses, user, 'bench', use_ai=False, timer=timer)
+            timer.flush()
+            return time.perf_counter() - start
+
+        middleware = RequestMetricsMiddleware(lambda request: HttpResponse())
+        request    = RequestFactory().post('/api/log-activity/')
+
+        def http(entry):
+            start = time.perf_counter()
+            middleware(request)
+            return time.perf_counter() - start
+
+        def run_round(measure, round_):
+            totals = {True: 0.0, False: 0.0}
+            for i, entry in enumerate(entries):
+                for mode in ((True, False) if (i + round_) % 2 else (False, True)):
+                    metrics.ENABLED = mode and not options['aa']
+                    totals[mode] += measure(entry)
+            return totals
+
+        enabled, sample = metrics.ENABLED, metrics.STAGE_SAMPLE
+        if options['sample'] is not None:
+            metrics.STAGE_SAMPLE = max(1, options['sample'])
+        try:
+            run_round(pipeline, 0)   # warm-up: imports, factor table, key index
+            rounds = [(run_round(pipeline, r), run_round(http, r)) for r in range(options['rounds'])]
+            metrics.fold()
+            stage_sample = metrics.STAGE_SAMPLE
+        finally:
+            metrics.ENABLED, metrics.STAGE_SAMPLE = enabled, sample
+
+        median    = lambda values: sorted(values)[len(values) // 2]   # noqa: E731
+        per_entry = lambda t: t / len(entries) * 1_000_000              # noqa: E731
+        ratio     = median([p[True] / p[False] - 1 for p, _ in rounds])
+        off       = per_entry(median([p[False] for p, _ in rounds]))
+        cost      = off * ratio
+        http_cost = per_entry(median([h[True] - h[False] for _, h in rounds]))
+
+        self.stdout.write(f'stage sample: 1 in {stage_sample} requests'
+                          + ('   (A/A: metrics off in both arms)' if options['aa'] else ''))
+        self.stdout.write(f'metrics off: {off:8.1f} µs / entry')
+        self.stdout.write(f'metrics on:  {off + cost:8.1f} µs / entry')
+        self.stdout.write(
+            f'overhead: {ratio * 100:+.2f}% of the local pipeline '
+            f'({cost:.2f} µs / entry, without any AI or Cloudant time)'
+        )
+        self.stdout.write(f'middleware: {http_cost:+.2f} µs / request')
+        total = off + options['io_ms'] * 1000
+        self.stdout.write(self.style.SUCCESS(
+            f'overhead: {(cost + http_cost) / total * 100:+.3f}% of a request with '
+            f'{options["io_ms"]:.0f} ms of AI / Cloudant I/O'
+        ))
@@ -0,0 +1,88 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter per sample, like a newly forked worker
+PROBE = r'''
+import json, os, resource, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+if os.environ.get("PROBE_EAGER_NLTK"):
+    # What users.views did at import before the splitter became lazy
+    import nltk
+    for r in ["tokenizers/punkt", "tokenizers/punkt_tab"]:
+        try:
+            nltk.data.find(r)
+        except LookupError:
+            nltk.download(r.split("/")[-1], quiet=True)
+import users.views as views
+boot = time.perf_counter() - t0
+boot_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t1 = time.perf_counter()
+clauses = list(views.split_activity_clauses(views.normalize_input_text(
+    "took metro 12 km and had 2 chai. ate 200g paneer aur used ac for 3 hours")))
+first = time.perf_counter() - t1
+print(json.dumps({
+    "boot": boot, "first": first, "boot_rss": boot_rss,
+    "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "splitter": getattr(views.get_sentence_splitter(), "__name__", "?"),
+    "clauses": len(clauses),
+}))
+'''
+
+MODES = {
+    'eager-nltk': {'SENTENCE_SPLITTER': 'nltk', 'PROBE_EAGER_NLTK': '1'},
+    'lazy-nltk':  {'SENTENCE_SPLITTER': 'nltk'},
+    'builtin':    {'SENTENCE_SPLITTER': 'builtin'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares per-worker startup for the sentence splitter modes: '
+        'eager-nltk (NLTK loaded at import, the old behaviour), lazy-nltk '
+        '(punkt loaded on the first request) and builtin. Each sample is a '
+        'fresh interpreter that imports users.views and then splits one '
+        'diary entry; reports boot time, first-request time and peak RSS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5,
+                            help='Fresh interpreters per mode (medians are reported)')
+        parser.add_argument('--mode', choices=tuple(MODES) + ('all',), default='all')
+
+    def handle(self, *args, **options):
+        modes = MODES if options['mode'] == 'all' else {options['mode']: MODES[options['mode']]}
+        self.stdout.write(f"{'mode':11s} {'boot':>9s} {'1st split':>10s} "
+                          f"{'RSS boot':>10s} {'RSS peak':>10s}  splitter")
+        for name, overrides in modes.items():
+            samples = [self._probe(overrides) for _ in range(options['runs'])]
+
+            def median(field):
+                return statistics.median(s[field] for s in samples)
+
+            self.stdout.write(
+                f"{name:11s} {median('boot') * 1000:7.0f}ms {median('first') * 1000:8.1f}ms "
+                f"{median('boot_rss') / 1024:8.1f}MB {median('rss') / 1024:8.1f}MB  "
+                f"{samples[-1]['splitter']}"
+            )
+
+    def _probe(self, overrides):
+        env = {k: v for k, v in os.environ.items() if k != 'PROBE_EAGER_NLTK'}
+        env.update(overrides)
+        env['PYTHONPATH'] = os.pathsep.join(
+            p for p in (str(settings.BASE_DIR), env.get('PYTHONPATH')) if p
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE], env=env, cwd=settings.BASE_DIR,
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Probe failed:\n{result.stderr[-2000:]}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
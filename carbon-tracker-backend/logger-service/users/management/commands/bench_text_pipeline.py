@@ -0,0 +1,112 @@
+import random
+import re
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.tests.reference import (SAMPLE_CLAUSES, legacy_normalize_input_text,
+                                   legacy_split_activity_clauses)
+
+# How diary lines get glued together — every boundary the normalizer knows
+CONNECTIVES = (
+    ' and ', ' aur ', ' tatha ', ', ', '; ', ' / ', ' then ', ' and then ',
+    ' also ', ' and i ', ' or ', ' after that ', ' and also ',
+)
+
+
+def synthetic_diary(lines, seed=3):
+    """One activity sentence per line, 1-4 clauses glued by connectives."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(lines):
+        clauses = [rng.choice(SAMPLE_CLAUSES) for _ in range(rng.randint(1, 4))]
+        line = clauses[0]
+        for clause in clauses[1:]:
+            line += rng.choice(CONNECTIVES) + clause
+        out.append(('- ' if rng.random() < 0.2 else '') + line)
+    return '\n'.join(out)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks normalize_input_text + split_activity_clauses on one large '
+        'pasted diary (default: 10,000 synthetic lines). Reports wall time, '
+        'clauses/sec and peak traced memory for the old per-call regex '
+        'pipeline and the precompiled, generator-based one, then the mean '
+        'latency with each line sent as its own request. Fails if the two '
+        'pipelines produce different clauses.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=10_000,
+                            help='Synthetic diary lines to generate')
+        parser.add_argument('--file', help='Benchmark this text file instead of a synthetic diary')
+        parser.add_argument('--rounds', type=int, default=3,
+                            help='Timed passes per pipeline (best one is reported)')
+
+    def handle(self, *args, **options):
+        from users.views import normalize_input_text, split_activity_clauses
+
+        if options['file']:
+            try:
+                diary = Path(options['file']).read_text()
+            except OSError as e:
+                raise CommandError(f'Cannot read {options["file"]}: {e}')
+        else:
+            diary = synthetic_diary(options['lines'])
+        self.stdout.write(f'input: {diary.count(chr(10)) + 1} lines, {len(diary) / 1024:.0f} KiB')
+
+        def legacy():
+            return legacy_split_activity_clauses(legacy_normalize_input_text(diary))
+
+        def current():
+            return split_activity_clauses(normalize_input_text(diary))
+
+        if legacy() != list(current()):
+            raise CommandError('The two pipelines produced different clauses')
+
+        before = self._run('before', legacy, options['rounds'])
+        after  = self._run('after', current, options['rounds'])
+        self.stdout.write(self.style.SUCCESS(
+            f'speed-up: {before[0] / after[0]:.1f}x, '
+            f'peak memory: {before[1] / after[1]:.1f}x lower'
+        ))
+
+        # Typical requests: each diary line on its own, where per-call
+        # pattern building rather than scanning dominates
+        lines = diary.splitlines()
+        before = self._per_request(
+            'before', lines, lambda t: legacy_split_activity_clauses(legacy_normalize_input_text(t)))
+        after = self._per_request(
+            'after', lines, lambda t: list(split_activity_clauses(normalize_input_text(t))))
+        self.stdout.write(self.style.SUCCESS(f'per-request speed-up: {before / after:.1f}x'))
+
+    def _run(self, label, pipeline, rounds):
+        best = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            count = sum(1 for _ in pipeline())
+            best = min(best, time.perf_counter() - start)
+
+        # Clauses are consumed one at a time, as the processing loop would
+        tracemalloc.start()
+        for _ in pipeline():
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f'{label:7s} {count} clauses in {best * 1000:8.1f} ms  '
+            f'{count / best:10.0f} clauses/s  peak {peak / 1024:8.0f} KiB'
+        )
+        return best, peak
+
+    def _per_request(self, label, lines, pipeline):
+        start = time.perf_counter()
+        for line in lines:
+            pipeline(line)
+        mean = (time.perf_counter() - start) / max(len(lines), 1) * 1_000_000
+        self.stdout.write(f'{label:7s} one line per request: mean {mean:8.1f} µs')
+        return mean
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from users.factor_snapshot import SNAPSHOT_PATH, publish_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Publishes the shared emission factor snapshot from the DB. Run it at '
+        'deploy time (after migrate) so no request waits for the first one; '
+        'workers read factors from the DB until a snapshot exists.'
+    )
+
+    def handle(self, *args, **options):
+        version = publish_snapshot()
+        self.stdout.write(self.style.SUCCESS(f'Published factor snapshot v{version} to {SNAPSHOT_PATH}'))
@@ -0,0 +1,185 @@
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from ibm_cloud_sdk_core.api_exception import ApiException
+from ibmcloudant.cloudant_v1 import BulkDocs
+
+from users.carbon_calculator import calculate_co2e_many
+from users.cloudant_db import ACTIVITY_INDEX_DDOC, ensure_activity_db, get_cloudant_client
+from users.factor_catalog import CATALOG
+from users.models import EmissionFactor
+
+DB_NAME = 'activity-logs'
+KEY_INDEX = [ACTIVITY_INDEX_DDOC, 'by-key']   # created by ensure_activity_db
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes co2e for activity logs whose emission factor changed. '
+        'Only logs for the given key(s) are scanned, one Cloudant page at a '
+        'time; each page is written back with a single _bulk_docs request and '
+        'the bookmark is checkpointed, so an interrupted run resumes where it '
+        'stopped. Logs already stamped with the current factor are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--key', action='append', default=[],
+                            help='Factor key to recompute (repeatable)')
+        parser.add_argument('--all', action='store_true',
+                            help='Scan every activity log instead of selected keys')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Docs per Cloudant page / _bulk_docs write')
+        parser.add_argument('--checkpoint',
+                            default=str(Path(settings.BASE_DIR) / 'data' / 'recompute_co2e.json'),
+                            help='Resume file (bookmark + counters)')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore any saved checkpoint and start from the beginning')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        if not options['key'] and not options['all']:
+            raise CommandError('Pass --key <factor key> (repeatable) or --all.')
+
+        client = get_cloudant_client()
+        if not client:
+            raise CommandError('Cloudant is not configured (CLOUDANT_APIKEY / CLOUDANT_URL).')
+
+        selector = self._selector(options['key'], options['all'])
+        checkpoint_path = Path(options['checkpoint'])
+        state = self._load_checkpoint(checkpoint_path, selector, options['restart'])
+        if state['bookmark']:
+            self.stdout.write(f"Resuming after {state['scanned']} scanned docs")
+
+        self._ensure_key_index(client)
+
+        while True:
+            try:
+                page = client.post_find(
+                    db=DB_NAME,
+                    selector=selector,
+                    bookmark=state['bookmark'] or None,
+                    use_index=KEY_INDEX,
+                    limit=options['batch_size'],
+                ).get_result()
+            except ApiException as e:
+                raise CommandError(f'Cloudant query failed: {e}')
+
+            docs = page.get('docs', [])
+            if not docs:
+                break
+
+            changed = self._recompute(docs)
+            if changed and not options['dry_run']:
+                self._write(client, changed)
+
+            state['bookmark'] = page.get('bookmark')
+            state['scanned'] += len(docs)
+            state['updated'] += len(changed)
+            if not options['dry_run']:
+                self._save_checkpoint(checkpoint_path, state)
+            self.stdout.write(f"  scanned {state['scanned']}, updated {state['updated']}")
+
+            if len(docs) < options['batch_size']:
+                break
+
+        if not options['dry_run'] and checkpoint_path.exists():
+            checkpoint_path.unlink()
+        verb = 'would update' if options['dry_run'] else 'updated'
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {state['scanned']} scanned, {verb} {state['updated']}"
+        ))
+
+    # ── Selection ─────────────────────────────────────────────────────────────
+    def _selector(self, keys, scan_all):
+        if scan_all:
+            return {'key': {'$exists': True}}
+
+        # Logs store the key as the pipeline produced it, which may differ in
+        # case from the EmissionFactor row — match every known spelling.
+        variants = set()
+        for key in keys:
+            norm = key.lower().strip()
+            variants.update({key, norm})
+            display = CATALOG.display_key(norm)
+            if display is not None:
+                variants.add(display)
+            variants.update(
+                EmissionFactor.objects.filter(key_normalized=norm).values_list('key', flat=True)
+            )
+        return {'key': {'$in': sorted(variants)}}
+
+    def _ensure_key_index(self, client):
+        if not ensure_activity_db(client):
+            raise CommandError(f'Could not set up {DB_NAME} and its indexes.')
+
+    # ── Recompute ─────────────────────────────────────────────────────────────
+    def _recompute(self, docs):
+        users = User.objects.in_bulk(
+            {d['username'] for d in docs if d.get('username')}, field_name='username'
+        )
+        results = calculate_co2e_many(
+            ((d.get('key'), d.get('quantity'), d.get('unit'), users.get(d.get('username')))
+             for d in docs),
+            with_factor=True,
+        )
+
+        changed = []
+        for doc, (co2e, is_verified, factor) in zip(docs, results):
+            if (
+                doc.get('co2e') == co2e
+                and doc.get('factor_id') == factor.factor_id
+                and doc.get('factor_version') == factor.version
+            ):
+                continue
+            doc.update({
+                'co2e':           co2e,
+                'is_verified':    is_verified,
+                'factor_id':      factor.factor_id,
+                'factor_version': factor.version,
+                'factor_value':   factor.value,
+            })
+            confidence = doc.get('confidence')
+            if isinstance(confidence, dict):
+                confidence['source'] = (
+                    'db_verified' if is_verified else ('db' if co2e > 0 else 'defaults')
+                )
+            changed.append(doc)
+        return changed
+
+    def _write(self, client, docs):
+        try:
+            results = client.post_bulk_docs(
+                db=DB_NAME, bulk_docs=BulkDocs(docs=docs)
+            ).get_result()
+        except ApiException as e:
+            raise CommandError(f'_bulk_docs write failed: {e}')
+
+        # Conflicts mean the doc was edited mid-run; it is picked up next run
+        for r in results:
+            if r.get('error'):
+                self.stderr.write(f"  {r.get('id')}: {r.get('error')} ({r.get('reason', '')})")
+
+    # ── Checkpoint ────────────────────────────────────────────────────────────
+    def _load_checkpoint(self, path, selector, restart):
+        fresh = {'selector': selector, 'bookmark': None, 'scanned': 0, 'updated': 0}
+        if restart or not path.exists():
+            return fresh
+        try:
+            state = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return fresh
+        if state.get('selector') != selector:
+            self.stdout.write('Checkpoint is for a different key set — starting over')
+            return fresh
+        return state
+
+    def _save_checkpoint(self, path, state):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.name}.tmp')
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, path)
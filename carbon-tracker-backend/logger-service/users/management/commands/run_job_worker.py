@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from users.job_queue import JobWorkerPool
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs async /api/log-activity/ jobs in a dedicated process. Any number '
+        'of these (and the web workers\' own pools) can share the queue; set '
+        'JOB_WORKERS=0 to leave all job processing to them.'
+    )
+
+    def add_arguments(self, parser):
+        from users import views
+        parser.add_argument('--workers', type=int, default=max(views.JOB_WORKERS, 1),
+                            help='Worker threads in this process')
+        parser.add_argument('--poll-interval', type=float, default=views.JOB_POLL_INTERVAL,
+                            help='Seconds between queue polls when idle')
+
+    def handle(self, *args, **options):
+        from users import views
+        pool = JobWorkerPool(
+            views.run_activity_job,
+            workers=options['workers'],
+            poll_interval=options['poll_interval'],
+            stale_after=views.JOB_STALE_AFTER,
+            max_attempts=views.JOB_MAX_ATTEMPTS,
+            retention=views.JOB_RETENTION,
+        )
+        self.stdout.write(f"Running {options['workers']} activity job worker(s); Ctrl-C to stop")
+        pool.run_forever()
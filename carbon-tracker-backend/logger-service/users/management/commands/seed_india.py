@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from users.models import EmissionFactor
 
 class Command(BaseCommand):
@@ -24,19 +25,21 @@ class Command(BaseCommand):
             {'key': 'Buffalo_Milk_Packet', 'at': 'Food', 'val': 1.7, 'unit': 'litre', 'src': 'Amul/MotherDairy'},
         ]
 
+        # One transaction, so the factor snapshot is republished once, not per row
         count = 0
-        for item in india_data:
-            # We set status='verified' because these are your 'Gold Standard' seeds
-            EmissionFactor.objects.update_or_create(
-                key=item['key'],
-                defaults={
-                    'activity_type': item['at'],
-                    'co2e_per_unit': item['val'],
-                    'unit': item['unit'],
-                    'status': 'verified',
-                    'source_reference': item['src']
-                }
-            )
-            count += 1
+        with transaction.atomic():
+            for item in india_data:
+                # We set status='verified' because these are your 'Gold Standard' seeds
+                EmissionFactor.objects.update_or_create(
+                    key=item['key'],
+                    defaults={
+                        'activity_type': item['at'],
+                        'co2e_per_unit': item['val'],
+                        'unit': item['unit'],
+                        'status': 'verified',
+                        'source_reference': item['src']
+                    }
+                )
+                count += 1
             
         self.stdout.write(self.style.SUCCESS(f'Successfully seeded {count} Indian factors.'))
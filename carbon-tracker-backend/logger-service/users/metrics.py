@@ -0,0 +1,443 @@
+"""
+In-process metrics for the logging pipeline, rendered in the Prometheus text
+format by the /metrics view.
+
+Kept dependency-free and cheap — the budget is 1% of the local pipeline
+(`manage.py bench_metrics`).  The hot path records into per-thread shards
+with no lock, and shards are folded into the series on each scrape.  Request
+latency (middleware), clause counts and the I/O-bound stages (AI, Cloudant,
+STT — timed by stage(), whose lock does not matter at milliseconds per call)
+are recorded for every request.  The sub-millisecond local stages cost about
+as much to time as to run, so a StageTimer records them for one request in
+METRICS_STAGE_SAMPLE: for those stages the histogram's _count is the number
+of sampled requests, not of all requests (the HELP text says so).  With
+METRICS_ENABLED off everything hands back shared no-op objects.
+
+Series are per process, like /api/cache-stats/: with several gunicorn
+workers each one exports its own numbers.
+"""
+import threading
+import weakref
+from bisect import bisect_left
+from collections import deque
+from contextlib import nullcontext
+from itertools import count as _counter
+from time import perf_counter
+
+from decouple import config
+
+ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
+
+# 1 in N requests times its local stages (normalize, split, fallback, calculate)
+STAGE_SAMPLE = max(1, config("METRICS_STAGE_SAMPLE", default=32, cast=int))
+
+# Seconds: sub-ms regex/lexer stages up to multi-second AI and Cloudant calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_TIMER = nullcontext()
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name, self.documentation = name, documentation
+        self.labelnames = tuple(labelnames)
+        self._children  = {}    # label values as strings → series
+        self._lookup    = {}    # label values as passed (e.g. status 201) → series
+        self._lock      = threading.Lock()
+
+    def labels(self, *values):
+        child = self._lookup.get(values)
+        if child is None:
+            key = tuple(map(str, values))
+            with self._lock:
+                child = self._children.get(key) or self._new_child()
+                self._children[key] = self._lookup[values] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('_value', '_lock')
+
+    def __init__(self):
+        self._value, self._lock = 0, threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def render(self, name, names, values):
+        return [f'{name}_total{_label_text(names, values)} {_number(self._value)}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class _HistogramChild:
+    __slots__ = ('_buckets', '_counts', '_sum', '_lock')
+
+    def __init__(self, buckets):
+        self._buckets = buckets
+        self._counts  = [0] * (len(buckets) + 1)    # last slot: above every bound
+        self._sum     = 0.0
+        self._lock    = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self._buckets, value)
+        lock = self._lock
+        lock.acquire()
+        self._counts[i] += 1
+        self._sum += value
+        lock.release()
+
+    def merge(self, counts, total):
+        """Adds bucket counts and a sum recorded elsewhere (a thread shard)."""
+        with self._lock:
+            for i, n in enumerate(counts):
+                self._counts[i] += n
+            self._sum += total
+
+    def render(self, name, names, values):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self._buckets + (float('inf'),), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_label_text(names, values, [("le", _number(bound))])} {cumulative}')
+        lines.append(f'{name}_sum{_label_text(names, values)} {_number(total)}')
+        lines.append(f'{name}_count{_label_text(names, values)} {cumulative}')
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+
+class _Timer:
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(perf_counter() - self._start)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  PER-THREAD SHARDS
+#  The request pipeline records into its own thread's shard: plain lists of
+#  bucket counts (plus the sum in the last slot) that no other thread writes,
+#  so recording takes no lock and keeps nothing alive per request.  fold()
+#  copies each shard and adds what changed since the last fold to the shared
+#  series, taking each series lock once per scrape.
+#  When a thread exits, its thread-local goes and a finalizer queues its shard
+#  in _RETIRED; the next fold applies its last samples and drops it, so
+#  short-lived threads (e.g. gunicorn gthread workers being replaced) do not
+#  pile up shards.
+# ─────────────────────────────────────────────────────────────────────────────
+_LOCAL       = threading.local()
+_SHARDS      = []
+_SHARDS_LOCK = threading.Lock()
+_FOLD_LOCK   = threading.Lock()
+_RETIRED     = deque()      # shards of exited threads, awaiting their last fold
+# Retired shards allowed to wait for a scrape before a new thread folds them
+RETIRED_BACKLOG = 64
+
+
+class _Shard:
+    __slots__ = ('stages', 'clauses', 'requests', 'folded')
+
+    def __init__(self):
+        self.stages   = [[0] * (len(STAGE_SECONDS.buckets) + 2) for _ in STAGES]
+        self.clauses  = [0] * len(CLAUSE_TIERS)
+        self.requests = {}    # (view, method, status) → bucket counts + sum
+        self.folded   = {}    # what fold() has already applied, by series
+
+
+class _ShardOwner:
+    """Lives only in its thread's _LOCAL; collected when the thread exits."""
+    __slots__ = ('__weakref__',)
+
+
+def _shard():
+    try:
+        return _LOCAL.shard
+    except AttributeError:
+        if len(_RETIRED) > RETIRED_BACKLOG:
+            fold()
+        shard = _Shard()
+        owner = _LOCAL.owner = _ShardOwner()
+        weakref.finalize(owner, _RETIRED.append, shard)
+        with _SHARDS_LOCK:
+            _SHARDS.append(shard)
+        _LOCAL.shard = shard
+        return shard
+
+
+def _fold_histogram(child, slot, folded, key):
+    # The owner thread keeps writing; a copy taken between its bucket and
+    # sum updates is off by one sample until the next fold.
+    current = slot[:]
+    last    = folded.get(key)
+    if current == last or (last is None and not any(current)):
+        return
+    delta = current if last is None else [now - then for now, then in zip(current, last)]
+    child.merge(delta[:-1], delta[-1])
+    folded[key] = current
+
+
+def fold():
+    """Adds every thread's new samples to the series (render() does this first)."""
+    with _FOLD_LOCK:
+        retired = set()
+        while _RETIRED:
+            retired.add(_RETIRED.popleft())
+        with _SHARDS_LOCK:
+            shards = list(_SHARDS)
+        for shard in shards:
+            folded = shard.folded
+            for name, slot in zip(STAGES, shard.stages):
+                _fold_histogram(_STAGE_CHILDREN[name], slot, folded, ('stage', name))
+            for labels, slot in shard.requests.copy().items():
+                _fold_histogram(HTTP_SECONDS.labels(*labels), slot, folded, ('http',) + labels)
+            for tier, total in zip(CLAUSE_TIERS, shard.clauses[:]):
+                key = ('clauses', tier)
+                if total != folded.get(key, 0):
+                    CLAUSES.labels(tier).inc(total - folded.get(key, 0))
+                    folded[key] = total
+        if retired:
+            # Their threads are gone, so what was just folded is final
+            with _SHARDS_LOCK:
+                _SHARDS[:] = [shard for shard in _SHARDS if shard not in retired]
+
+
+class StageTimer:
+    """
+    One request's local-stage timings.  lap(name) ends stage `name`, which
+    began at the previous lap / mark() / creation; add() takes a time
+    measured by the caller (e.g. summed over clauses).  Stage times are summed
+    per request and binned into the thread's shard by flush().
+    """
+    __slots__ = ('seconds', '_shard', '_last')
+
+    def __init__(self):
+        self.seconds = [0.0] * len(STAGES)     # in STAGES order
+        self._shard  = _shard()
+        self._last   = perf_counter()
+
+    def mark(self):
+        """Starts the next stage now (time since the last lap is not recorded)."""
+        self._last = perf_counter()
+
+    def lap(self, name):
+        now = perf_counter()
+        self.seconds[_STAGE_INDEX[name]] += now - self._last
+        self._last = now
+
+    def add(self, name, seconds):
+        self.seconds[_STAGE_INDEX[name]] += seconds
+
+    def flush(self):
+        buckets = STAGE_SECONDS.buckets
+        for slot, seconds in zip(self._shard.stages, self.seconds):
+            if seconds:
+                slot[bisect_left(buckets, seconds)] += 1
+                slot[-1] += seconds
+
+
+class _NullStageTimer:
+    __slots__ = ()
+
+    def mark(self):
+        pass
+
+    def lap(self, name):
+        pass
+
+    def add(self, name, seconds):
+        pass
+
+    def flush(self):
+        pass
+
+
+_NULL_STAGE_TIMER = _NullStageTimer()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  REGISTRY
+# ─────────────────────────────────────────────────────────────────────────────
+_METRICS    = []
+_COLLECTORS = []
+
+
+def counter(name, documentation, labelnames=()):
+    metric = Counter(name, documentation, labelnames)
+    _METRICS.append(metric)
+    return metric
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    metric = Histogram(name, documentation, labelnames, buckets)
+    _METRICS.append(metric)
+    return metric
+
+
+def register_collector(collect):
+    """
+    `collect()` is called on every scrape and returns
+    [(name, type, help, [(labels dict, value), ...]), ...] — for numbers that
+    already live elsewhere (cache and breaker stats).
+    """
+    _COLLECTORS.append(collect)
+
+
+def render():
+    """All series in the Prometheus text exposition format (0.0.4)."""
+    fold()
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for collect in _COLLECTORS:
+        for name, kind, documentation, samples in collect():
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                if value is None:
+                    continue
+                labels = sorted(labels.items())
+                lines.append(f'{name}{_label_text([k for k, _ in labels], [v for _, v in labels])} '
+                             f'{_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  LOGGING PIPELINE SERIES
+# ─────────────────────────────────────────────────────────────────────────────
+STAGES       = ('normalize', 'split', 'ai', 'fallback', 'calculate', 'save', 'bulk_save', 'stt')
+CLAUSE_TIERS = ('ai', 'local', 'unrecognized')
+
+STAGE_SECONDS = histogram(
+    'logger_pipeline_stage_seconds',
+    'Time spent in each stage of the activity logging pipeline. normalize, split, '
+    f'calculate and per-clause fallback are timed for 1 request in {STAGE_SAMPLE} '
+    '(METRICS_STAGE_SAMPLE), so their _count is sampled requests only; ai, save, '
+    'bulk_save, stt and hedged fallback are timed on every request',
+    ('stage',),
+)
+CLAUSES = counter(
+    'logger_clauses',
+    'Activity clauses by the tier that classified them (ai, local) or unrecognized',
+    ('tier',),
+)
+AI_CACHE_LOOKUPS = counter(
+    'logger_ai_cache_lookups',
+    'AI extraction cache lookups per clause',
+    ('result',),
+)
+CLOUDANT_ERRORS = counter(
+    'logger_cloudant_errors',
+    'Failed Cloudant writes, per document',
+    ('operation',),
+)
+HTTP_SECONDS = histogram(
+    'logger_http_request_duration_seconds',
+    'Request latency by URL name, method and status',
+    ('view', 'method', 'status'),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+_STAGE_CHILDREN = {name: STAGE_SECONDS.labels(name) for name in STAGES}
+_STAGE_INDEX    = {name: i for i, name in enumerate(STAGES)}
+
+
+_REQUESTS = _counter()     # next() is atomic, so sampling needs no lock
+
+
+def stage_timer():
+    """A StageTimer for one sampled request, else a shared no-op."""
+    if ENABLED and not next(_REQUESTS) % STAGE_SAMPLE:
+        return StageTimer()
+    return _NULL_STAGE_TIMER
+
+
+def count_clauses(ai, local, unrecognized):
+    """Adds one request's clauses to logger_clauses (every request)."""
+    if ENABLED:
+        try:
+            clauses = _LOCAL.shard.clauses
+        except AttributeError:
+            clauses = _shard().clauses
+        clauses[0] += ai
+        clauses[1] += local
+        clauses[2] += unrecognized
+
+
+def observe_request(view, method, status, seconds):
+    """Records one logger_http_request_duration_seconds sample (middleware)."""
+    if ENABLED:
+        requests = _shard().requests
+        slot     = requests.get((view, method, status))
+        if slot is None:
+            slot = requests[view, method, status] = [0] * (len(HTTP_SECONDS.buckets) + 2)
+        slot[bisect_left(HTTP_SECONDS.buckets, seconds)] += 1
+        slot[-1] += seconds
+
+
+def stage(name):
+    """Context manager timing one I/O-bound stage (no-op when metrics are off)."""
+    if not ENABLED:
+        return _NULL_TIMER
+    child = _STAGE_CHILDREN.get(name) or STAGE_SECONDS.labels(name)
+    return _Timer(child)
+
+
+def count(metric, label, amount=1):
+    if ENABLED and amount:
+        metric.labels(label).inc(amount)
@@ -0,0 +1,31 @@
+from time import perf_counter
+
+from . import metrics
+
+_METHODS = frozenset({'GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS'})
+
+
+class RequestMetricsMiddleware:
+    """
+    Records per-endpoint latency in logger_http_request_duration_seconds.
+    Requests are labelled by URL name (e.g. log_activity_api), never by raw
+    path, so the series count stays bounded.  For streaming responses (bulk
+    import) this is the time to the first byte, not to the end of the stream.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.ENABLED:
+            return self.get_response(request)
+        start    = perf_counter()
+        response = self.get_response(request)
+        match    = getattr(request, 'resolver_match', None)
+        metrics.observe_request(
+            match.view_name if match else 'unmatched',
+            request.method if request.method in _METHODS else 'OTHER',
+            response.status_code,
+            perf_counter() - start,
+        )
+        return response
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_key_normalized(apps, schema_editor):
+    EmissionFactor = apps.get_model('users', 'EmissionFactor')
+    for ef in EmissionFactor.objects.only('pk', 'key').iterator():
+        EmissionFactor.objects.filter(pk=ef.pk).update(key_normalized=(ef.key or '').lower().strip())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_rename_is_verified_emissionfactor_is_verified_factor_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emissionfactor',
+            name='key_normalized',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_key_normalized, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='emissionfactor',
+            index=models.Index(fields=['key_normalized', 'status', 'added_by'], name='ef_keynorm_status_user_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_emissionfactor_key_normalized_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emissionfactor',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
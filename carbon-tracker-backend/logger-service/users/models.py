@@ -1,4 +1,8 @@
+import uuid
+
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Lower, Trim
 from django.contrib.auth.models import User
 
 class Activity(models.Model):
@@ -16,7 +20,49 @@ class Activity(models.Model):
         verbose_name_plural = "Activities"
     def __str__(self):
         return f'{self.user.username} - {self.input_text[:50]}'
-    
+
+
+def normalize_factor_key(key):
+    """The key_normalized value for a factor key."""
+    return (key or '').lower().strip()
+
+
+class EmissionFactorQuerySet(models.QuerySet):
+    """
+    Bulk writes keep the columns save() maintains: update() (and so
+    bulk_update()) recomputes key_normalized and bumps `version` whenever a
+    versioned field is written, and bulk_create() normalizes keys.  None of
+    them sends post_save, so each drops the factor table and republishes
+    the snapshot itself.  (bulk_create(update_conflicts=True) keeps the
+    stored version.)
+    """
+
+    def update(self, **kwargs):
+        if 'key' in kwargs:
+            key = kwargs['key']
+            kwargs['key_normalized'] = (Lower(Trim(key)) if hasattr(key, 'resolve_expression')
+                                        else normalize_factor_key(key))
+        if 'version' not in kwargs and any(f in kwargs for f in EmissionFactor.VERSIONED_FIELDS):
+            kwargs['version'] = F('version') + 1
+        rows = super().update(**kwargs)
+        if rows:
+            from .signals import factors_changed
+            factors_changed(self.db)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.key_normalized = normalize_factor_key(obj.key)
+        created = super().bulk_create(objs, *args, **kwargs)
+        if created:
+            from .signals import factors_changed
+            factors_changed(self.db)
+        return created
+
+
 class EmissionFactor(models.Model):
     STATUS_CHOICES = [
         ('verified', 'Verified'),
@@ -25,6 +71,10 @@ class EmissionFactor(models.Model):
 
     activity_type = models.CharField(max_length=100) 
     key = models.CharField(max_length=100, unique=True) 
+    # Lowercased copy of `key` so lookups are plain indexed equality instead of
+    # an UPPER()/LIKE iexact scan. Maintained by save() and, for bulk writes,
+    # by EmissionFactorQuerySet.
+    key_normalized = models.CharField(max_length=100, default='', editable=False)
     co2e_per_unit = models.FloatField() 
     unit = models.CharField(max_length=50)
     
@@ -37,5 +87,89 @@ class EmissionFactor(models.Model):
     # This helps the calculator logic determine "Verified" status quickly
     is_verified_factor = models.BooleanField(default=False)
 
+    # Bumped whenever the value or trust level changes; every saved activity
+    # log is stamped with it so recompute_co2e can find stale CO₂e values.
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = EmissionFactorQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['key_normalized', 'status', 'added_by'],
+                name='ef_keynorm_status_user_idx',
+            ),
+        ]
+
+    VERSIONED_FIELDS = ('co2e_per_unit', 'status', 'is_verified_factor')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_factor = instance._factor_state()
+        return instance
+
+    def _factor_state(self):
+        return tuple(self.__dict__.get(f) for f in self.VERSIONED_FIELDS)
+
+    def save(self, *args, **kwargs):
+        self.key_normalized = normalize_factor_key(self.key)
+        update_fields = kwargs.get('update_fields')
+        extra_fields = set()
+        if update_fields is not None and 'key' in update_fields:
+            extra_fields.add('key_normalized')
+        if self.pk and getattr(self, '_loaded_factor', None) != self._factor_state():
+            self.version = (self.version or 0) + 1
+            extra_fields.add('version')
+        if update_fields is not None and extra_fields:
+            kwargs['update_fields'] = set(update_fields) | extra_fields
+        super().save(*args, **kwargs)
+        self._loaded_factor = self._factor_state()
+
+    def __str__(self):
+        return f"{self.key} [{self.status}]"
+
+
+class ActivityJob(models.Model):
+    """
+    One async /api/log-activity/ (or audio) request.  The table is the job
+    queue: workers claim 'queued' rows with a conditional UPDATE, so every
+    process can share it and nothing is lost on restart.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    KIND_CHOICES = [
+        ('text', 'Text'),
+        ('audio', 'Audio'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='text')
+    input_text = models.TextField(blank=True, default='')
+    # Raw upload for audio jobs; cleared once the job finishes
+    audio = models.BinaryField(null=True, blank=True)
+    audio_content_type = models.CharField(max_length=100, blank=True, default='')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Response body / status code the synchronous endpoint would have returned
+    result = models.JSONField(null=True, blank=True)
+    http_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.key} [{self.status}]"
\ No newline at end of file
+        return f"{self.kind} job {self.id} [{self.status}]"
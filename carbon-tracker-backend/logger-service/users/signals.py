@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import EmissionFactor
+from .carbon_calculator import clear_factor_cache
+from .factor_snapshot import publish_after_commit
+
+
+def factors_changed(using=None):
+    """
+    Drops this worker's resolved table now and, once committed, publishes a
+    new shared snapshot so every other worker picks the change up on its
+    next lookup.  Each publish rebuilds the whole table, so a transaction
+    touching many factors registers it once.
+    """
+    clear_factor_cache()
+    connection = transaction.get_connection(using)
+    if not any(func is publish_after_commit for _, func, *_ in connection.run_on_commit):
+        transaction.on_commit(publish_after_commit, using=using)
+
+
+@receiver(post_save, sender=EmissionFactor)
+@receiver(post_delete, sender=EmissionFactor)
+def invalidate_factor_cache(sender, using=None, **kwargs):
+    """Any factor add/edit/delete (admin, API, seed); bulk writes call factors_changed directly."""
+    factors_changed(using)
@@ -0,0 +1,57 @@
+"""
+Shared fixtures for the users tests.
+
+Factor snapshot files go to a temp dir instead of data/, and the background
+publisher is switched off: tests publish explicitly when they need a
+snapshot, and everything else reads the test DB.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from users import factor_snapshot
+from users.carbon_calculator import clear_factor_cache
+from users.models import EmissionFactor
+
+
+def reset_snapshot():
+    """No snapshot published, nothing mapped, nothing pending."""
+    for path in (factor_snapshot.SNAPSHOT_PATH, factor_snapshot.VERSION_PATH):
+        path.unlink(missing_ok=True)
+    factor_snapshot._SNAPSHOT    = None
+    factor_snapshot._VERSION_MAP = None
+    factor_snapshot._UNPUBLISHED = 0
+    factor_snapshot._LAST_MAP_FAILURE = factor_snapshot._LAST_PUBLISH_FAILURE = 0.0
+    clear_factor_cache()
+
+
+class IsolatedSnapshotMixin:
+    """Per-class temp snapshot dir; every test starts with no snapshot."""
+
+    @classmethod
+    def setUpClass(cls):
+        snapshot_dir = Path(tempfile.mkdtemp(prefix="factor-snapshot-"))
+        cls.addClassCleanup(shutil.rmtree, snapshot_dir, ignore_errors=True)
+        for name, value in (
+            ("SNAPSHOT_DIR",  snapshot_dir),
+            ("SNAPSHOT_PATH", snapshot_dir / "factor_snapshot.bin"),
+            ("VERSION_PATH",  snapshot_dir / "factor_snapshot.version"),
+        ):
+            cls.enterClassContext(mock.patch.object(factor_snapshot, name, value))
+        cls.publish_in_background = cls.enterClassContext(
+            mock.patch.object(factor_snapshot, "_publish_in_background")
+        )
+        # Cleanups run last-in first-out: this one while the paths are still patched
+        cls.addClassCleanup(reset_snapshot)
+        super().setUpClass()
+
+    def setUp(self):
+        reset_snapshot()
+        self.publish_in_background.reset_mock()
+        super().setUp()
+
+
+def make_factor(key, value, status='pending', added_by=None, **fields):
+    return EmissionFactor.objects.create(activity_type='TEST', key=key, co2e_per_unit=value,
+                                         unit='kg', status=status, added_by=added_by, **fields)
@@ -0,0 +1,210 @@
+"""
+Reference implementations of the text pipeline as it was before the clause
+lexer, the fuzzy indexes and the precompiled normalizer, kept so the tests
+(and the bench_classifier / bench_text_pipeline commands) can check the
+current code still gives the same answers.
+"""
+import re
+
+from thefuzz import fuzz
+
+from users.factor_catalog import CATALOG
+
+SAMPLE_CLAUSES = (
+    'took metro 12 km', 'had 2 chai', 'I drove my car 15 km today', 'ate 200g paneer',
+    'used 5 kwh electricity', 'bought 1/2 kg lpg', 'took an auto rickshaw 4 km',
+    'drank 500ml milk', 'flew 800 km', 'rode bike 10 kms', 'ate two samosa',
+    'used ac for 3 hours', 'threw 2 kg plastic', 'had a burger and fries',
+    'drove diesel car 40 km', 'took a cab 25 miles', 'went by train 300 km',
+    'took the indian railway 500 km', 'used 2 kilowatt hour power', 'something random',
+    'discarded paper 1 kg', 'had 250ml lassi', 'ate chole bhature 2 plates',
+    'took bus 7 km and metro 3 km', 'electric car 30 km', 'watched television 3 hours',
+)
+
+
+def legacy_match_trigger(text):
+    """Step 1 of fallback_classify as it was: one ad-hoc regex per trigger."""
+    for trigger in sorted(CATALOG.triggers_longest_first, key=len, reverse=True):
+        if re.search(r'\b' + re.escape(trigger) + r'\b', text):
+            return trigger
+    return None
+
+
+def legacy_category_scores(words):
+    """Step 2 of fallback_classify as it was: every word × every keyword."""
+    from users.views import CATEGORY_KEYWORDS, EXCLUDED_FROM_SCORING
+    scores = {cat: 0 for cat in CATEGORY_KEYWORDS}
+    for cat, keywords in CATEGORY_KEYWORDS.items():
+        for word in words:
+            if word in EXCLUDED_FROM_SCORING:
+                continue
+            for kw in keywords:
+                if fuzz.ratio(word, kw) >= 82:
+                    scores[cat] += 1
+    return scores
+
+
+def legacy_key_search(keys, text_lower, words):
+    """Step 3 of fallback_classify as it was: every key × word × part."""
+    found_key, best_score = None, 0
+    for db_key in keys:
+        clean = db_key.lower().replace('_', ' ')
+        if clean in text_lower:
+            found_key = db_key
+            break
+        for word in words:
+            for part in [p for p in clean.split() if len(p) > 2]:
+                score = fuzz.ratio(word, part)
+                if score > best_score and score >= 80:
+                    best_score = score
+                    found_key  = db_key
+    return found_key
+
+
+def legacy_hinglish(text):
+    """apply_hinglish_translation as it was: sort + chained str.replace."""
+    from users.views import HINGLISH_MAP
+    text_lower = text.lower()
+    for phrase in sorted(HINGLISH_MAP.keys(), key=len, reverse=True):
+        if phrase in text_lower:
+            text_lower = text_lower.replace(phrase, HINGLISH_MAP[phrase])
+    return text_lower
+
+
+_LEGACY_UNIT_RE = (
+    r'(\d+\.?\d*|\.\d+)\s*'
+    r'(kg|kgs|grams|gram|gm|gms|mg|km|kms|kilometers|kilometres|miles?|'
+    r'kWh|kwh|litres?|liters?|'
+    r'piece|pieces|slice|slices|serving|servings|plate|bowl|cup|glass|'
+    r'hour|hours|hr|hrs)'
+    r'(?![a-z])'
+)
+_LEGACY_SKIP = {'kg', 'km', 'kwh', 'gram', 'g', 'litre', 'liter', 'unit', 'units',
+                'serving', 'plate', 'piece', 'slice', 'glass', 'bowl', 'cup', 'a', 'an'}
+
+
+def legacy_extract_quantity(text_lower):
+    """extract_quantity as it was: one regex per step."""
+    from users.views import WORD_NUM_DICT
+    frac = re.search(r'(?<!\d)(\d+)\s*/\s*(\d+)(?!\d)', text_lower)
+    if frac:
+        return round(int(frac.group(1)) / int(frac.group(2)), 4), False
+    matches = re.findall(_LEGACY_UNIT_RE, text_lower, re.IGNORECASE)
+    if matches:
+        return float(matches[0][0]), False
+    g_match = re.search(r'(\d+\.?\d*)\s*g(?!r)(?![a-z])', text_lower)
+    if g_match:
+        return float(g_match.group(1)), False
+    num = re.search(r'(\d+\.\d+|\d+|\.\d+)', text_lower)
+    if num:
+        return float(num.group(1)), False
+    total, found_any = 0.0, False
+    for word in re.findall(r'\b[a-z]+\b', text_lower):
+        if word not in _LEGACY_SKIP and word in WORD_NUM_DICT:
+            total += WORD_NUM_DICT[word]
+            found_any = True
+    if found_any:
+        return (total if total > 0 else 1.0), False
+    if re.search(r'\b(a|an)\b', text_lower):
+        return 1.0, False
+    return 1.0, True
+
+
+def legacy_detect_unit(text_lower):
+    """detect_unit_from_text as it was: one re.search per unit alias."""
+    for raw in CATALOG.unit_aliases_longest_first:
+        if re.search(r'\b' + re.escape(raw) + r'\b', text_lower):
+            if raw in ('unit', 'units', 'items', 'item'):
+                energy_words = {'electricity', 'bijli', 'power', 'current', 'kwh'}
+                return 'kWh' if any(w in text_lower for w in energy_words) else 'unit'
+            return CATALOG.canonical_unit(raw)
+    if re.search(r'(?<!\w)kg\b|\bkg(?=\s|$)|\d\s*kg\b', text_lower):
+        return 'kg'
+    if re.search(r'\d\s*g(?!r)(?![a-z])', text_lower):
+        return 'g'
+    if re.search(r'\d\s*ml\b', text_lower):
+        return 'ml'
+    if re.search(r'\bkm\b', text_lower):
+        return 'km'
+    return None
+
+
+def legacy_scan(text_lower):
+    """Everything fallback_classify read off the text before the clause lexer."""
+    return (
+        re.findall(r'\b[a-z]+\b', text_lower),
+        legacy_extract_quantity(text_lower),
+        legacy_detect_unit(text_lower),
+        legacy_match_trigger(text_lower),
+    )
+
+
+def lexed_scan(text_lower, lex=None):
+    """The same four answers from one clause_lexer pass."""
+    from users import clause_lexer
+    from users.views import detect_unit_from_text, extract_quantity
+    clause = (lex or clause_lexer.lex_clause)(text_lower)
+    return (
+        clause_lexer.words(clause),
+        extract_quantity(clause),
+        detect_unit_from_text(clause),
+        clause_lexer.best_trigger(clause),
+    )
+
+
+
+def legacy_normalize_input_text(raw):
+    """normalize_input_text as it was: ten re.sub calls, patterns built per call."""
+    from users.views import ACTION_VERBS
+    text = raw.strip()
+    text = text.replace('\r\n', '. ').replace('\n', '. ').replace('\r', '. ')
+    text = re.sub(r'^\s*[-•*]\s+', '', text, flags=re.MULTILINE)
+    text = text.replace(';', '.').replace(' / ', '. ')
+    text = re.sub(r'\baur\b', ' . ', text, flags=re.IGNORECASE)
+    text = re.sub(r'\btatha\b', ' . ', text, flags=re.IGNORECASE)
+    text = re.sub(r'\band\s+i\b', '. I', text, flags=re.IGNORECASE)
+    text = re.sub(
+        r'\band\s+(used|use|ate|eat|had|drink|drank|drunk|drove|drive|took|take|'
+        r'travelled|traveled|travel|rode|ride|flew|fly|walked|walk|cooked|cook|'
+        r'burned|burnt|burn|charged|charge|consumed|consume|wasted|waste|threw|throw|'
+        r'bought|buy|purchased|purchase|ordered|order)\b',
+        r'. \1', text, flags=re.IGNORECASE
+    )
+    text = re.sub(
+        r'\b(and then|and also|after that|then i|then|also|moreover|additionally)\b',
+        '. ', text, flags=re.IGNORECASE
+    )
+    text = re.sub(
+        r'\bor\s+(?=(?:i\s+)?(?:' + '|'.join(ACTION_VERBS) + r')\b)',
+        '. ', text, flags=re.IGNORECASE
+    )
+    text = re.sub(r',\s*(?=[a-zA-Z])', '. ', text)
+    text = re.sub(r'\.{2,}', '.', text)
+    text = re.sub(r'\s{2,}', ' ', text)
+    return text.strip()
+
+
+def legacy_split_activity_clauses(text):
+    """split_activity_clauses as it was: split patterns rebuilt, full list returned."""
+    import nltk
+    from users.views import ACTION_VERBS
+    fragments = [frag.strip(" .") for frag in nltk.tokenize.sent_tokenize(text) if frag.strip(" .")]
+    clauses = []
+    verb_pattern = '|'.join(re.escape(v) for v in ACTION_VERBS)
+    for fragment in fragments:
+        parts = re.split(
+            r'\s*(?:,| and | or )\s*(?=(?:i\s+)?(?:' + verb_pattern + r')\b)',
+            fragment,
+            flags=re.IGNORECASE,
+        )
+        for part in parts:
+            subparts = re.split(
+                r'\s+(?:and|or)\s+(?=(?:\d+(?:\.\d+)?|\.\d+|a|an|one|two|three|four|five|six|seven|eight|nine|ten)\b)',
+                part,
+                flags=re.IGNORECASE,
+            )
+            for subpart in subparts:
+                clean = subpart.strip(" .")
+                if len(clean) > 2:
+                    clauses.append(clean)
+    return clauses
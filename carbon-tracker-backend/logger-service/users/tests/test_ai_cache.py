@@ -0,0 +1,82 @@
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from users import views
+from users.ai_cache import AIExtractionCache
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  AI EXTRACTION CACHE
+# ─────────────────────────────────────────────────────────────────────────────
+class AIExtractionCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.path  = Path(self.enterContext(tempfile.TemporaryDirectory())) / "ai_extractions.sqlite3"
+        self.items = [{"key": "metro", "quantity": 12, "unit": "km"}]
+
+    def test_key_is_the_normalized_clause(self):
+        AIExtractionCache(self.path, version="v1").set("Took  Metro 12 KM ", self.items)
+        # A fresh instance has an empty memory tier, so this is a disk hit
+        cache = AIExtractionCache(self.path, version="v1")
+        self.assertEqual(cache.get("took metro\t12 km"), self.items)
+        self.assertEqual(cache.stats()["disk_hits"], 1)
+        self.assertEqual(cache.get("took metro 12 km"), self.items)
+        self.assertEqual(cache.stats()["disk_hits"], 1)   # memory tier this time
+
+    def test_new_version_misses_and_prunes_old_entries(self):
+        AIExtractionCache(self.path, version="v1").set("took metro 12 km", self.items)
+        cache = AIExtractionCache(self.path, version="v2")
+        self.assertIsNone(cache.get("took metro 12 km"))
+        cache.prune()
+        self.assertEqual(cache.stats()["expired"], 1)
+        self.assertIsNone(AIExtractionCache(self.path, version="v1").get("took metro 12 km"))
+
+    def test_expired_rows_miss(self):
+        AIExtractionCache(self.path, version="v1", ttl=60).set("took metro 12 km", self.items)
+        cache = AIExtractionCache(self.path, version="v1", ttl=60)
+        with mock.patch("users.ai_cache.time.time", return_value=self.path.stat().st_mtime + 3600):
+            self.assertIsNone(cache.get("took metro 12 km"))
+        self.assertEqual(cache.stats()["expired"], 1)
+        self.assertEqual(cache.stats()["disk_size"], 0)
+
+    def test_least_recently_used_rows_are_evicted(self):
+        cache = AIExtractionCache(self.path, version="v1", max_entries=2)
+        now = time.time()
+        for i, text in enumerate(("a 1 kg", "b 2 kg", "c 3 kg")):
+            with mock.patch("users.ai_cache.time.time", return_value=now - 10 + i):
+                cache.set(text, self.items)
+        cache.prune()
+        self.assertEqual(cache.stats()["evicted"], 1)
+        self.assertIsNone(AIExtractionCache(self.path, version="v1").get("a 1 kg"))
+
+    def test_empty_extractions_are_not_cached(self):
+        cache = AIExtractionCache(self.path, version="v1")
+        cache.set("something random", [])
+        self.assertIsNone(cache.get("something random"))
+        self.assertEqual(cache.stats()["writes"], 0)
+
+
+class CachedAIAnalysesTests(SimpleTestCase):
+
+    def setUp(self):
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / "ai.sqlite3"
+        self.cache = AIExtractionCache(path, version="test")
+        self.enterContext(mock.patch.object(views, "AI_CACHE", self.cache))
+        self.uncached = self.enterContext(mock.patch.object(
+            views, "_fetch_ai_uncached", side_effect=lambda clauses, *a, **kw: [{"key": c} for c in clauses]
+        ))
+
+    def test_cached_clauses_skip_the_ai_service(self):
+        self.cache.set("Took Metro 12 km", [{"key": "metro"}, {"key": "extra"}])
+        results = views.fetch_ai_analyses(["took metro 12 km", "ate 2 samosa"], "u")
+        self.assertEqual(results, [{"key": "metro"}, {"key": "ate 2 samosa"}])
+        self.assertEqual(self.uncached.call_args.args[0], ["ate 2 samosa"])
+
+        self.cache.set("ate 2 samosa", [{"key": "samosa"}])
+        self.uncached.reset_mock()
+        views.fetch_ai_analyses(["took metro 12 km", "ate 2 samosa"], "u")
+        self.uncached.assert_not_called()
@@ -0,0 +1,110 @@
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+
+from users.ai_client import (CLOSED, HALF_OPEN, OPEN, AIServiceClient, AIServiceUnavailable,
+                             CircuitBreaker)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  CIRCUIT BREAKER
+# ─────────────────────────────────────────────────────────────────────────────
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.enterContext(mock.patch('users.ai_client.time.monotonic', side_effect=lambda: self.now))
+        self.breaker = CircuitBreaker(failure_threshold=3, slow_after=1.0, cooldown=30.0)
+
+    def fail(self, times=1):
+        for _ in range(times):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record(False, 0.1)
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        self.breaker.record(True, 0.1)      # a success resets the streak
+        self.fail(2)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.stats()["short_circuited"], 1)
+
+    def test_slow_success_counts_as_failure(self):
+        for _ in range(3):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record(True, 2.5)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.stats()["slow"], 3)
+
+    def test_half_open_admits_one_probe(self):
+        self.fail(3)
+        self.now += 30.0
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())     # probe still in flight
+
+    def test_successful_probe_closes(self):
+        self.fail(3)
+        self.now += 30.0
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(True, 0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.stats()["consecutive_failures"], 0)
+
+    def test_failed_probe_reopens_for_a_full_cooldown(self):
+        self.fail(3)
+        self.now += 30.0
+        self.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.now += 29.0
+        self.assertFalse(self.breaker.allow())
+        self.now += 1.0
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.stats()["opened"], 2)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  AI SERVICE CLIENT
+# ─────────────────────────────────────────────────────────────────────────────
+class AIServiceClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.client = AIServiceClient("http://ai.test/analyze",
+                                      breaker=CircuitBreaker(failure_threshold=2, cooldown=30.0))
+        self.session_post = self.enterContext(mock.patch.object(self.client.session, "post"))
+
+    def test_server_errors_and_transport_errors_open_the_breaker(self):
+        self.session_post.return_value = mock.Mock(status_code=503)
+        self.assertEqual(self.client.post({"x": 1}, timeout=1.0).status_code, 503)
+        self.session_post.side_effect = requests.ConnectionError("reset")
+        with self.assertRaises(requests.ConnectionError):
+            self.client.post({"x": 1}, timeout=1.0)
+
+        with self.assertRaises(AIServiceUnavailable):
+            self.client.post({"x": 1}, timeout=1.0)
+        self.assertEqual(self.session_post.call_count, 2)
+
+    def test_client_errors_keep_it_closed(self):
+        self.session_post.return_value = mock.Mock(status_code=404)
+        for _ in range(3):
+            self.client.post({"x": 1}, timeout=1.0)
+        self.assertEqual(self.client.breaker.state, CLOSED)
+        self.assertEqual(self.session_post.call_args.kwargs,
+                         {"json": {"x": 1}, "timeout": 1.0})
+
+    def test_timeouts_cut_short_by_the_caller_are_not_failures(self):
+        self.session_post.side_effect = requests.Timeout()
+        for _ in range(3):
+            with self.assertRaises(requests.Timeout):
+                self.client.post({"x": 1}, timeout=0.05)
+        stats = self.client.stats()
+        self.assertEqual((stats["state"], stats["failures"], stats["cut_short"]), (CLOSED, 0, 3))
+
+        self.client.breaker.slow_after = 0.0     # now the timeout outlasted slow_after
+        for _ in range(2):
+            with self.assertRaises(requests.Timeout):
+                self.client.post({"x": 1}, timeout=0.05)
+        self.assertEqual(self.client.breaker.state, OPEN)
@@ -0,0 +1,194 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+
+from users import views
+from users.ai_cache import AIExtractionCache
+
+
+class FakeAIService:
+    """Stands in for fetch_ai_analysis: answers at once, or blocks until released."""
+
+    def __init__(self, slow=()):
+        self.slow     = set(slow)
+        self.released = threading.Event()
+        self.calls    = []
+
+    def __call__(self, text, username, timeout=None):
+        self.calls.append((text, timeout))
+        if text in self.slow:
+            # Like the real call, gives up when its timeout runs out
+            if not self.released.wait(5 if timeout is None else timeout):
+                return None
+        return {"key": text}
+
+    @property
+    def texts(self):
+        return [text for text, _ in self.calls]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  PER-CLAUSE AI CALLS
+# ─────────────────────────────────────────────────────────────────────────────
+class PerClauseDeadlineTests(SimpleTestCase):
+
+    def setUp(self):
+        self.enterContext(mock.patch.object(views, "AI_CACHE", None))
+        self.enterContext(mock.patch.object(views, "AI_BATCH_MODE", False))
+        self.enterContext(mock.patch.object(views, "AI_REQUEST_DEADLINE", 0.2))
+
+    def fake_service(self, slow=()):
+        service = FakeAIService(slow)
+        self.addCleanup(service.released.set)
+        self.enterContext(mock.patch.object(views, "fetch_ai_analysis", service))
+        return service
+
+    def test_clauses_run_concurrently_in_clause_order(self):
+        service = self.fake_service()
+        clauses = [f"clause {i}" for i in range(6)]
+        self.assertEqual(views.fetch_ai_analyses(clauses, "u"), [{"key": c} for c in clauses])
+        self.assertCountEqual(service.texts, clauses)
+
+    def test_late_clauses_fall_back_at_the_request_deadline(self):
+        self.fake_service(slow={"clause 1"})
+        started = time.monotonic()
+        results = views.fetch_ai_analyses(["clause 0", "clause 1", "clause 2"], "u")
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(results, [{"key": "clause 0"}, None, {"key": "clause 2"}])
+
+    def test_calls_are_capped_at_the_time_left(self):
+        service = self.fake_service()
+        views.fetch_ai_analyses(["clause 0", "clause 1"], "u")
+        self.assertTrue(all(0 < timeout <= 0.2 for _, timeout in service.calls))
+
+        until = time.monotonic() + 60
+        views.fetch_ai_analyses(["clause 2"], "u", until)
+        self.assertEqual(service.calls[-1], ("clause 2", views.AI_CALL_TIMEOUT))
+
+    def test_nothing_is_sent_once_the_deadline_has_passed(self):
+        service = self.fake_service()
+        self.assertEqual(views.fetch_ai_analyses(["clause 0", "clause 1"], "u", time.monotonic()),
+                         [None, None])
+        self.assertEqual(service.calls, [])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  HEDGED REQUESTS
+# ─────────────────────────────────────────────────────────────────────────────
+class HedgedAITests(SimpleTestCase):
+
+    def setUp(self):
+        self.enterContext(mock.patch.object(views, "AI_CACHE", None))
+        self.enterContext(mock.patch.object(views, "AI_BATCH_MODE", False))
+        self.enterContext(mock.patch.object(views, "cached_fallback_classify",
+                                            side_effect=lambda text: ("local", text)))
+        self.service = FakeAIService(slow={"slow"})
+        self.addCleanup(self.service.released.set)
+        self.enterContext(mock.patch.object(views, "fetch_ai_analysis", self.service))
+
+    def test_on_time_answers_are_used(self):
+        before = views.get_hedge_stats()
+        analyses, local = views.fetch_ai_analyses_hedged(["fast"], "u", 1.0)
+        self.assertEqual((analyses, local), ([{"key": "fast"}], [("local", "fast")]))
+        self.assertEqual(views.get_hedge_stats()["ai_on_time"] - before["ai_on_time"], 1)
+
+    def test_the_budget_bounds_the_ai_work_per_clause(self):
+        started = time.monotonic()
+        analyses, local = views.fetch_ai_analyses_hedged(["fast", "slow"], "u", 0.1)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(analyses, [{"key": "fast"}, None])
+        self.assertEqual(local, [("local", "fast"), ("local", "slow")])
+        # The slow call was sent with the budget as its timeout, not AI_CALL_TIMEOUT
+        self.assertTrue(all(timeout <= 0.1 for _, timeout in self.service.calls))
+
+    def test_a_late_batch_gets_the_budget_as_its_timeout(self):
+        self.enterContext(mock.patch.object(views, "AI_BATCH_MODE", True))
+        batch = self.enterContext(mock.patch.object(
+            views, "fetch_ai_analysis_batch",
+            side_effect=lambda clauses, username, timeout: time.sleep(timeout + 0.2) or [None] * 2,
+        ))
+        before = views.get_hedge_stats()
+        analyses, _ = views.fetch_ai_analyses_hedged(["a", "b"], "u", 0.1)
+        self.assertEqual(analyses, [None, None])
+        self.assertLessEqual(batch.call_args.args[2], 0.1)
+        self.assertEqual(views.get_hedge_stats()["ai_late"] - before["ai_late"], 1)
+
+
+class FetchAIAnalysisTests(SimpleTestCase):
+
+    def setUp(self):
+        self.enterContext(mock.patch.object(views, "AI_CACHE", None))
+        self.post = self.enterContext(mock.patch.object(views.AI_CLIENT, "post"))
+
+    def respond(self, status_code, body):
+        self.post.return_value = mock.Mock(status_code=status_code, json=mock.Mock(return_value=body))
+
+    def test_first_extraction_with_the_per_clause_timeout(self):
+        self.respond(200, {"extracted": [{"key": "metro"}, {"key": "bus"}]})
+        self.assertEqual(views.fetch_ai_analysis("took metro 12 km", "u"), {"key": "metro"})
+        self.assertEqual(self.post.call_args.kwargs["timeout"], views.AI_CALL_TIMEOUT)
+        self.respond(200, {"extracted": {"key": "metro"}})
+        self.assertEqual(views.fetch_ai_analysis("took metro 12 km", "u"), {"key": "metro"})
+
+    def test_failures_are_none(self):
+        for status_code, body in ((500, {}), (200, {"extracted": []})):
+            with self.subTest(status=status_code):
+                self.respond(status_code, body)
+                self.assertIsNone(views.fetch_ai_analysis("took metro 12 km", "u"))
+        self.post.side_effect = ConnectionError("reset")
+        self.assertIsNone(views.fetch_ai_analysis("took metro 12 km", "u"))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  BATCHED AI CALL
+# ─────────────────────────────────────────────────────────────────────────────
+class AIBatchTests(SimpleTestCase):
+
+    CLAUSES = ["took metro 12 km", "ate 2 samosa"]
+
+    def setUp(self):
+        tmp = self.enterContext(tempfile.TemporaryDirectory())
+        self.cache = AIExtractionCache(Path(tmp) / "ai.sqlite3", version="test")
+        self.enterContext(mock.patch.object(views, "AI_CACHE", self.cache))
+        self.enterContext(mock.patch.object(views, "AI_BATCH_MODE", True))
+        self.post = self.enterContext(mock.patch.object(views.AI_CLIENT, "post"))
+        self.per_clause = self.enterContext(
+            mock.patch.object(views, "fetch_ai_analysis", side_effect=lambda text, *a, **kw: {"key": text})
+        )
+
+    def respond(self, status_code, body):
+        self.post.return_value = mock.Mock(status_code=status_code, json=mock.Mock(return_value=body))
+
+    def test_results_follow_clause_indexes(self):
+        self.respond(200, {"extracted": [{"index": 1, "key": "samosa"}, {"index": 7, "key": "x"}]})
+        self.assertEqual(views.fetch_ai_analyses(self.CLAUSES, "u"), [None, {"index": 1, "key": "samosa"}])
+        self.assertEqual(self.cache.get("ate 2 samosa"), [{"index": 1, "key": "samosa"}])
+        self.per_clause.assert_not_called()
+
+    def test_unsupported_batch_falls_back_to_per_clause_calls(self):
+        for status_code in (400, 404, 405):
+            with self.subTest(status=status_code):
+                self.respond(status_code, {})
+                with self.assertRaises(views.AIBatchUnsupported):
+                    views.fetch_ai_analysis_batch(self.CLAUSES, "u", 1.0)
+                self.assertEqual(views._fetch_ai_uncached(self.CLAUSES, "u"),
+                                 [{"key": c} for c in self.CLAUSES])
+        self.assertEqual(self.per_clause.call_count, 6)
+
+    def test_failed_batch_goes_to_the_local_classifier(self):
+        failures = [(502, {}), (500, {"error": "model down"}), (200, {"error": "model down"})]
+        for status_code, body in failures:
+            with self.subTest(status=status_code, body=body):
+                self.respond(status_code, body)
+                self.assertEqual(views._fetch_ai_uncached(self.CLAUSES, "u"), [None, None])
+        self.post.side_effect = requests.ConnectionError("reset")
+        self.assertEqual(views._fetch_ai_uncached(self.CLAUSES, "u"), [None, None])
+        self.post.side_effect = requests.Timeout()
+        self.assertEqual(views._fetch_ai_uncached(self.CLAUSES, "u"), [None, None])
+        self.per_clause.assert_not_called()
+        self.assertIsNone(self.cache.get("took metro 12 km"))
@@ -0,0 +1,153 @@
+import io
+import json
+from datetime import datetime
+from unittest import mock
+
+import requests
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+
+from users import views
+from users.bulk_ingest import (chunked, detect_format, iter_csv_rows, iter_import_rows,
+                               iter_ndjson_rows, parse_timestamp)
+from users.cloudant_db import save_activity_logs_bulk
+
+from .helpers import IsolatedSnapshotMixin
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  BULK IMPORT
+# ─────────────────────────────────────────────────────────────────────────────
+class BulkIngestTests(SimpleTestCase):
+
+    def test_ndjson_rows(self):
+        stream = io.StringIO(
+            '{"input_text": "took metro 12 km", "date": "2025-03-14"}\n'
+            '\n'
+            '"ate 2 samosa"\n'
+            '{"text": "flew 800 km", "timestamp": 1700000000}\n'
+            'not json\n'
+            '[1, 2]\n'
+            '{"input_text": "  "}\n'
+        )
+        rows = list(iter_ndjson_rows(stream))
+        self.assertEqual([r.number for r in rows], [1, 3, 4, 5, 6, 7])
+        self.assertEqual(rows[0].text, 'took metro 12 km')
+        self.assertEqual(rows[0].timestamp, int(datetime(2025, 3, 14).timestamp() * 1000))
+        self.assertEqual((rows[1].text, rows[1].timestamp), ('ate 2 samosa', None))
+        self.assertEqual((rows[2].text, rows[2].timestamp), ('flew 800 km', 1_700_000_000_000))
+        self.assertTrue(rows[3].error.startswith('Invalid JSON'))
+        self.assertEqual(rows[4].error, 'Expected an object or a string')
+        self.assertEqual(rows[5].error, 'Missing input_text')
+
+    def test_csv_rows(self):
+        stream = io.StringIO(
+            'Date,Entry,Mood\n'
+            '2025-03-14,took metro 12 km,ok\n'
+            ',,\n'
+            '1700000000000,ate 2 samosa,\n'
+            'yesterday,flew 800 km,\n'
+        )
+        rows = list(iter_csv_rows(stream))
+        self.assertEqual([(r.number, r.text) for r in rows],
+                         [(2, 'took metro 12 km'), (4, 'ate 2 samosa'), (5, None)])
+        self.assertEqual(rows[1].timestamp, 1_700_000_000_000)
+        self.assertIn('Unreadable date', rows[2].error)
+
+    def test_csv_without_a_text_header_uses_the_first_column(self):
+        rows = list(iter_csv_rows(io.StringIO('diary\ntook metro 12 km\n')))
+        self.assertEqual([r.text for r in rows], ['took metro 12 km'])
+
+    def test_epoch_seconds_and_milliseconds(self):
+        self.assertEqual(parse_timestamp(1_700_000_000), 1_700_000_000_000)
+        self.assertEqual(parse_timestamp('1700000000000'), 1_700_000_000_000)
+        self.assertIsNone(parse_timestamp(''))
+        with self.assertRaises(ValueError):
+            parse_timestamp('14/03/2025')
+
+    def test_upload_format_and_bom(self):
+        upload = SimpleUploadedFile('diary.csv', '﻿input_text\ntook metro 12 km\n'.encode(),
+                                    content_type='text/csv')
+        self.assertEqual(detect_format(upload), 'csv')
+        self.assertEqual(detect_format(upload, 'JSONL'), 'ndjson')
+        self.assertEqual([r.text for r in iter_import_rows(upload, 'csv')], ['took metro 12 km'])
+
+    def test_chunked_does_not_read_ahead(self):
+        read = []
+
+        def rows():
+            for i in range(7):
+                read.append(i)
+                yield i
+
+        chunks = chunked(rows(), 3)
+        self.assertEqual(next(chunks), [0, 1, 2])
+        self.assertEqual(read, [0, 1, 2])
+        self.assertEqual(list(chunks), [[3, 4, 5], [6]])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  BULK SAVE
+#  Cloudant is a mock client; transport failures must come back as per-row
+#  errors so an import carries on with its next chunk.
+# ─────────────────────────────────────────────────────────────────────────────
+class BulkSaveTests(SimpleTestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.enterContext(mock.patch('users.cloudant_db.get_cloudant_client', return_value=self.client))
+        self.enterContext(mock.patch('users.cloudant_db.ensure_activity_db', return_value=True))
+        self.docs = [{'_id': 'a', 'co2e': 1.0}, {'_id': 'b', 'co2e': 2.0}]
+
+    def test_results_are_reported_per_row(self):
+        self.client.post_bulk_docs.return_value.get_result.return_value = [
+            {'id': 'a', 'ok': True}, {'id': 'b', 'error': 'conflict', 'reason': 'Document update conflict.'},
+        ]
+        self.assertEqual(save_activity_logs_bulk(self.docs),
+                         [(True, None), (False, 'conflict: Document update conflict.')])
+
+    def test_transport_errors_fail_every_row_instead_of_raising(self):
+        for error in (requests.ConnectionError('Connection reset by peer'),
+                      requests.Timeout('Read timed out'), requests.ConnectionError()):
+            with self.subTest(error=type(error).__name__):
+                self.client.post_bulk_docs.side_effect = error
+                with self.assertLogs('logger_service', 'ERROR'):
+                    saved = save_activity_logs_bulk(self.docs)
+                self.assertEqual(len(saved), 2)
+                self.assertTrue(all(not ok and msg for ok, msg in saved))
+
+    def test_no_client_fails_every_row(self):
+        with mock.patch('users.cloudant_db.get_cloudant_client', return_value=None):
+            self.assertEqual(save_activity_logs_bulk(self.docs), [(False, 'Cloudant unavailable')] * 2)
+
+
+class StreamBulkImportTests(IsolatedSnapshotMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('importer')
+        self.client = mock.Mock()
+        self.enterContext(mock.patch('users.cloudant_db.get_cloudant_client', return_value=self.client))
+        self.enterContext(mock.patch('users.cloudant_db.ensure_activity_db', return_value=True))
+        self.enterContext(mock.patch.object(views, 'BULK_CHUNK_ROWS', 1))
+
+    def run_import(self, *texts):
+        rows = iter_ndjson_rows(io.StringIO(''.join(json.dumps(t) + '\n' for t in texts)))
+        return [json.loads(line) for line in views.stream_bulk_import(rows, self.user, 'ndjson',
+                                                                       use_ai=False)]
+
+    def test_a_dropped_connection_fails_its_chunk_and_the_import_carries_on(self):
+        self.client.post_bulk_docs.side_effect = [
+            requests.ConnectionError('Connection reset by peer'),
+            mock.Mock(get_result=mock.Mock(return_value=[{'id': 'x', 'ok': True}])),
+        ]
+        with self.assertLogs('logger_service', 'ERROR'):
+            events = self.run_import('took metro 12 km', 'took metro 5 km')
+
+        errors = [e for e in events if e['event'] == 'error']
+        self.assertEqual([(e['row'], e.get('fatal')) for e in errors], [(1, None)])
+        self.assertIn('Connection reset by peer', errors[0]['error'])
+        done = events[-1]
+        self.assertEqual((done['event'], done['status'], done['rows'], done['logged'], done['errors']),
+                         ('done', 'success', 2, 1, 1))
@@ -0,0 +1,111 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from users.carbon_calculator import (CATALOG, EMISSION_DEFAULTS, calculate_co2e,
+                                     calculate_co2e_many, get_factor_cache_stats)
+
+from .helpers import IsolatedSnapshotMixin, make_factor
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  RESOLVED FACTOR TABLE
+# ─────────────────────────────────────────────────────────────────────────────
+class FactorPriorityTests(IsolatedSnapshotMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user('alice')
+        self.bob   = User.objects.create_user('bob')
+
+    def test_verified_factor_wins(self):
+        make_factor('Widget', 2.0, added_by=self.alice)
+        make_factor('widget', 3.0, status='verified')
+        self.assertEqual(calculate_co2e('WIDGET ', 2, request_user=self.alice), (6.0, True))
+        self.assertEqual(calculate_co2e('widget', 2), (6.0, True))
+
+    def test_own_pending_factor_beats_other_records(self):
+        make_factor('gizmo', 5.0, added_by=self.bob)
+        make_factor('Gizmo', 7.0, added_by=self.alice)
+        self.assertEqual(calculate_co2e('gizmo', 1, request_user=self.alice), (7.0, False))
+        self.assertEqual(calculate_co2e('gizmo', 1, request_user=self.bob), (5.0, False))
+        # Anyone else gets the first record by pk
+        self.assertEqual(calculate_co2e('gizmo', 1), (5.0, False))
+
+    def test_defaults_without_a_db_row(self):
+        key = next(iter(EMISSION_DEFAULTS))
+        self.assertEqual(calculate_co2e(key, 2),
+                         (round(2 * CATALOG.default_factor(key), 4), False))
+        self.assertEqual(calculate_co2e('no_such_factor_key', 2), (0.0, False))
+
+    def test_invalid_quantities_score_zero(self):
+        make_factor('widget', 3.0, status='verified')
+        for quantity in (None, -1, 'abc'):
+            with self.subTest(quantity=quantity):
+                self.assertEqual(calculate_co2e('widget', quantity), (0.0, False))
+
+
+class FactorTableTests(IsolatedSnapshotMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.factor = make_factor('widget', 3.0, status='verified')
+
+    def test_repeat_lookups_cost_no_queries(self):
+        calculate_co2e('widget', 1)
+        calculate_co2e('no_such_factor_key', 1)
+        hits = get_factor_cache_stats()["hits"]
+        with self.assertNumQueries(0):
+            self.assertEqual(calculate_co2e('Widget', 1), (3.0, True))
+            self.assertEqual(calculate_co2e('no_such_factor_key', 1), (0.0, False))
+        self.assertEqual(get_factor_cache_stats()["hits"] - hits, 2)
+
+    def test_save_drops_the_resolved_table(self):
+        self.assertEqual(calculate_co2e('widget', 1), (3.0, True))
+        invalidations = get_factor_cache_stats()["invalidations"]
+
+        self.factor.co2e_per_unit = 4.0
+        self.factor.save()
+        self.assertGreater(get_factor_cache_stats()["invalidations"], invalidations)
+        self.assertEqual(get_factor_cache_stats()["size"], 0)
+        self.assertEqual(calculate_co2e('widget', 1), (4.0, True))
+
+    def test_delete_drops_the_resolved_table(self):
+        self.assertEqual(calculate_co2e('widget', 1), (3.0, True))
+        self.factor.delete()
+        self.assertEqual(calculate_co2e('widget', 1), (0.0, False))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  BATCH API
+# ─────────────────────────────────────────────────────────────────────────────
+class BatchCalculationTests(IsolatedSnapshotMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user('alice')
+        self.bob   = User.objects.create_user('bob')
+        make_factor('widget', 1.0005, status='verified')
+        make_factor('gizmo', 7.0, added_by=self.alice)
+        self.items = [
+            ('widget', 2.675, None, None), ('gizmo', 3, None, self.alice),
+            ('gizmo', 3, None, self.bob), (next(iter(EMISSION_DEFAULTS)), 1.5, None, None),
+            ('no_such_factor_key', 1, None, None), ('widget', -2, None, None), (None, 1, None, None),
+        ]
+
+    def test_matches_single_calls(self):
+        batch = calculate_co2e_many(self.items)
+        self.assertEqual(batch, [calculate_co2e(*item) for item in self.items])
+        self.assertEqual(batch[0], (2.6763, True))      # rounded like calculate_co2e
+
+    def test_one_query_for_every_uncached_key(self):
+        with self.assertNumQueries(1):
+            calculate_co2e_many(self.items)
+        with self.assertNumQueries(0):
+            calculate_co2e_many(self.items)
+
+    def test_with_factor_returns_the_factor_used(self):
+        results = calculate_co2e_many(self.items[:2] + self.items[4:5], with_factor=True)
+        self.assertEqual([(f.value, f.version) for _, _, f in results],
+                         [(1.0005, 1), (7.0, 1), (0.0, 0)])
+        self.assertIsNone(results[2][2].factor_id)
+        self.assertEqual(calculate_co2e_many([]), [])
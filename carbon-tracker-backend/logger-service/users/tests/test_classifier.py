@@ -0,0 +1,81 @@
+from django.test import SimpleTestCase, TestCase
+
+from users import views
+from users.factor_catalog import CATALOG
+from users.views import (CLASSIFY_CACHE, cached_fallback_classify, fallback_classify,
+                         get_remap_cache_stats, remap_ai_key)
+
+from .helpers import IsolatedSnapshotMixin, make_factor
+from .reference import SAMPLE_CLAUSES
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  AI KEY REMAP
+# ─────────────────────────────────────────────────────────────────────────────
+def scanned_remap(ai_key, ai_category):
+    """remap_ai_key without the exact table: always the longest-trigger scan."""
+    trigger = views._scan_remap_trigger.__wrapped__(ai_key.lower().strip())
+    if not trigger:
+        return ai_key, ai_category, 'unit'
+    category, db_key, natural_unit = CATALOG.trigger_entry(trigger)
+    return db_key, category, natural_unit
+
+
+class RemapAIKeyTests(SimpleTestCase):
+
+    def test_exact_table_matches_the_scan(self):
+        for key in views._REMAP_EXACT:
+            with self.subTest(key=key):
+                self.assertEqual(remap_ai_key(key, 'FOOD'), scanned_remap(key, 'FOOD'))
+
+    def test_unknown_keys_are_scanned_and_memoized(self):
+        key = f'extra_{CATALOG.triggers_longest_first[0]}_large'
+        before = get_remap_cache_stats()
+        self.assertEqual(remap_ai_key(key, 'FOOD'), scanned_remap(key, 'FOOD'))
+        remap_ai_key(key.upper(), 'FOOD')
+        after = get_remap_cache_stats()
+        self.assertEqual(after['scanned'] - before['scanned'], 2)
+        self.assertEqual(after['lru_hits'] - before['lru_hits'], 1)
+
+        self.assertEqual(remap_ai_key('qqq_zzz', 'WASTE'), ('qqq_zzz', 'WASTE', 'unit'))
+        self.assertEqual(remap_ai_key('', 'WASTE'), ('', 'WASTE', 'unit'))
+
+    def test_known_keys_skip_the_scan(self):
+        key = next(iter(views._REMAP_EXACT))
+        before = get_remap_cache_stats()
+        remap_ai_key(f' {key.upper()} ', 'FOOD')
+        after = get_remap_cache_stats()
+        self.assertEqual(after['exact'] - before['exact'], 1)
+        self.assertEqual(after['lru_misses'], before['lru_misses'])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  CLASSIFICATION CACHE
+# ─────────────────────────────────────────────────────────────────────────────
+class ClassificationCacheTests(IsolatedSnapshotMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        views._DB_KEY_CACHE = None
+        CLASSIFY_CACHE.clear()
+        self.addCleanup(setattr, views, '_DB_KEY_CACHE', None)
+
+    def test_cached_results_match_the_classifier(self):
+        for clause in SAMPLE_CLAUSES:
+            with self.subTest(clause=clause):
+                self.assertEqual(cached_fallback_classify(clause), fallback_classify(clause))
+                self.assertEqual(cached_fallback_classify(clause.upper()), fallback_classify(clause))
+
+    def test_repeat_clause_is_a_hit(self):
+        hits = CLASSIFY_CACHE.stats()["hits"]
+        first = cached_fallback_classify('Ate 2 plates of Qwertyish curry')
+        self.assertEqual(cached_fallback_classify('ate 2 plates of qwertyish CURRY'), first)
+        self.assertEqual(CLASSIFY_CACHE.stats()["hits"] - hits, 1)
+
+    def test_new_key_index_drops_the_cache(self):
+        text = 'ate 2 plates of qwertyish curry'
+        self.assertEqual(cached_fallback_classify(text)[1], 'food')
+        make_factor('Qwertyish_Curry', 1.0)
+        views._DB_KEY_CACHE = None              # key list refreshed (TTL / new snapshot)
+        self.assertEqual(cached_fallback_classify(text)[1], 'Qwertyish_Curry')
+        self.assertEqual(len(CLASSIFY_CACHE), 1)
@@ -0,0 +1,31 @@
+from django.test import SimpleTestCase
+
+from users.factor_catalog import CATALOG
+
+from .reference import SAMPLE_CLAUSES, legacy_scan, lexed_scan
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  CLAUSE LEXER
+# ─────────────────────────────────────────────────────────────────────────────
+class ClauseLexerParityTests(SimpleTestCase):
+    """Words, quantity, unit and trigger must match the per-rule regexes they replaced."""
+
+    CLAUSES = SAMPLE_CLAUSES + (
+        'ate 0.5. kg rice', 'bought 1.5/2 kg sugar', 'used x.5 kwh', 'ate 200g paneer',
+        'used 3 units bijli', 'had half plate biryani', 'ate an egg', 'drank 2 cups of tea',
+        'nothing to see here', '', 'drove 12.5 km.',
+    )
+
+    def test_matches_the_legacy_extractors(self):
+        for text in self.CLAUSES:
+            with self.subTest(text=text):
+                self.assertEqual(lexed_scan(text.lower()), legacy_scan(text.lower()))
+
+    def test_every_trigger_whole_words_only(self):
+        triggers = CATALOG.triggers_longest_first
+        texts = [f'yesterday i had {t} 2 times' for t in triggers]
+        texts += [f'x{t}x 3' for t in triggers]
+        texts += [f'{b} then {a}' for a, b in zip(triggers, triggers[::-1])]
+        mismatches = [t for t in texts if lexed_scan(t) != legacy_scan(t)]
+        self.assertEqual(mismatches, [])
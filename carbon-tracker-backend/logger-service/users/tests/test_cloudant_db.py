@@ -0,0 +1,112 @@
+import os
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from users import cloudant_db
+from users.management.commands.bench_cloudant import CloudantStandIn
+
+
+class StandInMixin:
+    """A local IAM + Cloudant stand-in with no emulated latency, and a fresh shared client."""
+
+    def setUp(self):
+        super().setUp()
+        self.server = CloudantStandIn(rtt=0, handshake=0, iam=0)
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.enterContext(mock.patch.dict(os.environ, CLOUDANT_URL=self.server.url,
+                                          CLOUDANT_APIKEY='stand-in', CLOUDANT_IAM_URL=self.server.url))
+        cloudant_db.reset_cloudant_client()
+        self.addCleanup(cloudant_db.reset_cloudant_client)
+
+    def save(self, times=1):
+        return [cloudant_db.save_activity_log({'username': 'alice', 'co2e': 1.0})
+                for _ in range(times)]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  SHARED CLIENT
+# ─────────────────────────────────────────────────────────────────────────────
+class SharedClientTests(StandInMixin, SimpleTestCase):
+
+    def test_saves_reuse_one_token_and_one_connection(self):
+        self.assertEqual(self.save(20), [True] * 20)
+        self.assertEqual(self.server.counts['iam_token'], 1)
+        self.assertEqual(self.server.counts['connections'], 2)   # IAM + Cloudant
+        self.assertEqual(self.server.counts['post_document'], 20)
+
+    def test_concurrent_first_use_builds_one_client(self):
+        start = threading.Barrier(8)
+        clients = []
+        build = self.enterContext(mock.patch.object(
+            cloudant_db, '_build_cloudant_client', wraps=cloudant_db._build_cloudant_client
+        ))
+
+        def first_use():
+            start.wait(5)
+            clients.append(cloudant_db.get_cloudant_client())
+
+        threads = [threading.Thread(target=first_use) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(len({id(client) for client in clients}), 1)
+
+    def test_reset_builds_a_new_client_and_token(self):
+        self.save()
+        client = cloudant_db.get_cloudant_client()
+        cloudant_db.reset_cloudant_client()
+        self.save()
+        self.assertIsNot(cloudant_db.get_cloudant_client(), client)
+        self.assertEqual(self.server.counts['iam_token'], 2)
+
+    def test_pool_size_is_configurable(self):
+        adapter = cloudant_db.get_cloudant_client().http_client.get_adapter(self.server.url)
+        self.assertEqual(adapter._pool_maxsize, cloudant_db.CLOUDANT_POOL_SIZE)
+
+    def test_missing_credentials(self):
+        with mock.patch.dict(os.environ, CLOUDANT_APIKEY=''), self.assertLogs('logger_service', 'CRITICAL'):
+            self.assertIsNone(cloudant_db.get_cloudant_client())
+            self.assertEqual(self.save(), [False])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  DATABASE ENSURED ONCE
+# ─────────────────────────────────────────────────────────────────────────────
+class EnsureActivityDBTests(StandInMixin, SimpleTestCase):
+
+    def test_checked_once_per_process(self):
+        self.assertEqual(self.save(10), [True] * 10)
+        self.assertEqual(self.server.counts['get_database_information'], 1)
+        self.assertEqual(self.server.counts['put_index'], len(cloudant_db.ACTIVITY_INDEXES))
+        self.assertEqual(self.server.counts['post_document'], 10)
+
+    def test_missing_database_is_created_on_first_write(self):
+        self.server.db_exists = False
+        self.assertEqual(self.save(3), [True] * 3)
+        self.assertEqual((self.server.counts['put_database'], self.server.counts['post_document']), (1, 3))
+
+    def test_database_deleted_later_is_recreated_on_the_404(self):
+        self.save()
+        self.server.db_exists = False
+        self.assertEqual(self.save(), [True])
+        self.assertEqual(cloudant_db.save_activity_logs_bulk([{'_id': 'a'}, {'_id': 'b'}]),
+                         [(True, None)] * 2)
+        counts = self.server.counts
+        self.assertEqual((counts['get_database_information'], counts['put_database']), (2, 1))
+        self.assertEqual((counts['post_document'], counts['bulk_docs']), (2, 1))
+
+    def test_conflict_on_a_chosen_id_counts_as_saved(self):
+        client = mock.Mock()
+        client.post_document.side_effect = cloudant_db.ApiException(409, message='conflict')
+        self.enterContext(mock.patch.object(cloudant_db, 'get_cloudant_client', return_value=client))
+        self.enterContext(mock.patch.object(cloudant_db, '_DB_READY', True))
+        self.assertTrue(cloudant_db.save_activity_log({'_id': 'job_1:0', 'username': 'alice'}))
+        with self.assertLogs('logger_service', 'ERROR'):
+            self.assertFalse(cloudant_db.save_activity_log({'username': 'alice'}))
+        client.get_database_information.assert_not_called()
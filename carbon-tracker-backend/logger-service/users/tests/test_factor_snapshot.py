@@ -0,0 +1,85 @@
+import os
+import time
+from unittest import mock
+
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from users import factor_snapshot
+from users.carbon_calculator import calculate_co2e
+from users.factor_snapshot import get_snapshot, publish_snapshot
+
+from .helpers import IsolatedSnapshotMixin, make_factor
+
+
+def publish_pending():
+    """What the background publisher thread does, run inline and without its debounce."""
+    with mock.patch.object(factor_snapshot, "PUBLISH_DEBOUNCE", 0), \
+            mock.patch.object(factor_snapshot, "connection"):
+        factor_snapshot._background_publish(None)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  SHARED FACTOR SNAPSHOT
+# ─────────────────────────────────────────────────────────────────────────────
+class SnapshotPublishTests(IsolatedSnapshotMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.factor = make_factor('Widget', 3.0, status='verified')
+        make_factor('gizmo', 1.5)
+        publish_pending()
+        self.publish_in_background.reset_mock()
+
+    def test_lookup_matches_the_table(self):
+        snapshot = get_snapshot()
+        self.assertEqual(snapshot.count, 2)
+        self.assertEqual(sorted(snapshot.keys()), ['Widget', 'gizmo'])
+        row, = snapshot.lookup(' WIDGET')
+        self.assertEqual((row['id'], row['co2e_per_unit'], row['status']), (self.factor.pk, 3.0, 'verified'))
+        self.assertEqual(snapshot.lookup('nothing'), [])
+
+    def test_save_hands_the_publish_off(self):
+        version = get_snapshot().version
+        with mock.patch.object(factor_snapshot, "publish_snapshot", wraps=publish_snapshot) as publish:
+            with transaction.atomic():
+                self.factor.co2e_per_unit = 4.0
+                self.factor.save()
+                make_factor('sprocket', 2.0)
+            publish.assert_not_called()                     # not in the request
+            self.publish_in_background.assert_called_once_with()
+            # This worker reads its own change from the DB until it is published
+            self.assertIsNone(get_snapshot())
+            self.assertEqual(calculate_co2e('widget', 1), (4.0, True))
+
+            publish_pending()
+            publish.assert_called_once_with(None)
+        self.assertEqual(get_snapshot().version, version + 1)
+        self.assertEqual(get_snapshot().lookup('widget')[0]['co2e_per_unit'], 4.0)
+
+    def test_failed_publish_keeps_reading_the_db(self):
+        self.factor.co2e_per_unit = 5.0
+        self.factor.save()
+        with mock.patch.object(factor_snapshot, "publish_snapshot", side_effect=OSError("disk full")):
+            publish_pending()
+        self.assertIsNone(get_snapshot())
+        self.assertEqual(calculate_co2e('widget', 1), (5.0, True))
+
+    def test_unchanged_table_keeps_the_version(self):
+        version = get_snapshot().version
+        self.assertEqual(publish_snapshot(), version)
+
+        aged = time.time() - factor_snapshot.MAX_AGE - 1
+        os.utime(factor_snapshot.SNAPSHOT_PATH, (aged, aged))
+        factor_snapshot._SNAPSHOT.published_at = aged
+        self.assertIsNone(get_snapshot())                   # aged: checked in the background
+        self.publish_in_background.assert_called_once_with(if_older_than=factor_snapshot.MAX_AGE)
+        self.assertEqual(publish_snapshot(if_older_than=factor_snapshot.MAX_AGE), version)
+        self.assertGreater(factor_snapshot.SNAPSHOT_PATH.stat().st_mtime, aged)
+
+    def test_changed_table_publishes_a_new_version(self):
+        version = get_snapshot().version
+        make_factor('sprocket', 2.0)
+        factor_snapshot._UNPUBLISHED = 0        # as if another worker's publish had failed
+        self.assertEqual(publish_snapshot(), version + 1)
+        self.assertEqual(get_snapshot().lookup('sprocket')[0]['co2e_per_unit'], 2.0)
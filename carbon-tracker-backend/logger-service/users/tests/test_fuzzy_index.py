@@ -0,0 +1,83 @@
+import re
+
+from django.test import SimpleTestCase
+
+from users.carbon_calculator import EMISSION_DEFAULTS
+from users.fuzzy_index import CategoryKeywordIndex, EmissionKeyIndex
+from users.views import CATEGORY_KEYWORDS, EXCLUDED_FROM_SCORING
+
+from .reference import SAMPLE_CLAUSES, legacy_category_scores, legacy_key_search
+
+
+def one_edit_typos(word):
+    """Drop, double and swap variants of a word — scores right around the threshold."""
+    variants = {word[1:], word[:-1], word + word[-1], word[0] + word}
+    if len(word) > 2:
+        variants.add(word[1] + word[0] + word[2:])
+    return [v for v in variants if v]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  CATEGORY SCORING
+# ─────────────────────────────────────────────────────────────────────────────
+class CategoryKeywordIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = CategoryKeywordIndex(CATEGORY_KEYWORDS, EXCLUDED_FROM_SCORING, threshold=82)
+
+    def test_matches_the_words_by_keywords_loop(self):
+        word_lists = [re.findall(r'\b[a-z]+\b', c.lower()) for c in SAMPLE_CLAUSES]
+        word_lists += [['ate', *one_edit_typos(kw)] for kws in CATEGORY_KEYWORDS.values() for kw in kws]
+        word_lists += [[], ['used', 'had', 'took'], ['rice', 'rice', 'ric']]
+        for words in word_lists:
+            with self.subTest(words=words):
+                self.assertEqual(self.index.scores(words), legacy_category_scores(words))
+
+    def test_repeated_words_are_memoized(self):
+        self.index.scores(['ate', 'rice'])
+        self.assertEqual(self.index.stats, {"hits": 0, "misses": 2})
+        self.index.scores(['rice', 'bus'])
+        self.assertEqual(self.index.stats, {"hits": 1, "misses": 3})
+
+    def test_memo_is_bounded(self):
+        index = CategoryKeywordIndex(CATEGORY_KEYWORDS, EXCLUDED_FROM_SCORING, memo_size=2)
+        index.scores(['rice', 'bus', 'fan'])
+        index.scores(['rice'])
+        self.assertEqual(index.stats, {"hits": 0, "misses": 4})
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  DB KEY SEARCH
+# ─────────────────────────────────────────────────────────────────────────────
+class EmissionKeyIndexTests(SimpleTestCase):
+
+    KEYS = list(EMISSION_DEFAULTS) + [
+        'Rice_White_India', 'Gas_Cylinder', 'Paneer_Tikka_Homemade', 'paneer_tikka_homemade',
+        'Solar_Geyser', 'Ox', 'Mango_Shake', 'Chicken_Biryani_Hyderabadi',
+    ]
+
+    def setUp(self):
+        self.index = EmissionKeyIndex(self.KEYS, threshold=80)
+
+    def find_both(self, text):
+        words = re.findall(r'\b[a-z]+\b', text)
+        return self.index.find(text, words), legacy_key_search(self.KEYS, text, words)
+
+    def test_matches_the_key_by_word_loop(self):
+        texts = [c.lower() for c in SAMPLE_CLAUSES] + [
+            'ate rice white india 2 kg', 'had paneer tikka', 'used gs', 'bought a gas cylinder',
+            'drank mango shake and ate biryani', 'nothing here', '',
+        ]
+        parts = {p for k in self.KEYS for p in k.lower().split('_') if len(p) > 2}
+        texts += [f'had {typo} 2 kg' for part in sorted(parts) for typo in one_edit_typos(part)]
+        for text in texts:
+            with self.subTest(text=text):
+                new, old = self.find_both(text)
+                self.assertEqual(new, old)
+
+    def test_substring_wins_and_earliest_key_breaks_ties(self):
+        words = ['ate', 'paneer', 'tikka', 'homemade']
+        self.assertEqual(self.index.find('ate paneer tikka homemade', words), 'Paneer_Tikka_Homemade')
+        self.assertEqual(self.index.find('x', ['cylindr']), 'Gas_Cylinder')
+        self.assertIsNone(self.index.find('qqq', ['qqq']))
+        self.assertEqual(len(self.index), len(self.KEYS))
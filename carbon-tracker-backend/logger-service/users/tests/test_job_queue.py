@@ -0,0 +1,103 @@
+import importlib
+from datetime import timedelta
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from users import views
+from users.job_queue import JobWorkerPool
+from users.models import ActivityJob
+
+from .helpers import IsolatedSnapshotMixin
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  JOB QUEUE
+# ─────────────────────────────────────────────────────────────────────────────
+class JobQueueTests(IsolatedSnapshotMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('jobs')
+        self.pool = JobWorkerPool(lambda job: ({"ok": True}, 201), workers=0,
+                                  stale_after=60, max_attempts=2)
+
+    def make_job(self, age=0, **fields):
+        fields.setdefault('input_text', 'took metro 12 km')
+        job = ActivityJob.objects.create(user=self.user, **fields)
+        ActivityJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(seconds=age))
+        return job
+
+    def sweep(self):
+        self.pool._last_sweep = float('-inf')
+        self.pool._sweep()
+
+    def test_claims_oldest_queued_job_once(self):
+        newer, older = self.make_job(age=1), self.make_job(age=5)
+        self.make_job(status='done')
+
+        claimed = self.pool.claim_next()
+        self.assertEqual(claimed.pk, older.pk)
+        self.assertEqual((claimed.status, claimed.attempts), ('running', 1))
+        self.assertEqual(self.pool.claim_next().pk, newer.pk)
+        self.assertIsNone(self.pool.claim_next())
+
+    def test_run_stores_the_outcome(self):
+        self.make_job()
+        job = self.pool.claim_next()
+        self.pool.run(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.http_status, job.result), ('done', 201, {"ok": True}))
+
+    def test_stale_job_is_requeued_then_abandoned(self):
+        self.make_job()
+        stale = timezone.now() - timedelta(seconds=120)
+
+        job = self.pool.claim_next()
+        ActivityJob.objects.filter(pk=job.pk).update(started_at=stale)
+        self.sweep()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.started_at), ('queued', None))
+
+        job = self.pool.claim_next()
+        self.assertEqual(job.attempts, 2)
+        ActivityJob.objects.filter(pk=job.pk).update(started_at=stale)
+        self.sweep()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.http_status), ('failed', 500))
+        self.assertEqual(self.pool.stats()["requeued"], 1)
+        self.assertEqual(self.pool.stats()["abandoned"], 1)
+
+    def test_rerun_job_reuses_its_log_ids(self):
+        saved = []
+        job = self.make_job(input_text='took metro 12 km and ate 2 samosa')
+        with mock.patch.object(views, "fetch_ai_analyses", lambda clauses, *args, **kwargs: [None] * len(clauses)), \
+                mock.patch.object(views, "save_activity_log", lambda doc: saved.append(doc["_id"]) or True):
+            views.run_activity_job(job)
+            first = list(saved)
+            views.run_activity_job(job)
+        self.assertTrue(first)
+        self.assertEqual(saved, first + first)
+        self.assertTrue(all(doc_id.startswith(f"job_{job.pk}:") for doc_id in first))
+
+
+class JobPoolStartupTests(SimpleTestCase):
+
+    def setUp(self):
+        self.start = self.enterContext(mock.patch.object(views.JOB_POOL, "start"))
+
+    def test_app_ready_never_starts_the_pool(self):
+        apps.get_app_config('users').ready()
+        self.start.assert_not_called()
+
+    def test_wsgi_starts_the_pool_only_when_opted_in(self):
+        import core.wsgi
+        with mock.patch.object(views, "JOB_WORKERS_AUTOSTART", False):
+            importlib.reload(core.wsgi)
+        self.start.assert_not_called()
+        with mock.patch.object(views, "JOB_WORKERS_AUTOSTART", True):
+            importlib.reload(core.wsgi)
+        self.start.assert_called_once_with()
@@ -0,0 +1,80 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from users import metrics
+
+
+def run_in_thread(target):
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  PER-THREAD SHARDS
+# ─────────────────────────────────────────────────────────────────────────────
+class ShardTests(SimpleTestCase):
+
+    def setUp(self):
+        self.enterContext(mock.patch.object(metrics, 'ENABLED', True))
+        metrics.fold()
+
+    def clauses(self, tier):
+        return metrics.CLAUSES.labels(tier)._value
+
+    def test_exited_threads_are_folded_once_and_dropped(self):
+        before, shards = self.clauses('ai'), len(metrics._SHARDS)
+        for _ in range(20):
+            run_in_thread(lambda: metrics.count_clauses(2, 1, 0))
+        metrics.fold()
+        self.assertEqual(self.clauses('ai') - before, 40)
+        self.assertEqual(len(metrics._SHARDS), shards)
+        metrics.fold()
+        self.assertEqual(self.clauses('ai') - before, 40)
+
+    def test_a_new_thread_folds_a_long_backlog(self):
+        self.enterContext(mock.patch.object(metrics, 'RETIRED_BACKLOG', 4))
+        shards = len(metrics._SHARDS)
+        for _ in range(50):
+            run_in_thread(lambda: metrics.count_clauses(0, 0, 1))
+        self.assertLessEqual(len(metrics._SHARDS), shards + 6)
+
+    def test_live_threads_keep_their_shard(self):
+        recorded, done = threading.Event(), threading.Event()
+        before = self.clauses('local')
+
+        def worker():
+            metrics.count_clauses(0, 1, 0)
+            recorded.set()
+            done.wait(5)
+            metrics.count_clauses(0, 1, 0)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        recorded.wait(5)
+        metrics.fold()
+        self.assertEqual(self.clauses('local') - before, 1)
+        done.set()
+        thread.join()
+        metrics.fold()
+        self.assertEqual(self.clauses('local') - before, 2)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  STAGE SAMPLING
+# ─────────────────────────────────────────────────────────────────────────────
+class StageSamplingTests(SimpleTestCase):
+
+    def test_one_request_in_stage_sample_is_timed(self):
+        self.enterContext(mock.patch.object(metrics, 'ENABLED', True))
+        self.enterContext(mock.patch.object(metrics, 'STAGE_SAMPLE', 4))
+        timers = [metrics.stage_timer() for _ in range(8)]
+        self.assertEqual(sum(isinstance(t, metrics.StageTimer) for t in timers), 2)
+
+    def test_help_text_says_counts_are_sampled(self):
+        help_line = next(line for line in metrics.render().splitlines()
+                         if line.startswith('# HELP logger_pipeline_stage_seconds'))
+        self.assertIn(f'1 request in {metrics.STAGE_SAMPLE}', help_line)
+        self.assertIn('_count is sampled requests only', help_line)
@@ -0,0 +1,95 @@
+from unittest import mock
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.test import TransactionTestCase
+
+from users.carbon_calculator import calculate_co2e
+from users.factor_snapshot import publish_after_commit
+from users.models import EmissionFactor
+
+from .helpers import IsolatedSnapshotMixin, make_factor
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  key_normalized / version
+# ─────────────────────────────────────────────────────────────────────────────
+class FactorSaveTests(IsolatedSnapshotMixin, TransactionTestCase):
+
+    def test_save_normalizes_key_and_versions_real_changes(self):
+        factor = make_factor(' Widget ', 2.0)
+        self.assertEqual((factor.key_normalized, factor.version), ('widget', 1))
+
+        factor.unit = 'g'                       # not a versioned field
+        factor.save()
+        factor.refresh_from_db()
+        self.assertEqual(factor.version, 1)
+
+        factor.co2e_per_unit = 2.5
+        factor.save(update_fields=['co2e_per_unit'])
+        factor.refresh_from_db()
+        self.assertEqual(factor.version, 2)
+
+
+class FactorBulkWriteTests(IsolatedSnapshotMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.factor = make_factor('widget', 3.0, status='verified')
+        self.assertEqual(calculate_co2e('widget', 1), (3.0, True))   # warm the table
+
+    def test_update_bumps_version_and_drops_the_table(self):
+        with mock.patch('users.signals.publish_after_commit', wraps=publish_after_commit) as publish:
+            EmissionFactor.objects.filter(pk=self.factor.pk).update(co2e_per_unit=4.0)
+        publish.assert_called_once_with()
+        self.factor.refresh_from_db()
+        self.assertEqual(self.factor.version, 2)
+        self.assertEqual(calculate_co2e('widget', 1), (4.0, True))
+
+    def test_update_of_unversioned_fields_keeps_version(self):
+        EmissionFactor.objects.filter(pk=self.factor.pk).update(unit='g')
+        self.factor.refresh_from_db()
+        self.assertEqual(self.factor.version, 1)
+
+    def test_update_key_renormalizes(self):
+        EmissionFactor.objects.filter(pk=self.factor.pk).update(key=' Gadget ')
+        self.factor.refresh_from_db()
+        self.assertEqual(self.factor.key_normalized, 'gadget')
+        self.assertEqual(calculate_co2e('gadget', 1), (3.0, True))
+
+        EmissionFactor.objects.filter(pk=self.factor.pk).update(key=Value(' GIZMO'))
+        self.factor.refresh_from_db()
+        self.assertEqual(self.factor.key_normalized, 'gizmo')
+
+    def test_empty_update_publishes_nothing(self):
+        with mock.patch('users.signals.publish_after_commit', wraps=publish_after_commit) as publish:
+            EmissionFactor.objects.filter(key='no_such_factor_key').update(co2e_per_unit=1.0)
+        publish.assert_not_called()
+
+    def test_bulk_create_normalizes_and_publishes_once(self):
+        with mock.patch('users.signals.publish_after_commit', wraps=publish_after_commit) as publish:
+            with transaction.atomic():
+                EmissionFactor.objects.bulk_create([
+                    EmissionFactor(activity_type='TEST', key=key, co2e_per_unit=value,
+                                   unit='kg', status='verified')
+                    for key, value in (('Gadget', 1.5), (' SPROCKET', 2.0))
+                ])
+                make_factor('gizmo', 1.0)
+        publish.assert_called_once_with()
+        self.assertEqual(sorted(EmissionFactor.objects.values_list('key_normalized', flat=True)),
+                         ['gadget', 'gizmo', 'sprocket', 'widget'])
+        self.assertEqual(calculate_co2e('sprocket', 2), (4.0, True))
+
+    def test_bulk_update_bumps_only_versioned_writes(self):
+        other = make_factor('gadget', 1.0, status='verified')
+        self.factor.co2e_per_unit = 5.0
+        other.co2e_per_unit = 6.0
+        EmissionFactor.objects.bulk_update([self.factor, other], ['co2e_per_unit'])
+        self.assertEqual(list(EmissionFactor.objects.order_by('pk').values_list('version', flat=True)),
+                         [2, 2])
+        self.assertEqual(calculate_co2e('widget', 1), (5.0, True))
+
+        EmissionFactor.objects.bulk_update([self.factor], ['unit'])
+        EmissionFactor.objects.filter(pk=other.pk).update(version=F('version'))
+        self.assertEqual(list(EmissionFactor.objects.order_by('pk').values_list('version', flat=True)),
+                         [2, 2])
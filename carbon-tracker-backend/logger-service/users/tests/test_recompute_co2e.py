@@ -0,0 +1,108 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from users.carbon_calculator import calculate_co2e_many
+from users.management.commands.recompute_co2e import Command
+
+from .helpers import IsolatedSnapshotMixin, make_factor
+
+
+def stamped_log(key, quantity, **fields):
+    """An activity log as the pipeline stores it, stamped with today's factor."""
+    co2e, is_verified, factor = calculate_co2e_many([(key, quantity, None, None)], with_factor=True)[0]
+    return {'_id': f'log_{key}_{quantity}', 'username': 'alice', 'key': key, 'quantity': quantity,
+            'unit': 'kg', 'co2e': co2e, 'is_verified': is_verified, 'factor_id': factor.factor_id,
+            'factor_version': factor.version, 'factor_value': factor.value, **fields}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  RECOMPUTE
+# ─────────────────────────────────────────────────────────────────────────────
+class RecomputeTests(IsolatedSnapshotMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.command = Command()
+        self.factor = make_factor('Widget', 2.0, status='verified')
+
+    def test_stamped_logs_are_skipped(self):
+        docs = [stamped_log('widget', 3), stamped_log('no_such_factor_key', 1)]
+        self.assertEqual(self.command._recompute(docs), [])
+
+    def test_changed_factor_restamps_the_log(self):
+        doc = stamped_log('widget', 3, confidence={'source': 'db_verified', 'score': 0.9})
+        self.factor.co2e_per_unit = 2.5
+        self.factor.save()
+
+        changed, = self.command._recompute([doc])
+        self.assertEqual((changed['co2e'], changed['factor_version'], changed['factor_value']),
+                         (7.5, 2, 2.5))
+        self.assertEqual(changed['confidence'], {'source': 'db_verified', 'score': 0.9})
+
+        self.factor.status = 'pending'
+        self.factor.save()
+        changed, = self.command._recompute([doc])
+        self.assertEqual((changed['is_verified'], changed['confidence']['source']), (False, 'db'))
+
+    def test_selector_matches_every_spelling(self):
+        self.assertEqual(self.command._selector(['WIDGET '], False),
+                         {'key': {'$in': ['WIDGET ', 'Widget', 'widget']}})
+        self.assertEqual(self.command._selector(['Apple'], False),
+                         {'key': {'$in': ['Apple', 'apple']}})
+        self.assertEqual(self.command._selector([], True), {'key': {'$exists': True}})
+
+
+class RecomputeRunTests(IsolatedSnapshotMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.factor = make_factor('widget', 2.0, status='verified')
+        self.checkpoint = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'state.json'
+        self.client = mock.Mock()
+        self.ensure_db = self.enterContext(
+            mock.patch('users.management.commands.recompute_co2e.ensure_activity_db', return_value=True)
+        )
+        self.enterContext(mock.patch('users.management.commands.recompute_co2e.get_cloudant_client',
+                                     return_value=self.client))
+
+    def run_command(self, *args):
+        call_command('recompute_co2e', '--key', 'widget', '--batch-size', '2',
+                     '--checkpoint', str(self.checkpoint), *args, stdout=mock.Mock())
+
+    def test_pages_are_written_back_and_the_checkpoint_removed(self):
+        stale = [stamped_log('widget', q) for q in (1, 2, 3)]
+        self.factor.co2e_per_unit = 3.0
+        self.factor.save()
+        self.client.post_find.return_value.get_result.side_effect = [
+            {'docs': stale[:2], 'bookmark': 'b1'}, {'docs': stale[2:], 'bookmark': 'b2'},
+        ]
+        self.client.post_bulk_docs.return_value.get_result.return_value = []
+
+        self.run_command()
+        self.ensure_db.assert_called_once_with(self.client)
+        self.client.delete_index.assert_not_called()
+        self.assertEqual([c.kwargs['bookmark'] for c in self.client.post_find.call_args_list], [None, 'b1'])
+        written = [d['co2e'] for c in self.client.post_bulk_docs.call_args_list
+                   for d in c.kwargs['bulk_docs'].docs]
+        self.assertEqual(written, [3.0, 6.0, 9.0])
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_resumes_from_a_matching_checkpoint(self):
+        selector = Command()._selector(['widget'], False)
+        self.checkpoint.write_text(json.dumps(
+            {'selector': selector, 'bookmark': 'b1', 'scanned': 2, 'updated': 1}
+        ))
+        self.client.post_find.return_value.get_result.return_value = {'docs': [], 'bookmark': 'b2'}
+        self.run_command()
+        self.assertEqual(self.client.post_find.call_args.kwargs['bookmark'], 'b1')
+
+        self.checkpoint.write_text(json.dumps(
+            {'selector': {'key': {'$in': ['gizmo']}}, 'bookmark': 'b1', 'scanned': 2, 'updated': 1}
+        ))
+        self.run_command()
+        self.assertIsNone(self.client.post_find.call_args.kwargs['bookmark'])
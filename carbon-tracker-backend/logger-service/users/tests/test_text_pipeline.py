@@ -0,0 +1,122 @@
+import subprocess
+import sys
+import types
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from users import views
+from users.views import (HINGLISH_MAP, apply_hinglish_translation, builtin_sent_tokenize,
+                         get_sentence_splitter, normalize_input_text, split_activity_clauses)
+
+from .reference import (SAMPLE_CLAUSES, legacy_hinglish, legacy_normalize_input_text,
+                        legacy_split_activity_clauses)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  HINGLISH
+# ─────────────────────────────────────────────────────────────────────────────
+class HinglishTranslationTests(SimpleTestCase):
+
+    def test_longest_phrase_first(self):
+        self.assertEqual(apply_hinglish_translation('Khana Khaya aur chai pi'), 'ate food aur tea drank')
+        self.assertEqual(apply_hinglish_translation('adrak chai'), 'tea')
+        self.assertEqual(apply_hinglish_translation('office gaya'), 'travelled to office')
+
+    def test_whole_words_only(self):
+        for text in ('pizza', 'pineapple 2 kg', 'chaiwala', 'khanaa'):
+            with self.subTest(text=text):
+                self.assertEqual(apply_hinglish_translation(text), text)
+        self.assertEqual(legacy_hinglish('pizza'), 'drankzza')      # what the chained replace did
+
+    def test_every_phrase_translates_once(self):
+        # The chained replace re-translated its own output ('palak' → 'spinach' → 'sdranknach')
+        for phrase, english in HINGLISH_MAP.items():
+            with self.subTest(phrase=phrase):
+                self.assertEqual(apply_hinglish_translation(f'aaj {phrase} 2 kg'), f'aaj {english} 2 kg')
+
+    def test_translations_are_memoized(self):
+        apply_hinglish_translation('doodh piya')
+        hits = apply_hinglish_translation.cache_info().hits
+        self.assertEqual(apply_hinglish_translation('doodh piya'), 'milk drank')
+        self.assertEqual(apply_hinglish_translation.cache_info().hits, hits + 1)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  NORMALIZER / CLAUSE SPLITTER
+# ─────────────────────────────────────────────────────────────────────────────
+DIARY = [
+    'took metro 12 km and ate 200g paneer',
+    '- had 2 chai; drove my car 15 km / bought 1/2 kg lpg',
+    'Bijli 5 units use ki aur phir 2 roti khayi, then flew 800 km',
+    'drank 500ml milk or I rode bike 10 kms and then threw 2 kg plastic',
+    'had a burger and fries and 2 cokes\r\nate two samosa and also used ac for 3 hours',
+    'went by train 300 km.. and i took a cab 25 miles.  Moreover watched television 3 hours',
+    '   ', '',
+] + list(SAMPLE_CLAUSES)
+
+
+class TextPipelineTests(SimpleTestCase):
+
+    def setUp(self):
+        # The sentence splitter itself is not under test here: both pipelines use the
+        # built-in one (punkt may not be installed)
+        self.enterContext(mock.patch.object(views, "_sentence_splitter", builtin_sent_tokenize))
+        self.enterContext(mock.patch("nltk.tokenize.sent_tokenize", builtin_sent_tokenize))
+
+    def test_normalizer_matches_the_per_call_regexes(self):
+        for text in DIARY + ['\n'.join(DIARY)]:
+            with self.subTest(text=text):
+                self.assertEqual(normalize_input_text(text), legacy_normalize_input_text(text))
+
+    def test_splitter_matches_and_yields_lazily(self):
+        for text in DIARY + ['\n'.join(DIARY)]:
+            normalized = normalize_input_text(text)
+            with self.subTest(text=text):
+                clauses = split_activity_clauses(normalized)
+                self.assertIsInstance(clauses, types.GeneratorType)
+                self.assertEqual(list(clauses), legacy_split_activity_clauses(normalized))
+
+    def test_clauses_keep_their_numbers(self):
+        self.assertEqual(
+            list(split_activity_clauses(normalize_input_text('drank 2 chai and 3 lassi, ate 2 roti'))),
+            ['drank 2 chai', '3 lassi', 'ate 2 roti'],
+        )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  SENTENCE SPLITTER
+# ─────────────────────────────────────────────────────────────────────────────
+class SentenceSplitterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.enterContext(mock.patch.object(views, "_sentence_splitter", None))
+
+    def test_builtin_splits_after_sentence_ends(self):
+        self.assertEqual(builtin_sent_tokenize('took metro 12 km. ate rice! drove? ok 2.5 kg'),
+                         ['took metro 12 km.', 'ate rice!', 'drove?', 'ok 2.5 kg'])
+
+    def test_builtin_mode_never_loads_nltk(self):
+        with mock.patch.object(views, "SENTENCE_SPLITTER", "builtin"), \
+                mock.patch.object(views, "_load_punkt") as load_punkt:
+            self.assertIs(get_sentence_splitter(), builtin_sent_tokenize)
+        load_punkt.assert_not_called()
+
+    def test_nltk_mode_loads_punkt_once(self):
+        with mock.patch.object(views, "SENTENCE_SPLITTER", "nltk"), \
+                mock.patch.object(views, "_load_punkt", return_value=builtin_sent_tokenize) as load_punkt:
+            get_sentence_splitter()
+            get_sentence_splitter()
+        load_punkt.assert_called_once_with()
+
+    def test_missing_punkt_falls_back_to_builtin(self):
+        with mock.patch("nltk.data.find", side_effect=LookupError), \
+                mock.patch("nltk.download") as download, \
+                mock.patch("nltk.tokenize.sent_tokenize", side_effect=LookupError):
+            self.assertIs(views._load_punkt(), builtin_sent_tokenize)
+        self.assertEqual(download.call_count, 2)
+
+    def test_importing_views_does_not_import_nltk(self):
+        code = "import django, sys; django.setup(); import users.views; print('nltk' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip().splitlines()[-1], "False")
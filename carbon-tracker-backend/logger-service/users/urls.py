@@ -11,10 +11,14 @@ urlpatterns = [
     
     # ✅ Audio-based logging (The missing route causing the 404)
     path('api/log-activity-audio/', views.log_activity_audio_api, name='log_activity_audio'),
+    path('api/log-activity-bulk/', views.log_activity_bulk_api, name='log_activity_bulk'),
+    path('api/jobs/<uuid:job_id>/', views.get_job_status_api, name='job_status_api'),
     path('api/my-activities/', views.get_user_activities_api, name='get_user_activities_api'),
     path('api/speech-to-text/', views.speech_to_text_api, name='stt'),
     path('api/leaderboard/', views.get_leaderboard_api, name='leaderboard_api'),
       path('api/add-custom-factor/', views.add_custom_factor, name='add_custom_factor'),
+    path('api/cache-stats/', views.get_cache_stats_api, name='cache_stats_api'),
+    path('metrics', views.metrics_api, name='metrics'),
     
 
 
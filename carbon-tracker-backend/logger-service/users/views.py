@@ -1,21 +1,44 @@
+import io
+import json
 import time
 import logging
-import nltk
 import requests
 import re
+import threading
 import traceback
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from functools import lru_cache
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from decouple import config
 
-from .models import EmissionFactor
+from .models import ActivityJob, EmissionFactor
 from .serializers import EmissionFactorSerializer
-from thefuzz import fuzz
 
-from .carbon_calculator import calculate_co2e
-from .cloudant_db import save_activity_log, get_user_logs_cloudant
+from .carbon_calculator import calculate_co2e_many, get_factor_cache_stats
+from .factor_catalog import CATALOG, EMISSION_DEFAULTS, SPECIFIC_KEY_MAP, PIECE_TO_KG, UNIT_ALIASES  # noqa: F401
+from .factor_snapshot import get_snapshot
+from .fuzzy_index import CategoryKeywordIndex, EmissionKeyIndex
+from .lru_cache import LRUCache
+from .ai_client import AIServiceClient, AIServiceUnavailable, CircuitBreaker
+from .ai_cache import AIExtractionCache
+from .job_queue import JobWorkerPool
+from . import metrics
+from .metrics import stage
+from .bulk_ingest import FORMATS as IMPORT_FORMATS, chunked, detect_format, iter_import_rows
+from .clause_lexer import (  # noqa: F401  (WORD_NUM_DICT re-exported)
+    WORD_NUM_DICT, QUANTITY_UNITS, FRACTION, NUMBER, UNIT, WORDNUM,
+    as_clause, lex_clause, words as clause_words, best_trigger, best_unit_alias,
+    number_before, dotted_value, follows_digit, right_bounded,
+)
+from .cloudant_db import save_activity_log, save_activity_logs_bulk, get_user_logs_cloudant
 
 from ibm_watson import SpeechToTextV1
 from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
@@ -31,57 +54,90 @@ logging.basicConfig(
 )
 logger = logging.getLogger("logger_service")
 AI_SERVICE_URL = config("AI_SERVICE_URL", default="http://ai_engine:5000/analyze")
+AI_CALL_TIMEOUT     = config("AI_CALL_TIMEOUT", default=5.0, cast=float)      # per clause
+AI_REQUEST_DEADLINE = config("AI_REQUEST_DEADLINE", default=8.0, cast=float)  # whole request
+AI_MAX_WORKERS      = config("AI_MAX_WORKERS", default=8, cast=int)
+AI_BATCH_MODE       = config("AI_BATCH_MODE", default=True, cast=bool)       # one call per request
+AI_BREAKER_FAILURES = config("AI_BREAKER_FAILURES", default=5, cast=int)     # consecutive, to open
+AI_BREAKER_SLOW     = config("AI_BREAKER_SLOW", default=3.0, cast=float)     # slower counts as failure
+AI_BREAKER_COOLDOWN = config("AI_BREAKER_COOLDOWN", default=30.0, cast=float)
+# Interactive requests: classify locally in parallel, use AI only if it answers
+# within this many ms (0 = always wait for AI, up to AI_REQUEST_DEADLINE)
+AI_LATENCY_BUDGET_MS = config("AI_LATENCY_BUDGET_MS", default=0, cast=int)
+# Persistent extraction cache — bump AI_PROMPT_VERSION when the model or prompt changes
+AI_CACHE_ENABLED     = config("AI_CACHE_ENABLED", default=True, cast=bool)
+AI_CACHE_PATH        = config("AI_CACHE_PATH",
+                              default=str(Path(settings.BASE_DIR) / "data" / "ai_extractions.sqlite3"))
+AI_CACHE_TTL         = config("AI_CACHE_TTL", default=7 * 24 * 3600, cast=int)
+AI_CACHE_MAX_ENTRIES = config("AI_CACHE_MAX_ENTRIES", default=100_000, cast=int)
+AI_CACHE_MEMORY_SIZE = config("AI_CACHE_MEMORY_SIZE", default=4096, cast=int)
+AI_PROMPT_VERSION    = config("AI_PROMPT_VERSION", default="granite-3-3-8b-instruct:1")
+
+# Async logging: POST returns 202 + job id, a worker runs the pipeline.
+# Per request with ?async=1 / "async": true; LOG_ACTIVITY_ASYNC makes it the default.
+LOG_ACTIVITY_ASYNC = config("LOG_ACTIVITY_ASYNC", default=False, cast=bool)
+JOB_WORKERS        = config("JOB_WORKERS", default=2, cast=int)          # 0 → run_job_worker only
+JOB_POLL_INTERVAL  = config("JOB_POLL_INTERVAL", default=2.0, cast=float)
+JOB_STALE_AFTER    = config("JOB_STALE_AFTER", default=600.0, cast=float) # running this long → re-queue
+JOB_MAX_ATTEMPTS   = config("JOB_MAX_ATTEMPTS", default=3, cast=int)
+JOB_RETENTION      = config("JOB_RETENTION", default=7 * 24 * 3600, cast=int)
+# Start each web worker's pool when the WSGI app loads (core/wsgi.py), so jobs
+# queued before a restart run without waiting for new traffic.  Off: the first
+# enqueue / status poll starts it, or `manage.py run_job_worker` runs them.
+JOB_WORKERS_AUTOSTART = config("JOB_WORKERS_AUTOSTART", default=False, cast=bool)
+
+# Bulk import: rows per chunk — one AI batch call and one _bulk_docs write each
+BULK_CHUNK_ROWS    = config("BULK_CHUNK_ROWS", default=50, cast=int)
+
+# /metrics: if set, scrapers must send "Authorization: Bearer <token>"
+METRICS_TOKEN      = config("METRICS_TOKEN", default="")
 
 # ─────────────────────────────────────────────────────────────────────────────
-#  NLTK SETUP
+#  SENTENCE SPLITTER
+#  SENTENCE_SPLITTER=nltk     punkt sent_tokenize (default); NLTK is imported
+#                             and punkt loaded / downloaded on first use, not
+#                             at worker boot.  Falls back to builtin if punkt
+#                             cannot be found or downloaded.
+#  SENTENCE_SPLITTER=builtin  split after . ! ? — normalize_input_text has
+#                             already turned every boundary into ". ".
 # ─────────────────────────────────────────────────────────────────────────────
-for _resource in ['tokenizers/punkt', 'tokenizers/punkt_tab']:
+SENTENCE_SPLITTER = config("SENTENCE_SPLITTER", default="nltk").lower()
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+_sentence_splitter = None
+_sentence_splitter_lock = threading.Lock()
+
+
+def builtin_sent_tokenize(text: str) -> list:
+    return _SENTENCE_END_RE.split(text)
+
+
+def _load_punkt():
+    import nltk
+    for resource in ['tokenizers/punkt', 'tokenizers/punkt_tab']:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            nltk.download(resource.split('/')[-1], quiet=True)
     try:
-        nltk.data.find(_resource)
+        nltk.tokenize.sent_tokenize("Warm up.")     # loads the punkt model
     except LookupError:
-        nltk.download(_resource.split('/')[-1], quiet=True)
+        logger.warning("NLTK punkt unavailable — using the built-in sentence splitter")
+        return builtin_sent_tokenize
+    return nltk.tokenize.sent_tokenize
 
 
-# ─────────────────────────────────────────────────────────────────────────────
-#  WORD → NUMBER MAPPING
-# ─────────────────────────────────────────────────────────────────────────────
-WORD_NUM_DICT = {
-    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4,
-    'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
-    'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15,
-    'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19, 'twenty': 20,
-    'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70,
-    'eighty': 80, 'ninety': 90, 'hundred': 100,
-    'half': 0.5, 'quarter': 0.25,
-    'twice': 2, 'thrice': 3, 'couple': 2,
-    'once': 1, 'double': 2, 'triple': 3,
-}
+def get_sentence_splitter():
+    """The configured sent_tokenize, initialized on first call."""
+    global _sentence_splitter
+    if _sentence_splitter is None:
+        with _sentence_splitter_lock:
+            if _sentence_splitter is None:
+                _sentence_splitter = (
+                    _load_punkt() if SENTENCE_SPLITTER == "nltk" else builtin_sent_tokenize
+                )
+    return _sentence_splitter
 
-# ─────────────────────────────────────────────────────────────────────────────
-#  UNIT ALIASES  — user-typed → canonical
-# ─────────────────────────────────────────────────────────────────────────────
-UNIT_ALIASES = {
-    # Weight
-    'kg': 'kg', 'kilogram': 'kg', 'kilograms': 'kg', 'kgs': 'kg',
-    'g': 'g', 'gram': 'g', 'grams': 'g', 'gm': 'g', 'gms': 'g',
-    'mg': 'mg', 'milligram': 'mg',
-    # Distance
-    'km': 'km', 'kilometer': 'km', 'kilometres': 'km', 'kilometers': 'km', 'kms': 'km',
-    'mile': 'mile', 'miles': 'mile',
-    # Volume
-    'litre': 'litre', 'liter': 'litre', 'litres': 'litre', 'liters': 'litre',
-    'ml': 'ml', 'milliliter': 'ml', 'millilitre': 'ml',
-    # Energy
-    'kwh': 'kWh', 'kilowatt hour': 'kWh', 'kilowatt-hour': 'kWh',
-    # Count
-    'piece': 'piece', 'pieces': 'piece', 'slice': 'piece', 'slices': 'piece',
-    'serving': 'piece', 'servings': 'piece',
-    'plate': 'piece', 'bowl': 'piece', 'cup': 'piece', 'glass': 'piece',
-    # Time
-    'hour': 'hour', 'hours': 'hour', 'hr': 'hour', 'hrs': 'hour',
-    # Generic count (NOT kWh — fixed the dual-meaning bug)
-    'unit': 'unit', 'item': 'unit', 'items': 'unit',
-}
 
 # ─────────────────────────────────────────────────────────────────────────────
 #  HINGLISH → ENGLISH TRANSLATION MAP
@@ -173,6 +229,9 @@ EXCLUDED_FROM_SCORING = {
     'went', 'go', 'gone', 'got', 'get',
 }
 
+# Length-filtered, memoized fuzz.ratio >= 82 matcher over CATEGORY_KEYWORDS
+CATEGORY_INDEX = CategoryKeywordIndex(CATEGORY_KEYWORDS, EXCLUDED_FROM_SCORING, threshold=82)
+
 ACTION_VERBS = (
     'used', 'use', 'ate', 'eat', 'had', 'drink', 'drank', 'drunk',
     'drove', 'drive', 'took', 'take', 'travelled', 'traveled', 'travel',
@@ -183,214 +242,25 @@ ACTION_VERBS = (
 )
 
 # ─────────────────────────────────────────────────────────────────────────────
-#  SPECIFIC_KEY_MAP  →  trigger: (category, db_key, natural_unit)
-#  DB keys must match your Django admin EXACTLY (lookup is case-insensitive).
-# ─────────────────────────────────────────────────────────────────────────────
-SPECIFIC_KEY_MAP = {
-    # ── FOOD — in your DB ────────────────────────────────────────────────────
-    'apple':          ('FOOD',      'apple',                    'piece'),
-    'pear':           ('FOOD',      'pear',                     'piece'),
-    'pears':          ('FOOD',      'pear',                     'piece'),
-    'milk':           ('FOOD',      'Buffalo_Milk_Packet',      'litre'),
-    'buffalo milk':   ('FOOD',      'Buffalo_Milk_Packet',      'litre'),
-    'doodh':          ('FOOD',      'Buffalo_Milk_Packet',      'litre'),
-    'paneer':         ('FOOD',      'Paneer_Indian',            'kg'),
-    'wheat':          ('FOOD',      'Wheat_Atta_India',         'kg'),
-    'atta':           ('FOOD',      'Wheat_Atta_India',         'kg'),
-    'flour':          ('FOOD',      'Wheat_Atta_India',         'kg'),
-    'rice':           ('FOOD',      'Rice_White_India',         'kg'),
-    'chawal':         ('FOOD',      'Rice_White_India',         'kg'),
-    'biryani':        ('FOOD',      'Rice_White_India',         'kg'),
-    # ── FOOD — not yet in DB ─────────────────────────────────────────────────
-    'chicken':        ('FOOD',      'chicken_curry_indian',     'piece'),
-    'murgi':          ('FOOD',      'chicken_curry_indian',     'piece'),
-    'dal':            ('FOOD',      'dal',                      'kg'),
-    'roti':           ('FOOD',      'roti',                     'piece'),
-    'bread':          ('FOOD',      'bread',                    'piece'),
-    'egg':            ('FOOD',      'egg',                      'piece'),
-    'eggs':           ('FOOD',      'egg',                      'piece'),
-    'anda':           ('FOOD',      'egg',                      'piece'),
-    'cheese':         ('FOOD',      'cheese',                   'kg'),
-    'butter':         ('FOOD',      'butter',                   'kg'),
-    'beef':           ('FOOD',      'beef',                     'kg'),
-    'mutton':         ('FOOD',      'mutton',                   'kg'),
-    'gosht':          ('FOOD',      'mutton',                   'kg'),
-    'fish':           ('FOOD',      'fish',                     'kg'),
-    'machhli':        ('FOOD',      'fish',                     'kg'),
-    'coffee':         ('FOOD',      'coffee',                   'piece'),
-    'tea':            ('FOOD',      'tea',                      'piece'),
-    'chai':           ('FOOD',      'tea',                      'piece'),
-    'chocolate':      ('FOOD',      'chocolate',                'kg'),
-    'burger':         ('FOOD',      'burger',                   'piece'),
-    'pizza':          ('FOOD',      'pizza',                    'piece'),
-    'sandwich':       ('FOOD',      'sandwich',                 'piece'),
-    'pasta':          ('FOOD',      'pasta',                    'kg'),
-    'noodles':        ('FOOD',      'noodles',                  'kg'),
-    'maggi':          ('FOOD',      'maggi',                    'kg'),
-    'banana':         ('FOOD',      'banana',                   'piece'),
-    'curd':           ('FOOD',      'curd',                     'kg'),
-    'dahi':           ('FOOD',      'dahi',                     'kg'),
-    'lassi':          ('FOOD',      'lassi',                    'litre'),
-    'ghee':           ('FOOD',      'ghee',                     'kg'),
-    'ice cream':      ('FOOD',      'ice_cream',                'kg'),
-    'juice':          ('FOOD',      'juice',                    'litre'),
-    'cold drink':     ('FOOD',      'cold_drink',               'litre'),
-    'soda':           ('FOOD',      'soda',                     'litre'),
-    'cola':           ('FOOD',      'cola',                     'litre'),
-    # Indian snacks
-    'samosa':         ('FOOD',      'samosa',                   'piece'),
-    'idli':           ('FOOD',      'idli',                     'piece'),
-    'dosa':           ('FOOD',      'dosa',                     'piece'),
-    'vada':           ('FOOD',      'vada',                     'piece'),
-    'poha':           ('FOOD',      'poha',                     'kg'),
-    'upma':           ('FOOD',      'upma',                     'kg'),
-    'paratha':        ('FOOD',      'paratha',                  'piece'),
-    'chapati':        ('FOOD',      'chapati',                  'piece'),
-    'puri':           ('FOOD',      'puri',                     'piece'),
-    'dhokla':         ('FOOD',      'dhokla',                   'kg'),
-    'khichdi':        ('FOOD',      'khichdi',                  'kg'),
-    'rajma':          ('FOOD',      'rajma',                    'kg'),
-    'chole':          ('FOOD',      'chole',                    'kg'),
-    'pav bhaji':      ('FOOD',      'pav_bhaji',                'piece'),
-    'biryani':        ('FOOD',      'biryani',                  'piece'),
-    'halwa':          ('FOOD',      'halwa',                    'kg'),
-    'kheer':          ('FOOD',      'kheer',                    'kg'),
-    # Fruits
-    'mango':          ('FOOD',      'mango',                    'piece'),
-    'grapes':         ('FOOD',      'grapes',                   'kg'),
-    'watermelon':     ('FOOD',      'watermelon',               'kg'),
-    'papaya':         ('FOOD',      'papaya',                   'kg'),
-    'guava':          ('FOOD',      'guava',                    'piece'),
-    'orange':         ('FOOD',      'orange',                   'piece'),
-    # Vegetables
-    'carrot':         ('FOOD',      'carrot',                   'kg'),
-    'spinach':        ('FOOD',      'spinach',                  'kg'),
-    'cauliflower':    ('FOOD',      'cauliflower',              'piece'),
-    'cabbage':        ('FOOD',      'cabbage',                  'piece'),
-    'brinjal':        ('FOOD',      'brinjal',                  'kg'),
-    'eggplant':       ('FOOD',      'eggplant',                 'kg'),
-    'capsicum':       ('FOOD',      'capsicum',                 'kg'),
-    'cucumber':       ('FOOD',      'cucumber',                 'piece'),
-    'peas':           ('FOOD',      'peas',                     'kg'),
-    'potato':         ('FOOD',      'potato',                   'kg'),
-    'tomato':         ('FOOD',      'tomato',                   'kg'),
-    'onion':          ('FOOD',      'onion',                    'kg'),
-    # Nuts
-    'almond':         ('FOOD',      'almond',                   'kg'),
-    'cashew':         ('FOOD',      'cashew',                   'kg'),
-    'peanut':         ('FOOD',      'peanut',                   'kg'),
-    'groundnut':      ('FOOD',      'groundnut',                'kg'),
-    # Generic
-    'vegetables':     ('FOOD',      'food',                     'kg'),
-    'sabji':          ('FOOD',      'food',                     'kg'),
-    'sabzi':          ('FOOD',      'food',                     'kg'),
-    # ── ENERGY — in your DB ───────────────────────────────────────────────────
-    'cooking gas':    ('ENERGY',    'LPG_Cooking_Gas_India',    'kg'),
-    'lpg':            ('ENERGY',    'LPG_Cooking_Gas_India',    'kg'),
-    'gas':            ('ENERGY',    'LPG_Cooking_Gas_India',    'kg'),
-    'cylinder':       ('ENERGY',    'LPG_Cooking_Gas_India',    'kg'),
-    'electricity':    ('ENERGY',    'Electricity_India_Grid',   'kWh'),
-    'bijli':          ('ENERGY',    'Electricity_India_Grid',   'kWh'),
-    'power':          ('ENERGY',    'Electricity_India_Grid',   'kWh'),
-    'current':        ('ENERGY',    'Electricity_India_Grid',   'kWh'),
-    'ac':             ('ENERGY',    'Electricity_India_Grid',   'kWh'),
-    'fan':            ('ENERGY',    'Electricity_India_Grid',   'kWh'),
-    'heater':         ('ENERGY',    'Electricity_India_Grid',   'kWh'),
-    'geyser':         ('ENERGY',    'Electricity_India_Grid',   'kWh'),
-    'fridge':         ('ENERGY',    'Electricity_India_Grid',   'kWh'),
-    'tv':             ('ENERGY',    'Electricity_India_Grid',   'kWh'),
-    'laptop':         ('ENERGY',    'Electricity_India_Grid',   'kWh'),
-    # ── ENERGY — not yet in DB ────────────────────────────────────────────────
-    'png':            ('ENERGY',    'png_cooking',              'kg'),
-    'coal':           ('ENERGY',    'coal',                     'kg'),
-    'firewood':       ('ENERGY',    'firewood',                 'kg'),
-    'generator':      ('ENERGY',    'diesel_generator',         'litre'),
-    # ── TRANSPORT — in your DB ────────────────────────────────────────────────
-    'indian railway': ('TRANSPORT', 'Indian_Railways_Sleeper_Train', 'km'),
-    'train':          ('TRANSPORT', 'Indian_Railways_Sleeper_Train', 'km'),
-    'railway':        ('TRANSPORT', 'Indian_Railways_Sleeper_Train', 'km'),
-    'railways':       ('TRANSPORT', 'Indian_Railways_Sleeper_Train', 'km'),
-    'sleeper':        ('TRANSPORT', 'Indian_Railways_Sleeper_Train', 'km'),
-    'bus':            ('TRANSPORT', 'Bus_City_NonAC_India',     'km'),
-    'two wheeler':    ('TRANSPORT', 'Bike_100cc',               'km'),
-    'bike':           ('TRANSPORT', 'Bike_100cc',               'km'),
-    'scooter':        ('TRANSPORT', 'Bike_100cc',               'km'),
-    'scooty':         ('TRANSPORT', 'Bike_100cc',               'km'),
-    'activa':         ('TRANSPORT', 'Bike_100cc',               'km'),
-    'autorickshaw':   ('TRANSPORT', 'Auto_Rickshaw_CNG',        'km'),
-    'auto rickshaw':  ('TRANSPORT', 'Auto_Rickshaw_CNG',        'km'),
-    'auto':           ('TRANSPORT', 'Auto_Rickshaw_CNG',        'km'),
-    'rickshaw':       ('TRANSPORT', 'Auto_Rickshaw_CNG',        'km'),
-    # ── TRANSPORT — not yet in DB ─────────────────────────────────────────────
-    'diesel car':     ('TRANSPORT', 'car_diesel',               'km'),
-    'petrol car':     ('TRANSPORT', 'car_petrol',               'km'),
-    'electric car':   ('TRANSPORT', 'car_electric',             'km'),
-    'cng car':        ('TRANSPORT', 'car_cng',                  'km'),
-    'car':            ('TRANSPORT', 'car_petrol',               'km'),
-    'metro':          ('TRANSPORT', 'metro_india',              'km'),
-    'cab':            ('TRANSPORT', 'taxi',                     'km'),
-    'uber':           ('TRANSPORT', 'taxi',                     'km'),
-    'ola':            ('TRANSPORT', 'taxi',                     'km'),
-    'cycle':          ('TRANSPORT', 'cycle',                    'km'),
-    'bicycle':        ('TRANSPORT', 'cycle',                    'km'),
-    'walk':           ('TRANSPORT', 'walk',                     'km'),
-    'walked':         ('TRANSPORT', 'walk',                     'km'),
-    'flight':         ('TRANSPORT', 'flight_domestic',          'km'),
-    'flew':           ('TRANSPORT', 'flight_domestic',          'km'),
-    'fly':            ('TRANSPORT', 'flight_domestic',          'km'),
-    'airplane':       ('TRANSPORT', 'flight_domestic',          'km'),
-    # ── WASTE ─────────────────────────────────────────────────────────────────
-    'plastic':        ('WASTE',     'plastic_waste',            'kg'),
-    'paper':          ('WASTE',     'paper_waste',              'kg'),
-    'ewaste':         ('WASTE',     'ewaste',                   'kg'),
-}
-
-# ─────────────────────────────────────────────────────────────────────────────
-#  PIECE → KG CONVERSION  (average weight of one piece/serving)
-# ─────────────────────────────────────────────────────────────────────────────
-PIECE_TO_KG = {
-    'apple':        0.182,   # medium apple
-    'pear':         0.178,   # medium pear
-    'banana':       0.120,
-    'orange':       0.160,
-    'mango':        0.300,   # medium mango
-    'guava':        0.100,
-    'chicken':      0.300,   # 1 serving/piece
-    'murgi':        0.300,
-    'egg':          0.060,
-    'anda':         0.060,
-    'roti':         0.040,   # 1 roti
-    'bread':        0.030,   # 1 slice
-    'burger':       0.200,
-    'pizza':        0.150,   # per slice
-    'sandwich':     0.180,
-    'samosa':       0.100,   # 1 samosa
-    'idli':         0.050,   # 1 idli
-    'dosa':         0.100,   # 1 dosa
-    'vada':         0.080,
-    'paratha':      0.080,
-    'chapati':      0.040,
-    'puri':         0.040,
-    'biryani':      0.350,   # 1 plate
-    'pav_bhaji':    0.300,   # 1 plate
-    'cauliflower':  0.600,   # 1 whole head
-    'cabbage':      0.800,   # 1 whole head
-    'cucumber':     0.200,   # 1 cucumber
-    'coffee':       0.007,   # dry grounds per cup
-    'tea':          0.002,   # dry leaves per cup
-    'chai':         0.002,
-}
-
-# ─────────────────────────────────────────────────────────────────────────────
-#  DB KEY CACHE  (5-minute TTL, avoids repeated full-table queries)
+#  DB KEY CACHE
+#  Keys come from the shared factor snapshot, which every worker swaps the
+#  moment any of them publishes a change.  The 5-minute TTL query below is
+#  only the fallback when no snapshot can be mapped.  The trigram index used
+#  by fallback_classify step 3 is rebuilt whenever the key list changes.
 # ─────────────────────────────────────────────────────────────────────────────
 _DB_KEY_CACHE      = None
 _DB_KEY_CACHE_TIME = 0
 DB_KEY_CACHE_TTL   = 300   # seconds
+_KEY_INDEX         = None
+_KEY_INDEX_SOURCE  = None  # the key list _KEY_INDEX was built from
 
 
 def get_cached_emission_keys() -> list:
     global _DB_KEY_CACHE, _DB_KEY_CACHE_TIME
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.keys()
+
     now = time.time()
     if _DB_KEY_CACHE is None or (now - _DB_KEY_CACHE_TIME) > DB_KEY_CACHE_TTL:
         try:
@@ -403,6 +273,17 @@ def get_cached_emission_keys() -> list:
     return _DB_KEY_CACHE
 
 
+def get_emission_key_index() -> EmissionKeyIndex:
+    global _KEY_INDEX, _KEY_INDEX_SOURCE
+    keys = get_cached_emission_keys()
+    if keys is not _KEY_INDEX_SOURCE:
+        start = time.perf_counter()
+        _KEY_INDEX, _KEY_INDEX_SOURCE = EmissionKeyIndex(keys, threshold=80), keys
+        logger.debug("Emission key index built: %d keys in %.1f ms",
+                     len(keys), (time.perf_counter() - start) * 1000)
+    return _KEY_INDEX
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 #  STT SERVICE
 # ─────────────────────────────────────────────────────────────────────────────
@@ -416,19 +297,27 @@ def get_stt_service():
 # ─────────────────────────────────────────────────────────────────────────────
 #  HELPER: HINGLISH TRANSLATION
 # ─────────────────────────────────────────────────────────────────────────────
+# Longest phrase first, whole words only ('pi' must not hit "pizza")
+_HINGLISH_RE = re.compile(
+    r'\b(?:' + '|'.join(re.escape(p) for p in sorted(HINGLISH_MAP, key=len, reverse=True)) + r')\b'
+)
+
+
+@lru_cache(maxsize=4096)
 def apply_hinglish_translation(text: str) -> str:
-    text_lower = text.lower()
-    for phrase in sorted(HINGLISH_MAP.keys(), key=len, reverse=True):
-        if phrase in text_lower:
-            text_lower = text_lower.replace(phrase, HINGLISH_MAP[phrase])
-    return text_lower
+    return _HINGLISH_RE.sub(lambda m: HINGLISH_MAP[m.group(0)], text.lower())
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 #  HELPER: CONTEXT-AWARE QUANTITY EXTRACTION
 #  Finds the number CLOSEST TO a unit keyword for maximum accuracy.
+#  Reads the clause_lexer token stream; pass a lexed clause to skip re-lexing.
 # ─────────────────────────────────────────────────────────────────────────────
-def extract_quantity(text: str) -> tuple:
+_QTY_SKIP = {'kg','km','kwh','gram','g','litre','liter','unit','units',
+             'serving','plate','piece','slice','glass','bowl','cup','a','an'}
+
+
+def extract_quantity(text) -> tuple:
     """
     Returns (quantity: float, inferred: bool).
     inferred=True means nothing was found and 1.0 was assumed.
@@ -441,52 +330,43 @@ def extract_quantity(text: str) -> tuple:
       4. Bare a/an = 1
       5. Fallback 1.0 (inferred)
     """
-    text_lower = text.lower().strip()
-
-    # 0. Written fraction FIRST: "1/2", "3/4", "1/2 kg lpg"
-    frac = re.search(r'(?<!\d)(\d+)\s*/\s*(\d+)(?!\d)', text_lower)
-    if frac:
-        return round(int(frac.group(1)) / int(frac.group(2)), 4), False
-
-    # 1. Number immediately before a multi-char unit keyword
-    unit_pattern = (
-        r'(\d+\.?\d*|\.\d+)\s*'
-        r'(kg|kgs|grams|gram|gm|gms|mg|km|kms|kilometers|kilometres|miles?|'
-        r'kWh|kwh|litres?|liters?|'
-        r'piece|pieces|slice|slices|serving|servings|plate|bowl|cup|glass|'
-        r'hour|hours|hr|hrs)'
-        r'(?![a-z])'
-    )
-    matches = re.findall(unit_pattern, text_lower, re.IGNORECASE)
-    if matches:
-        return float(matches[0][0]), False
-
-    # 1b. Digit immediately followed by bare 'g' (no space): "200g", "0.5g"
-    g_match = re.search(r'(\d+\.?\d*)\s*g(?!r)(?![a-z])', text_lower)
-    if g_match:
-        return float(g_match.group(1)), False
+    clause = as_clause(text)
+    tokens = clause.tokens
+
+    # 0. Written fraction FIRST: "1/2", "3/4", "1/2 kg lpg"  (x/0 is ignored)
+    for tok in tokens:
+        if tok.kind == FRACTION and tok.value is not None:
+            return tok.value, False
+
+    # 1. Number immediately before a multi-char unit keyword (".5 kg" too)
+    for i, tok in enumerate(tokens):
+        if tok.text in QUANTITY_UNITS:
+            num = number_before(clause, i)
+            if num is not None:
+                return num, False
+
+    # 1b. Number immediately followed by bare 'g': "200g", "0.5g"
+    for i, tok in enumerate(tokens):
+        if tok.text == 'g':
+            num = number_before(clause, i, dotted=False)
+            if num is not None:
+                return num, False
 
     # 2. Any standalone number
-    num = re.search(r'(\d+\.\d+|\d+|\.\d+)', text_lower)
-    if num:
-        return float(num.group(1)), False
+    for tok in tokens:
+        if tok.kind == NUMBER:
+            dotted = dotted_value(clause, tok)
+            return (tok.value if dotted is None else dotted), False
 
     # 3. Word numbers (skip unit/article words)
-    SKIP = {'kg','km','kwh','gram','g','litre','liter','unit','units',
-            'serving','plate','piece','slice','glass','bowl','cup','a','an'}
-    words = re.findall(r'\b[a-z]+\b', text_lower)
-    total, found_any = 0.0, False
-    for word in words:
-        if word in SKIP:
-            continue
-        if word in WORD_NUM_DICT:
-            total += WORD_NUM_DICT[word]
-            found_any = True
-    if found_any:
+    nums = [t.value for t in tokens
+            if t.kind == WORDNUM and t.bounded and t.text not in _QTY_SKIP]
+    if nums:
+        total = float(sum(nums))
         return (total if total > 0 else 1.0), False
 
     # 4. Bare article "a"/"an" = 1
-    if re.search(r'\b(a|an)\b', text_lower):
+    if any(t.bounded and t.text in ('a', 'an') for t in tokens):
         return 1.0, False
 
     # 5. Nothing found — assume 1 and flag it
@@ -496,7 +376,10 @@ def extract_quantity(text: str) -> tuple:
 # ─────────────────────────────────────────────────────────────────────────────
 #  HELPER: UNIT DETECTION FROM SENTENCE TEXT
 # ─────────────────────────────────────────────────────────────────────────────
-def detect_unit_from_text(text: str):
+_ENERGY_WORDS = ('electricity', 'bijli', 'power', 'current', 'kwh')
+
+
+def detect_unit_from_text(text):
     """
     Returns canonical unit string if an explicit unit is mentioned, else None.
     Handles:
@@ -504,26 +387,33 @@ def detect_unit_from_text(text: str):
       - 'ml' similarly glued
       - 'units' → kWh only in electricity context (fixes the dual-meaning bug)
     """
-    text_lower = text.lower()
-
-    # Check multi-char aliases first (normal word boundaries work fine)
-    multi_char = [k for k in UNIT_ALIASES if len(k) > 1]
-    for raw in sorted(multi_char, key=len, reverse=True):
-        if re.search(r'\b' + re.escape(raw) + r'\b', text_lower):
-            if raw in ('unit', 'units', 'items', 'item'):
-                energy_words = {'electricity', 'bijli', 'power', 'current', 'kwh'}
-                return 'kWh' if any(w in text_lower for w in energy_words) else 'unit'
-            return UNIT_ALIASES[raw]
-
-    # Single-char 'g' — may be glued to digit (no word boundary): "200g"
-    if re.search(r'(?<!\w)kg\b|\bkg(?=\s|$)|\d\s*kg\b', text_lower):
-        return 'kg'
-    if re.search(r'\d\s*g(?!r)(?![a-z])', text_lower):
-        return 'g'
-    if re.search(r'\d\s*ml\b', text_lower):
-        return 'ml'
-    if re.search(r'\bkm\b', text_lower):
-        return 'km'
+    clause = as_clause(text)
+
+    # Multi-char aliases first (longest-first, whole words — tagged by the lexer)
+    raw = best_unit_alias(clause)
+    if raw:
+        if raw in ('unit', 'units', 'items', 'item'):
+            return 'kWh' if any(w in clause.text for w in _ENERGY_WORDS) else 'unit'
+        return CATALOG.canonical_unit(raw)
+
+    # Short units — 'g' may be glued to a digit (no word boundary): "200g"
+    found = {}
+    for i, tok in enumerate(clause.tokens):
+        if tok.kind != UNIT or tok.text not in ('kg', 'g', 'ml', 'km') or tok.text in found:
+            continue
+        if tok.text == 'kg':
+            hit = tok.bounded or (follows_digit(clause, i) and right_bounded(clause, i))
+        elif tok.text == 'g':
+            hit = follows_digit(clause, i)
+        elif tok.text == 'ml':
+            hit = follows_digit(clause, i) and right_bounded(clause, i)
+        else:
+            hit = tok.bounded
+        if hit:
+            found[tok.text] = True
+    for unit in ('kg', 'g', 'ml', 'km'):
+        if unit in found:
+            return unit
 
     return None
 
@@ -531,7 +421,7 @@ def detect_unit_from_text(text: str):
 def normalize_unit(raw_unit: str) -> str:
     if not raw_unit:
         return ''
-    return UNIT_ALIASES.get(raw_unit.lower().strip(), raw_unit.strip())
+    return CATALOG.canonical_unit(raw_unit.lower().strip(), raw_unit.strip())
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -552,29 +442,74 @@ def normalize_to_base_unit(quantity: float, unit: str) -> tuple:
 def apply_piece_to_kg(key: str, quantity: float, unit: str) -> tuple:
     if unit != 'piece':
         return quantity, unit
-    base = key.lower().split('_')[0]
-    if base in PIECE_TO_KG:
-        return round(quantity * PIECE_TO_KG[base], 4), 'kg'
+    weight = CATALOG.piece_weight(key)
+    if weight is not None:
+        return round(quantity * weight, 4), 'kg'
     return quantity, unit
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 #  HELPER: REMAP AI KEY → EXACT DJANGO ADMIN DB KEY
 # ─────────────────────────────────────────────────────────────────────────────
+@lru_cache(maxsize=2048)
+def _scan_remap_trigger(key_lower: str):
+    """Longest SPECIFIC_KEY_MAP trigger contained in an AI key, or None."""
+    # (key == trigger / trigger == first '_' part both imply containment)
+    for trigger in CATALOG.triggers_longest_first:
+        if trigger in key_lower:
+            return trigger
+    return None
+
+
+# Every key the AI service is known to return → its trigger, resolved once
+_REMAP_EXACT = {
+    key: trigger
+    for key in (
+        *CATALOG.triggers_longest_first,
+        *EMISSION_DEFAULTS,
+        *(CATALOG.trigger_entry(t)[1].lower() for t in CATALOG.triggers_longest_first),
+    )
+    if (trigger := _scan_remap_trigger.__wrapped__(key))
+}
+_REMAP_STATS = {"exact": 0, "scanned": 0}
+_REMAP_LOCK  = threading.Lock()     # remap_ai_key runs on request and AI pool threads
+
+
+def get_remap_cache_stats() -> dict:
+    """Exact-table hits vs substring-scan lookups (and that path's LRU)."""
+    info = _scan_remap_trigger.cache_info()
+    with _REMAP_LOCK:
+        stats = dict(_REMAP_STATS)
+    total = stats["exact"] + stats["scanned"]
+    return {
+        **stats,
+        "lru_hits":   info.hits,
+        "lru_misses": info.misses,
+        "lru_size":   info.currsize,
+        "hit_ratio":  round((stats["exact"] + info.hits) / total, 4) if total else 0.0,
+    }
+
+
 def remap_ai_key(ai_key: str, ai_category: str) -> tuple:
     """
     The AI service returns its own key names that may not match Django admin.
-    This maps them to exact DB keys via SPECIFIC_KEY_MAP.
+    This maps them to exact DB keys via SPECIFIC_KEY_MAP (longest trigger
+    contained in the key wins): one dict lookup for known keys, an LRU'd
+    scan for the rest.
     Returns (db_key, category, natural_unit).
     """
     if not ai_key:
         return ai_key, ai_category, 'unit'
     key_lower = ai_key.lower().strip()
-    for trigger in sorted(SPECIFIC_KEY_MAP.keys(), key=len, reverse=True):
-        if trigger in key_lower or key_lower == trigger or trigger == key_lower.split('_')[0]:
-            cat, db_key, nat_unit = SPECIFIC_KEY_MAP[trigger]
-            logger.debug("AI key remapped: '%s' → '%s' (%s)", ai_key, db_key, cat)
-            return db_key, cat, nat_unit
+    trigger = _REMAP_EXACT.get(key_lower)
+    with _REMAP_LOCK:
+        _REMAP_STATS["exact" if trigger is not None else "scanned"] += 1
+    if trigger is None:
+        trigger = _scan_remap_trigger(key_lower)
+    if trigger:
+        cat, db_key, nat_unit = CATALOG.trigger_entry(trigger)
+        logger.debug("AI key remapped: '%s' → '%s' (%s)", ai_key, db_key, cat)
+        return db_key, cat, nat_unit
     return ai_key, ai_category, 'unit'
 
 
@@ -590,30 +525,23 @@ def fallback_classify(text: str) -> tuple:
       3. DB fuzzy key search (5-min cached)
       4. Generic category fallback
     """
-    text_translated = apply_hinglish_translation(text)
-    text_lower      = text_translated.lower()
-    words           = re.findall(r'\b[a-z]+\b', text_lower)
-    quantity, qty_inferred = extract_quantity(text_lower)
-    detected_unit   = detect_unit_from_text(text_lower)
-
-    # ── STEP 1: SPECIFIC_KEY_MAP ─────────────────────────────────────────────
-    for trigger in sorted(SPECIFIC_KEY_MAP.keys(), key=len, reverse=True):
-        if re.search(r'\b' + re.escape(trigger) + r'\b', text_lower):
-            category, db_key, natural_unit = SPECIFIC_KEY_MAP[trigger]
-            unit = detected_unit if detected_unit else natural_unit
-            logger.debug("SPECIFIC_KEY_MAP: trigger='%s' → %s / %s / %s",
-                         trigger, category, db_key, unit)
-            return category, db_key, quantity, unit, qty_inferred
-
-    # ── STEP 2: Category keyword scoring ────────────────────────────────────
-    scores = {cat: 0 for cat in CATEGORY_KEYWORDS}
-    for cat, keywords in CATEGORY_KEYWORDS.items():
-        for word in words:
-            if word in EXCLUDED_FROM_SCORING:
-                continue
-            for kw in keywords:
-                if fuzz.ratio(word, kw) >= 82:
-                    scores[cat] += 1
+    clause          = lex_clause(apply_hinglish_translation(text))
+    text_lower      = clause.text
+    words           = clause_words(clause)
+    quantity, qty_inferred = extract_quantity(clause)
+    detected_unit   = detect_unit_from_text(clause)
+
+    # ── STEP 1: SPECIFIC_KEY_MAP (tagged by the lexer, longest-first) ───────
+    trigger = best_trigger(clause)
+    if trigger:
+        category, db_key, natural_unit = CATALOG.trigger_entry(trigger)
+        unit = detected_unit if detected_unit else natural_unit
+        logger.debug("SPECIFIC_KEY_MAP: trigger='%s' → %s / %s / %s",
+                     trigger, category, db_key, unit)
+        return category, db_key, quantity, unit, qty_inferred
+
+    # ── STEP 2: Category keyword scoring (indexed fuzzy match) ─────────────
+    scores = CATEGORY_INDEX.scores(words)
 
     best_cat = max(scores, key=scores.get)
     if scores[best_cat] == 0:
@@ -622,19 +550,8 @@ def fallback_classify(text: str) -> tuple:
     DEFAULT_UNITS = {'FOOD': 'kg', 'TRANSPORT': 'km', 'ENERGY': 'kWh', 'WASTE': 'kg'}
     unit = detected_unit or DEFAULT_UNITS.get(best_cat, 'unit')
 
-    # ── STEP 3: DB fuzzy key search (cached) ────────────────────────────────
-    found_key, best_score = None, 0
-    for db_key in get_cached_emission_keys():
-        clean = db_key.lower().replace('_', ' ')
-        if clean in text_lower:
-            found_key = db_key
-            break
-        for word in words:
-            for part in [p for p in clean.split() if len(p) > 2]:
-                score = fuzz.ratio(word, part)
-                if score > best_score and score >= 80:
-                    best_score = score
-                    found_key  = db_key
+    # ── STEP 3: DB fuzzy key search (trigram-indexed) ───────────────────────
+    found_key = get_emission_key_index().find(text_lower, words)
 
     # ── STEP 4: Generic fallback ─────────────────────────────────────────────
     if not found_key:
@@ -647,85 +564,419 @@ def fallback_classify(text: str) -> tuple:
     return best_cat, found_key, quantity, unit, qty_inferred
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+#  CLASSIFICATION CACHE
+#  Whole-clause fallback_classify results keyed by the lowercased clause
+#  (the classifier lowercases first, so case never changes the answer).
+#  Dropped whenever the emission key index is rebuilt, because step 3 reads
+#  the key list; everything else it uses is static.
+# ─────────────────────────────────────────────────────────────────────────────
+CLASSIFY_CACHE = LRUCache(
+    maxsize=config("CLASSIFY_CACHE_SIZE", default=4096, cast=int),
+    ttl=config("CLASSIFY_CACHE_TTL", default=3600, cast=int),
+)
+_CLASSIFY_CACHE_INDEX = None   # key index the cached results were computed with
+
+
+def cached_fallback_classify(text: str) -> tuple:
+    global _CLASSIFY_CACHE_INDEX
+    index = get_emission_key_index()
+    if index is not _CLASSIFY_CACHE_INDEX:
+        CLASSIFY_CACHE.clear()
+        _CLASSIFY_CACHE_INDEX = index
+
+    cache_key = text.lower()
+    result = CLASSIFY_CACHE.get(cache_key)
+    if result is None:
+        result = fallback_classify(text)
+        CLASSIFY_CACHE.set(cache_key, result)
+    return result
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 #  TEXT NORMALIZER
+#  Every pattern is compiled once here; ACTION_VERBS is static.
 # ─────────────────────────────────────────────────────────────────────────────
+_VERB_ALT = '|'.join(re.escape(v) for v in ACTION_VERBS)
+
+_BULLET_RE      = re.compile(r'^\s*[-•*]\s+', re.MULTILINE)
+_HINDI_AND_RE   = re.compile(r'\b(?:aur|tatha)\b', re.IGNORECASE)   # 'and' / 'and also'
+_AND_I_RE       = re.compile(r'\band\s+i\b', re.IGNORECASE)
+_AND_VERB_RE    = re.compile(r'\band\s+(' + _VERB_ALT + r')\b', re.IGNORECASE)
+_CONNECTIVE_RE  = re.compile(
+    r'\b(and then|and also|after that|then i|then|also|moreover|additionally)\b',
+    re.IGNORECASE,
+)
+_OR_VERB_RE     = re.compile(r'\bor\s+(?=(?:i\s+)?(?:' + _VERB_ALT + r')\b)', re.IGNORECASE)
+_COMMA_WORD_RE  = re.compile(r',\s*(?=[a-zA-Z])')
+_DOTS_RE        = re.compile(r'\.{2,}')
+_SPACES_RE      = re.compile(r'\s{2,}')
+
+# Clause splitting: before a verb, then before a leading quantity
+_VERB_SPLIT_RE  = re.compile(
+    r'\s*(?:,| and | or )\s*(?=(?:i\s+)?(?:' + _VERB_ALT + r')\b)', re.IGNORECASE,
+)
+_QTY_SPLIT_RE   = re.compile(
+    r'\s+(?:and|or)\s+(?=(?:\d+(?:\.\d+)?|\.\d+|a|an|one|two|three|four|five|six|seven|eight|nine|ten)\b)',
+    re.IGNORECASE,
+)
+
+
 def normalize_input_text(raw: str) -> str:
     text = raw.strip()
     text = text.replace('\r\n', '. ').replace('\n', '. ').replace('\r', '. ')
-    text = re.sub(r'^\s*[-•*]\s+', '', text, flags=re.MULTILINE)
+    text = _BULLET_RE.sub('', text)
     text = text.replace(';', '.').replace(' / ', '. ')
     # Hindi/Hinglish conjunctions → sentence boundary
-    text = re.sub(r'\baur\b', ' . ', text, flags=re.IGNORECASE)   # Hindi 'and'
-    text = re.sub(r'\btatha\b', ' . ', text, flags=re.IGNORECASE) # Hindi 'and also'
-    text = re.sub(r'\band\s+i\b', '. I', text, flags=re.IGNORECASE)
-    text = re.sub(
-        r'\band\s+(used|use|ate|eat|had|drink|drank|drunk|drove|drive|took|take|'
-        r'travelled|traveled|travel|rode|ride|flew|fly|walked|walk|cooked|cook|'
-        r'burned|burnt|burn|charged|charge|consumed|consume|wasted|waste|threw|throw|'
-        r'bought|buy|purchased|purchase|ordered|order)\b',
-        r'. \1', text, flags=re.IGNORECASE
-    )
-    text = re.sub(
-        r'\b(and then|and also|after that|then i|then|also|moreover|additionally)\b',
-        '. ', text, flags=re.IGNORECASE
-    )
-    text = re.sub(
-        r'\bor\s+(?=(?:i\s+)?(?:' + '|'.join(ACTION_VERBS) + r')\b)',
-        '. ', text, flags=re.IGNORECASE
-    )
-    text = re.sub(r',\s*(?=[a-zA-Z])', '. ', text)
-    text = re.sub(r'\.{2,}', '.', text)
-    text = re.sub(r'\s{2,}', ' ', text)
+    text = _HINDI_AND_RE.sub(' . ', text)
+    text = _AND_I_RE.sub('. I', text)
+    text = _AND_VERB_RE.sub(r'. \1', text)
+    text = _CONNECTIVE_RE.sub('. ', text)
+    text = _OR_VERB_RE.sub('. ', text)
+    text = _COMMA_WORD_RE.sub('. ', text)
+    text = _DOTS_RE.sub('.', text)
+    text = _SPACES_RE.sub(' ', text)
     return text.strip()
 
 
 def split_activity_clauses(text: str):
     """
     Break normalized text into atomic activity clauses so numbers stay tied to
-    the correct entity.
+    the correct entity.  Yields clauses lazily, in order.
     """
-    fragments = [frag.strip(" .") for frag in nltk.tokenize.sent_tokenize(text) if frag.strip(" .")]
-    clauses = []
-    verb_pattern = '|'.join(re.escape(v) for v in ACTION_VERBS)
-
-    for fragment in fragments:
-        parts = re.split(
-            r'\s*(?:,| and | or )\s*(?=(?:i\s+)?(?:' + verb_pattern + r')\b)',
-            fragment,
-            flags=re.IGNORECASE,
-        )
-        for part in parts:
-            subparts = re.split(
-                r'\s+(?:and|or)\s+(?=(?:\d+(?:\.\d+)?|\.\d+|a|an|one|two|three|four|five|six|seven|eight|nine|ten)\b)',
-                part,
-                flags=re.IGNORECASE,
-            )
-            for subpart in subparts:
+    for fragment in get_sentence_splitter()(text):
+        fragment = fragment.strip(" .")
+        if not fragment:
+            continue
+        for part in _VERB_SPLIT_RE.split(fragment):
+            for subpart in _QTY_SPLIT_RE.split(part):
                 clean = subpart.strip(" .")
                 if len(clean) > 2:
-                    clauses.append(clean)
+                    yield clean
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  AI EXTRACTION
+#  AI_BATCH_MODE: all clauses of a request go to the AI service in one call,
+#  each tagged with its index; results come back tagged the same way.  A
+#  batch that fails (5xx, model error, connection error) is not retried:
+#  every clause goes to the local fallback classifier.
+#  Otherwise — or if the AI service does not support batches (HTTP 400, 404
+#  or 405) — clauses are sent concurrently through a process-wide pool of
+#  AI_MAX_WORKERS threads.
+#  Whatever has no answer by AI_REQUEST_DEADLINE seconds is None, and that
+#  clause goes to the local fallback classifier.  No call outlives the
+#  deadline: each is sent with its timeout capped at the time left, and a
+#  clause still queued when the deadline passes is never sent.
+#  All calls share one keep-alive session behind a circuit breaker: while it
+#  is open they fail at once and every clause is classified locally.
+#  Clauses already in AI_CACHE (memory → SQLite) skip the AI service.
+#  Hedged mode (AI_LATENCY_BUDGET_MS) runs the local classifier while the AI
+#  call is in flight; the budget is then the deadline for the AI work, so
+#  nothing is left running for a request that has already been answered.
+# ─────────────────────────────────────────────────────────────────────────────
+AI_POOL = ThreadPoolExecutor(max_workers=AI_MAX_WORKERS, thread_name_prefix="ai-extract")
+AI_HEDGE_POOL = ThreadPoolExecutor(max_workers=AI_MAX_WORKERS, thread_name_prefix="ai-hedge")
+_HEDGE_STATS = {"requests": 0, "ai_on_time": 0, "ai_late": 0, "dropped": 0}
+_HEDGE_LOCK  = threading.Lock()     # request threads update _HEDGE_STATS concurrently
+_HEDGE_GRACE = 0.05                 # lets AI work that stopped at the budget hand back its results
+AI_CLIENT = AIServiceClient(
+    AI_SERVICE_URL,
+    pool_size=AI_MAX_WORKERS,
+    breaker=CircuitBreaker(
+        failure_threshold=AI_BREAKER_FAILURES,
+        slow_after=AI_BREAKER_SLOW,
+        cooldown=AI_BREAKER_COOLDOWN,
+    ),
+)
+AI_CACHE = AIExtractionCache(
+    AI_CACHE_PATH,
+    version=AI_PROMPT_VERSION,
+    ttl=AI_CACHE_TTL,
+    max_entries=AI_CACHE_MAX_ENTRIES,
+    memory_size=AI_CACHE_MEMORY_SIZE,
+) if AI_CACHE_ENABLED else None
+
+
+def fetch_ai_analysis(clean_text: str, username: str, timeout: float = None):
+    """One clause → the AI service's first extraction dict, or None."""
+    try:
+        ai_resp = AI_CLIENT.post(
+            {"username": username, "input_text": clean_text},
+            timeout=AI_CALL_TIMEOUT if timeout is None else timeout,
+        )
+        if ai_resp.status_code == 200:
+            extracted = ai_resp.json().get("extracted", [])
+            if isinstance(extracted, dict):
+                extracted = [extracted]
+            if isinstance(extracted, list) and extracted:
+                if AI_CACHE:
+                    AI_CACHE.set(clean_text, extracted)
+                return extracted[0]
+    except Exception as e:
+        logger.debug("AI service unavailable: %s", e)
+    return None
+
+
+class AIBatchError(Exception):
+    """The batched call produced no usable response at all."""
+
+
+class AIBatchUnsupported(AIBatchError):
+    """The AI service rejected the batched payload (an older /analyze)."""
+
+
+# Statuses an /analyze without batch support answers a "clauses" payload with
+_BATCH_UNSUPPORTED = (400, 404, 405)
+
+
+def fetch_ai_analysis_batch(clauses: list, username: str, timeout: float) -> list:
+    """
+    One call for every clause → the first extraction per clause index, in
+    clause order; None for clauses the AI service returned nothing for.
+    """
+    try:
+        ai_resp = AI_CLIENT.post(
+            {
+                "username": username,
+                "clauses":  [{"index": i, "text": text} for i, text in enumerate(clauses)],
+            },
+            timeout=timeout,
+        )
+    except AIServiceUnavailable:
+        logger.debug("AI circuit open — classifying %d clause(s) locally", len(clauses))
+        return [None] * len(clauses)
+    except requests.Timeout:
+        logger.warning("Batched AI call timed out after %.1fs", timeout)
+        return [None] * len(clauses)
+    except requests.RequestException as e:
+        raise AIBatchError(e)
+    if ai_resp.status_code in _BATCH_UNSUPPORTED:
+        raise AIBatchUnsupported(f"HTTP {ai_resp.status_code}")
+    if ai_resp.status_code != 200:
+        raise AIBatchError(f"HTTP {ai_resp.status_code}")
 
-    return clauses
+    try:
+        body = ai_resp.json()
+        if body.get("error"):
+            raise AIBatchError(body["error"])
+        extracted = body.get("extracted", [])
+    except (ValueError, AttributeError) as e:
+        raise AIBatchError(e)
+    if isinstance(extracted, dict):
+        extracted = [extracted]
+
+    per_clause = [[] for _ in clauses]
+    for item in extracted if isinstance(extracted, list) else []:
+        if not isinstance(item, dict):
+            continue
+        index = item.get("index")
+        if isinstance(index, int) and 0 <= index < len(clauses):
+            per_clause[index].append(item)
+    if AI_CACHE:
+        for text, items in zip(clauses, per_clause):
+            AI_CACHE.set(text, items)
+    results = [items[0] if items else None for items in per_clause]
+    missing = results.count(None)
+    if missing:
+        logger.debug("Batched AI call: no result for %d of %d clause(s)", missing, len(clauses))
+    return results
+
+
+def fetch_ai_analyses(clauses: list, username: str, until: float = None) -> list:
+    """
+    AI results for every clause, in clause order; None where it failed or was
+    late.  `until` is the time.monotonic() deadline (default: AI_REQUEST_DEADLINE
+    from now).
+    """
+    with stage('ai'):
+        results = [None] * len(clauses)
+        pending = []
+        for i, text in enumerate(clauses):
+            hit = AI_CACHE.get(text) if AI_CACHE else None
+            if hit:
+                results[i] = hit[0]
+            else:
+                pending.append(i)
+        if AI_CACHE:
+            metrics.count(metrics.AI_CACHE_LOOKUPS, 'hit', len(clauses) - len(pending))
+            metrics.count(metrics.AI_CACHE_LOOKUPS, 'miss', len(pending))
+        if pending:
+            fetched = _fetch_ai_uncached([clauses[i] for i in pending], username, until)
+            for i, analysis in zip(pending, fetched):
+                results[i] = analysis
+        return results
+
+
+def _fetch_ai_uncached(clauses: list, username: str, until: float = None) -> list:
+    if until is None:
+        until = time.monotonic() + AI_REQUEST_DEADLINE
+    deadline = until - time.monotonic()
+    if deadline <= 0:
+        return [None] * len(clauses)
+    if AI_BATCH_MODE and len(clauses) > 1:
+        try:
+            return fetch_ai_analysis_batch(clauses, username, deadline)
+        except AIBatchUnsupported as e:
+            logger.warning("Batched AI call unsupported (%s) — sending clauses one by one", e)
+        except AIBatchError as e:
+            logger.warning("Batched AI call failed (%s) — classifying %d clause(s) locally",
+                           e, len(clauses))
+            return [None] * len(clauses)
+
+    futures = [AI_POOL.submit(_fetch_ai_clause_until, text, username, until) for text in clauses]
+    _, late = wait(futures, timeout=max(0.0, until - time.monotonic()))
+    if late:
+        for future in late:
+            future.cancel()     # drops it if it never started
+        logger.warning("AI deadline (%.1fs) missed for %d of %d clause(s) — using fallback",
+                       deadline, len(late), len(clauses))
+    return [None if f in late else f.result() for f in futures]
+
+
+def _fetch_ai_clause_until(clean_text: str, username: str, until: float):
+    """fetch_ai_analysis with its timeout capped at `until`; None once that has passed."""
+    remaining = until - time.monotonic()
+    if remaining <= 0:
+        return None
+    return fetch_ai_analysis(clean_text, username, timeout=min(AI_CALL_TIMEOUT, remaining))
+
+
+def fetch_ai_analyses_hedged(clauses: list, username: str, budget: float) -> tuple:
+    """
+    fetch_ai_analyses raced against the local classifier: returns
+    (AI results, local results).  The `budget` seconds are the AI deadline —
+    clauses AI has not answered by then are None, and no AI call outlives it.
+    """
+    until  = time.monotonic() + budget
+    future = AI_HEDGE_POOL.submit(fetch_ai_analyses, clauses, username, until)
+    with stage('fallback'):
+        local = [cached_fallback_classify(text) for text in clauses]
+    try:
+        analyses = future.result(timeout=max(0.0, until + _HEDGE_GRACE - time.monotonic()))
+        outcome, dropped = "ai_on_time", False
+    except FutureTimeout:
+        analyses = [None] * len(clauses)
+        # Still queued behind other requests' calls — drop it
+        outcome, dropped = "ai_late", future.cancel()
+        logger.info("AI missed the %.0f ms budget — answering %d clause(s) locally",
+                    budget * 1000, len(clauses))
+    with _HEDGE_LOCK:
+        _HEDGE_STATS["requests"] += 1
+        _HEDGE_STATS[outcome]    += 1
+        _HEDGE_STATS["dropped"]  += dropped
+    return analyses, local
+
+
+def get_hedge_stats() -> dict:
+    """A consistent copy of the hedged-request counters."""
+    with _HEDGE_LOCK:
+        return dict(_HEDGE_STATS)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 #  CORE PROCESSING ENGINE
 # ─────────────────────────────────────────────────────────────────────────────
 def process_text_to_carbon(input_text: str, user_obj):
+    body = build_activity_result(input_text, user_obj, ai_budget=AI_LATENCY_BUDGET_MS / 1000)
+    return Response(body, status=status.HTTP_201_CREATED)
+
+
+def build_activity_result(input_text: str, user_obj, ai_budget: float = 0,
+                          doc_id_prefix: str = None) -> dict:
+    """
+    Runs the full pipeline and saves the logs; returns the response body.
+    With `doc_id_prefix` every log gets the Cloudant _id "<prefix>:<clause
+    index>", so running the same input again (a retried job) cannot save a
+    clause twice.
+    """
     username         = user_obj.username
+    timer            = metrics.stage_timer()
     normalized_text  = normalize_input_text(input_text)
-    sentences        = split_activity_clauses(normalized_text)
+    timer.lap('normalize')
+    sentences        = list(split_activity_clauses(normalized_text))
+    timer.lap('split')
     logger.info("Processing %d activity clause(s) for user '%s'", len(sentences), username)
 
     logged_activities = []
-    failed_sentences  = []
-    global_warnings   = []
     total_co2         = 0.0
     batch_id          = f"batch_{int(time.time())}"
 
-    for sentence in sentences:
-        clean_text = sentence.strip()
+    sentences = [sentence.strip() for sentence in sentences]
+    docs      = build_activity_docs(sentences, user_obj, batch_id, ai_budget=ai_budget, timer=timer)
+    timer.flush()
+    if doc_id_prefix:
+        for index, doc in enumerate(docs):
+            if doc is not None:
+                doc["_id"] = f"{doc_id_prefix}:{index}"
+    failed_sentences = [f"{text} (Not Recognized)" for text, doc in zip(sentences, docs) if doc is None]
+    global_warnings  = [w for doc in docs if doc for w in doc["confidence"]["warnings"]]
+
+    for cloudant_doc in filter(None, docs):
+        key, co2e = cloudant_doc["key"], cloudant_doc["co2e"]
+
+        # ── J. Save — add to total ONLY on successful save ───────────────────
+        try:
+            with stage('save'):
+                saved = save_activity_log(cloudant_doc)
+            if saved is False:
+                metrics.count(metrics.CLOUDANT_ERRORS, 'save')
+            total_co2 += co2e   # FIX: counted AFTER save, not before
+            cloudant_doc['id'] = f"temp_{cloudant_doc['timestamp']}_{len(logged_activities)}"
+            logged_activities.append(cloudant_doc)
+            logger.info("Saved: %s → %.4f kg CO₂e (verified=%s)", key, co2e, cloudant_doc["is_verified"])
+        except Exception as e:
+            logger.error("Cloudant save failed for '%s': %s", key, e)
+            metrics.count(metrics.CLOUDANT_ERRORS, 'save')
+            failed_sentences.append(f"{cloudant_doc['input_text']} (Save Failed)")
+
+    return {
+        "status":           "success",
+        "transcript":       input_text,
+        "logs_count":       len(logged_activities),
+        "total_co2e_kg":    round(total_co2, 4),
+        "activities":       logged_activities,
+        "failed_sentences": failed_sentences,
+        "warnings":         global_warnings,
+        # Which classifier answered: "ai" (AI service / AI cache) or "local"
+        "tiers":            dict(Counter(doc["confidence"]["tier"] for doc in logged_activities)),
+        "message": (
+            f"Processed {len(logged_activities)} "
+            f"activit{'y' if len(logged_activities) == 1 else 'ies'}"
+            + (f", {len(failed_sentences)} skipped." if failed_sentences else ".")
+        ),
+    }
+
+
+def build_activity_docs(sentences: list, user_obj, batch_id: str, timestamps=None,
+                        use_ai: bool = True, ai_budget: float = 0, timer=None) -> list:
+    """
+    Steps A–I for a list of clean clauses: one Cloudant doc per clause, in
+    order, or None where the clause was not recognized.  Nothing is saved.
+    `timestamps` optionally gives each clause its own epoch-ms base time
+    (bulk imports of dated entries); by default all clauses are logged now.
+    With `ai_budget` (seconds) the AI call is hedged by the local classifier.
+    Stage timings go to the caller's metrics `timer` (flushed by the caller),
+    else to one of its own.
+    """
+    own_timer  = timer is None
+    timer      = metrics.stage_timer() if own_timer else timer
+    username   = user_obj.username
+    recognized = []
+    now_ms     = int(time.time() * 1000)
+    fallback_s = 0.0    # summed over clauses, recorded once per request
+    fallbacks  = 0      # clauses the local classifier answered (or failed)
+
+    # ── A. AI Service — every clause at once, one deadline for the request ──
+    local = None
+    if not use_ai:
+        analyses = [None] * len(sentences)
+    elif ai_budget:
+        analyses, local = fetch_ai_analyses_hedged(sentences, username, ai_budget)
+    else:
+        analyses = fetch_ai_analyses(sentences, username)
+
+    for index, (clean_text, analysis_results) in enumerate(zip(sentences, analyses)):
         logger.debug("Processing: '%s'", clean_text)
 
         activity_type  = 'Unknown'
@@ -733,23 +984,7 @@ def process_text_to_carbon(input_text: str, user_obj):
         quantity       = 0.0
         unit           = None
         qty_inferred   = False
-        analysis_results = None
-
-        # ── A. Try AI Service ────────────────────────────────────────────────
-        try:
-            ai_resp = requests.post(
-                AI_SERVICE_URL,
-                json={"username": username, "input_text": clean_text},
-                timeout=5,
-            )
-            if ai_resp.status_code == 200:
-                extracted = ai_resp.json().get("extracted", [])
-                if isinstance(extracted, list) and extracted:
-                    analysis_results = extracted[0]
-                elif isinstance(extracted, dict):
-                    analysis_results = extracted
-        except Exception as e:
-            logger.debug("AI service unavailable: %s", e)
+        tier           = 'ai'
 
         # ── B. Parse + remap AI result ───────────────────────────────────────
         if analysis_results and "error" not in analysis_results:
@@ -765,23 +1000,30 @@ def process_text_to_carbon(input_text: str, user_obj):
             except (ValueError, TypeError):
                 parsed_qty = 0
 
+            clause = lex_clause(clean_text)
             quantity, qty_inferred = (parsed_qty, False) if parsed_qty > 0 \
-                                     else extract_quantity(clean_text)
+                                     else extract_quantity(clause)
 
-            detected = detect_unit_from_text(clean_text)
+            detected = detect_unit_from_text(clause)
             unit = detected or normalize_unit(analysis_results.get('unit', '')) or nat_unit
             logger.debug("AI: type=%s key=%s qty=%s unit=%s", activity_type, key, quantity, unit)
 
         # ── C. Local fallback ────────────────────────────────────────────────
         if activity_type == 'Unknown' or not key:
             logger.debug("Falling back to local classifier")
-            activity_type, key, quantity, unit, qty_inferred = fallback_classify(clean_text)
+            if local:
+                activity_type, key, quantity, unit, qty_inferred = local[index]
+            else:
+                started = time.perf_counter()
+                activity_type, key, quantity, unit, qty_inferred = cached_fallback_classify(clean_text)
+                fallback_s += time.perf_counter() - started
+            tier = 'local'
+            fallbacks += 1
             logger.debug("Fallback: type=%s key=%s qty=%s unit=%s", activity_type, key, quantity, unit)
 
         # ── D. Skip if unrecognized ──────────────────────────────────────────
         if activity_type == 'Unknown' or not key:
             logger.info("Unrecognized, skipping: '%s'", clean_text)
-            failed_sentences.append(f"{clean_text} (Not Recognized)")
             continue
 
         # ── E. Quantity safety net ───────────────────────────────────────────
@@ -799,15 +1041,38 @@ def process_text_to_carbon(input_text: str, user_obj):
         if qty_inferred:
             msg = f"Quantity assumed as 1 for '{clean_text}' — please specify for accuracy"
             activity_warnings.append(msg)
-            global_warnings.append(msg)
             logger.warning(msg)
 
-        # ── H. Calculate CO₂e ────────────────────────────────────────────────
-        co2e, is_verified = calculate_co2e(key, quantity, unit, request_user=user_obj)
+        recognized.append(
+            (index, clean_text, activity_type, key, quantity, unit, qty_inferred, activity_warnings, tier)
+        )
+
+    if fallback_s:
+        timer.add('fallback', fallback_s)
+    unrecognized = len(sentences) - len(recognized)     # every one fell back first
+    metrics.count_clauses(len(recognized) - fallbacks + unrecognized,
+                          fallbacks - unrecognized, unrecognized)
+
+    # ── H. Calculate CO₂e for every clause in one batch (one DB query) ───────
+    timer.mark()
+    results = calculate_co2e_many(
+        ((key, quantity, unit, user_obj)
+         for _, _, _, key, quantity, unit, _, _, _ in recognized),
+        with_factor=True,
+    )
+    timer.lap('calculate')
+    if own_timer:
+        timer.flush()
+
+    docs = [None] * len(sentences)
+    for position, ((index, clean_text, activity_type, key, quantity, unit, qty_inferred,
+                    activity_warnings, tier), (co2e, is_verified, factor)) \
+            in enumerate(zip(recognized, results)):
 
         # ── I. Unique timestamp per activity ─────────────────────────────────
         # FIX: milliseconds + index guarantees uniqueness within a batch
-        activity_ts = int(time.time() * 1000) + len(logged_activities)
+        base_ts     = timestamps[index] if timestamps and timestamps[index] else now_ms
+        activity_ts = base_ts + position
 
         cloudant_doc = {
             "username":        username,
@@ -822,38 +1087,200 @@ def process_text_to_carbon(input_text: str, user_obj):
             "date_readable":   time.strftime('%Y-%m-%d %H:%M:%S',
                                              time.localtime(activity_ts / 1000)),
             "source_group_id": batch_id,
+            # Factor stamp — lets recompute_co2e find logs built on a stale factor
+            "factor_id":       factor.factor_id,
+            "factor_version":  factor.version,
+            "factor_value":    factor.value,
             "confidence": {
                 "source":       "db_verified" if is_verified else ("db" if co2e > 0 else "defaults"),
                 "qty_inferred": qty_inferred,
                 "warnings":     activity_warnings,
+                "tier":         tier,
             },
         }
+        docs[index] = cloudant_doc
 
-        # ── J. Save — add to total ONLY on successful save ───────────────────
+    return docs
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  ASYNC JOBS
+#  The log endpoints can queue the pipeline instead of running it in the
+#  request: the client gets 202 + a job id at once and polls
+#  /api/jobs/<id>/ for the same body the synchronous call would return.
+# ─────────────────────────────────────────────────────────────────────────────
+def transcribe_audio(audio, content_type: str = 'audio/webm') -> str:
+    with stage('stt'):
+        result = get_stt_service().recognize(
+            audio=audio, content_type=content_type, model='en-US_Multimedia',
+        ).get_result()
+    return " ".join(
+        r['alternatives'][0]['transcript'] for r in result.get('results', [])
+    ).strip()
+
+
+def run_activity_job(job) -> tuple:
+    """Job handler: (response body, HTTP status) of the equivalent synchronous call."""
+    input_text = job.input_text
+    if job.kind == 'audio':
         try:
-            save_activity_log(cloudant_doc)
-            total_co2 += co2e   # FIX: counted AFTER save, not before
-            cloudant_doc['id'] = f"temp_{activity_ts}_{len(logged_activities)}"
-            logged_activities.append(cloudant_doc)
-            logger.info("Saved: %s → %.4f kg CO₂e (verified=%s)", key, co2e, is_verified)
+            input_text = transcribe_audio(io.BytesIO(bytes(job.audio or b'')),
+                                          job.audio_content_type or 'audio/webm')
         except Exception as e:
-            logger.error("Cloudant save failed for '%s': %s", key, e)
-            failed_sentences.append(f"{clean_text} (Save Failed)")
+            logger.error("STT error: %s", traceback.format_exc())
+            return {"message": f"Transcription Error: {str(e)}"}, status.HTTP_500_INTERNAL_SERVER_ERROR
+        if not input_text:
+            return {"message": "No speech detected."}, status.HTTP_400_BAD_REQUEST
+        logger.info("STT transcript for '%s': '%s'", job.user.username, input_text)
+    # A stale job is re-run from scratch: deterministic doc ids keep the
+    # clauses its first attempt already saved from being logged twice
+    result = build_activity_result(input_text, job.user, doc_id_prefix=f"job_{job.pk}")
+    return result, status.HTTP_201_CREATED
+
+
+JOB_POOL = JobWorkerPool(
+    run_activity_job,
+    workers=JOB_WORKERS,
+    poll_interval=JOB_POLL_INTERVAL,
+    stale_after=JOB_STALE_AFTER,
+    max_attempts=JOB_MAX_ATTEMPTS,
+    retention=JOB_RETENTION,
+)
+
+
+def _request_fields(request) -> dict:
+    """request.data when it is an object; {} for a JSON list / string body."""
+    return request.data if isinstance(request.data, dict) else {}
 
+
+def _wants_async(request) -> bool:
+    flag = request.query_params.get('async', _request_fields(request).get('async'))
+    if flag is None:
+        return LOG_ACTIVITY_ASYNC
+    return str(flag).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def enqueue_activity_job(request, **fields):
+    job = ActivityJob.objects.create(user=request.user, **fields)
+    JOB_POOL.start()
+    JOB_POOL.notify()
+    logger.info("Queued %s job %s for user '%s'", job.kind, job.pk, request.user.username)
     return Response({
-        "status":           "success",
-        "transcript":       input_text,
-        "logs_count":       len(logged_activities),
-        "total_co2e_kg":    round(total_co2, 4),
-        "activities":       logged_activities,
-        "failed_sentences": failed_sentences,
-        "warnings":         global_warnings,
-        "message": (
-            f"Processed {len(logged_activities)} "
-            f"activit{'y' if len(logged_activities) == 1 else 'ies'}"
-            + (f", {len(failed_sentences)} skipped." if failed_sentences else ".")
-        ),
-    }, status=status.HTTP_201_CREATED)
+        "status":     "queued",
+        "job_id":     str(job.pk),
+        "status_url": request.build_absolute_uri(reverse('job_status_api', args=[job.pk])),
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  BULK IMPORT
+#  Uploaded rows are processed BULK_CHUNK_ROWS at a time: every clause of a
+#  chunk goes through one AI call and one calculate_co2e_many query, and the
+#  resulting logs are written with one _bulk_docs request.  Progress and
+#  per-row errors are streamed back as NDJSON while the import runs.
+# ─────────────────────────────────────────────────────────────────────────────
+def import_rows_chunk(rows: list, user_obj, batch_id: str, use_ai: bool = True) -> dict:
+    """Processes and saves one chunk of ImportRows; returns counts and row errors."""
+    errors = [{"row": row.number, "error": row.error} for row in rows if row.error]
+    clauses, clause_rows, timestamps = [], [], []
+    for row in rows:
+        if row.error:
+            continue
+        row_clauses = [c.strip() for c in split_activity_clauses(normalize_input_text(row.text))]
+        if not row_clauses:
+            errors.append({"row": row.number, "error": "No activity found"})
+        clauses.extend(row_clauses)
+        clause_rows.extend([row.number] * len(row_clauses))
+        timestamps.extend([row.timestamp] * len(row_clauses))
+
+    docs = build_activity_docs(clauses, user_obj, batch_id, timestamps=timestamps, use_ai=use_ai)
+    errors.extend(
+        {"row": number, "clause": text, "error": "Not Recognized"}
+        for number, text, doc in zip(clause_rows, clauses, docs) if doc is None
+    )
+
+    to_save = [(number, doc) for number, doc in zip(clause_rows, docs) if doc is not None]
+    with stage('bulk_save'):
+        saved = save_activity_logs_bulk([doc for _, doc in to_save])
+    logged, total_co2 = 0, 0.0
+    for (number, doc), (ok, error) in zip(to_save, saved):
+        if ok:
+            logged += 1
+            total_co2 += doc["co2e"]
+        else:
+            errors.append({"row": number, "clause": doc["input_text"],
+                           "error": f"Save Failed: {error}"})
+            metrics.count(metrics.CLOUDANT_ERRORS, 'bulk_save')
+
+    errors.sort(key=lambda e: e["row"])
+    return {"clauses": len(clauses), "logged": logged, "co2e": total_co2, "errors": errors}
+
+
+def stream_bulk_import(rows, user_obj, fmt: str, use_ai: bool = True):
+    """Runs an import chunk by chunk, yielding NDJSON progress / error / done lines."""
+    batch_id = f"import_{int(time.time())}"
+    totals   = {"rows": 0, "clauses": 0, "logged": 0, "errors": 0, "total_co2e_kg": 0.0}
+    start    = time.monotonic()
+
+    def line(event, **fields):
+        return json.dumps({"event": event, **fields}, default=str) + "\n"
+
+    yield line("start", format=fmt, chunk_rows=BULK_CHUNK_ROWS, batch_id=batch_id)
+    outcome = "success"
+    try:
+        for number, chunk in enumerate(chunked(rows, BULK_CHUNK_ROWS), start=1):
+            result = import_rows_chunk(chunk, user_obj, batch_id, use_ai=use_ai)
+            for error in result["errors"]:
+                yield line("error", **error)
+            totals["rows"]    += len(chunk)
+            totals["clauses"] += result["clauses"]
+            totals["logged"]  += result["logged"]
+            totals["errors"]  += len(result["errors"])
+            totals["total_co2e_kg"] = round(totals["total_co2e_kg"] + result["co2e"], 4)
+            yield line("progress", chunk=number, **totals)
+    except Exception as e:
+        logger.error("Bulk import %s aborted: %s", batch_id, traceback.format_exc())
+        outcome = "aborted"
+        yield line("error", row=None, error=f"Import aborted: {e}", fatal=True)
+
+    logger.info("Bulk import %s for '%s': %s rows, %s logs in %.1fs (%s)", batch_id,
+                user_obj.username, totals["rows"], totals["logged"], time.monotonic() - start, outcome)
+    yield line("done", status=outcome, elapsed_s=round(time.monotonic() - start, 2), **totals)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+#  METRICS
+#  Stage timings and clause / cache / Cloudant counters are recorded inline
+#  (users/metrics.py); the counters below already live in the caches and the
+#  AI client and are read on each scrape.
+# ─────────────────────────────────────────────────────────────────────────────
+def _collect_service_metrics():
+    caches = {
+        "classification": CLASSIFY_CACHE.stats(),
+        "factor_table":   get_factor_cache_stats(),
+    }
+    if AI_CACHE:
+        caches["ai_extraction"] = AI_CACHE.memory.stats()
+    breaker = AI_CLIENT.stats()
+    hedge   = get_hedge_stats()
+    return [
+        ("logger_cache_hits_total", "counter", "Cache hits per in-process cache",
+         [({"cache": name}, stats["hits"]) for name, stats in caches.items()]),
+        ("logger_cache_misses_total", "counter", "Cache misses per in-process cache",
+         [({"cache": name}, stats["misses"]) for name, stats in caches.items()]),
+        ("logger_cache_entries", "gauge", "Entries held per in-process cache",
+         [({"cache": name}, stats["size"]) for name, stats in caches.items()]),
+        ("logger_ai_breaker_state", "gauge", "AI service circuit breaker state (1 = current)",
+         [({"state": state}, int(breaker["state"] == state)) for state in ("closed", "open", "half_open")]),
+        ("logger_ai_calls_total", "counter", "AI service calls by outcome",
+         [({"outcome": outcome}, breaker[outcome])
+          for outcome in ("successes", "failures", "slow", "cut_short", "short_circuited")]),
+        ("logger_ai_hedge_total", "counter", "Hedged requests by whether AI answered within budget",
+         [({"outcome": outcome}, hedge[outcome]) for outcome in ("ai_on_time", "ai_late")]),
+    ]
+
+
+metrics.register_collector(_collect_service_metrics)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -863,9 +1290,11 @@ def process_text_to_carbon(input_text: str, user_obj):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def log_activity_api(request):
-    input_text = request.data.get('input_text', '').strip()
+    input_text = str(_request_fields(request).get('input_text') or '').strip()
     if not input_text:
         return Response({"message": "Missing input_text"}, status=status.HTTP_400_BAD_REQUEST)
+    if _wants_async(request):
+        return enqueue_activity_job(request, kind='text', input_text=input_text)
     return process_text_to_carbon(input_text, request.user)
 
 
@@ -875,14 +1304,11 @@ def log_activity_audio_api(request):
     audio_file = request.FILES.get('audio')
     if not audio_file:
         return Response({"message": "Missing audio file"}, status=status.HTTP_400_BAD_REQUEST)
+    if _wants_async(request):
+        return enqueue_activity_job(request, kind='audio', audio=audio_file.read(),
+                                    audio_content_type='audio/webm')
     try:
-        stt = get_stt_service()
-        result = stt.recognize(
-            audio=audio_file, content_type='audio/webm', model='en-US_Multimedia',
-        ).get_result()
-        transcript = " ".join(
-            r['alternatives'][0]['transcript'] for r in result.get('results', [])
-        ).strip()
+        transcript = transcribe_audio(audio_file)
         if not transcript:
             return Response({"message": "No speech detected."}, status=status.HTTP_400_BAD_REQUEST)
         logger.info("STT transcript for '%s': '%s'", request.user.username, transcript)
@@ -892,6 +1318,58 @@ def log_activity_audio_api(request):
         return Response({"message": f"Transcription Error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def log_activity_bulk_api(request):
+    """
+    Imports an NDJSON / CSV upload ('file'), one diary entry per row.  The
+    response streams NDJSON: a progress line per chunk, an error line per
+    failed row or clause, then a final 'done' line with the totals.
+    ?format=ndjson|csv overrides detection; ?ai=0 uses the local classifier only.
+    """
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response({"message": "Missing file"}, status=status.HTTP_400_BAD_REQUEST)
+    fmt = detect_format(upload, request.query_params.get('format') or request.data.get('format'))
+    if fmt not in IMPORT_FORMATS:
+        return Response({"message": f"Unsupported format '{fmt}'; use ndjson or csv"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    use_ai = str(request.query_params.get('ai', request.data.get('ai', '1'))).strip().lower() \
+        not in ('0', 'false', 'no', 'off')
+
+    upload.seek(0)
+    response = StreamingHttpResponse(
+        stream_bulk_import(iter_import_rows(upload, fmt), request.user, fmt, use_ai=use_ai),
+        content_type='application/x-ndjson',
+    )
+    response['X-Accel-Buffering'] = 'no'   # let proxies pass progress lines through
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_job_status_api(request, job_id):
+    """Status of one of the caller's async jobs; once finished, the result body."""
+    job = ActivityJob.objects.filter(pk=job_id, user=request.user).first()
+    if job is None:
+        return Response({"message": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+    # A restarted process may hold queued jobs and no running pool yet
+    if job.status == 'queued':
+        JOB_POOL.start()
+    body = {
+        "job_id":      str(job.pk),
+        "kind":        job.kind,
+        "status":      job.status,
+        "attempts":    job.attempts,
+        "created_at":  job.created_at,
+        "started_at":  job.started_at,
+        "finished_at": job.finished_at,
+    }
+    if job.status in ('done', 'failed'):
+        body.update(http_status=job.http_status, result=job.result, error=job.error or None)
+    return Response(body)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_activities_api(request):
@@ -936,18 +1414,37 @@ def speech_to_text_api(request):
     if not audio_file:
         return Response({"message": "No audio provided"}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        stt    = get_stt_service()
-        result = stt.recognize(
-            audio=audio_file, content_type='audio/webm', model='en-US_Multimedia',
-        ).get_result()
-        transcript = " ".join(
-            r['alternatives'][0]['transcript'] for r in result.get('results', [])
-        ).strip()
+        transcript = transcribe_audio(audio_file)
         return Response({"status": "success", "transcript": transcript})
     except Exception as e:
         return Response({"message": f"Transcription failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_cache_stats_api(request):
+    """Per-process cache counters, for sizing the caches in production, plus
+    the AI service circuit breaker state and call latency."""
+    return Response({
+        "factor_table":   get_factor_cache_stats(),
+        "classification": CLASSIFY_CACHE.stats(),
+        "category_index": dict(CATEGORY_INDEX.stats),
+        "ai_key_remap":   get_remap_cache_stats(),
+        "hinglish":       apply_hinglish_translation.cache_info()._asdict(),
+        "ai_service":     AI_CLIENT.stats(),
+        "ai_hedge":       dict(get_hedge_stats(), budget_ms=AI_LATENCY_BUDGET_MS),
+        "ai_extraction":  AI_CACHE.stats() if AI_CACHE else None,
+        "activity_jobs":  JOB_POOL.stats(),
+    })
+
+
+def metrics_api(request):
+    """Prometheus scrape endpoint (plain Django view: no JWT, optional bearer token)."""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def add_custom_factor(request):
@@ -955,6 +1452,6 @@ def add_custom_factor(request):
     if serializer.is_valid():
         serializer.save(status='pending', added_by=request.user)
         global _DB_KEY_CACHE
-        _DB_KEY_CACHE = None   # invalidate cache so new factor is found immediately
+        _DB_KEY_CACHE = None   # fallback cache; the post_save signal republishes the snapshot
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)